@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -48,6 +49,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'lecturas.middleware.InstrumentacionMiddleware',
 ]
 
 ROOT_URLCONF = 'colector_datos.urls'
@@ -72,14 +74,88 @@ WSGI_APPLICATION = 'colector_datos.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+# Por defecto SQLite (desarrollo). Para producción se usa PostgreSQL definiendo COLECTOR_DB=postgres y
+# COLECTOR_DB_NOMBRE, COLECTOR_DB_USUARIO, COLECTOR_DB_CLAVE, COLECTOR_DB_HOST y COLECTOR_DB_PUERTO
+# (hace falta instalar psycopg). Las conexiones se reusan durante COLECTOR_DB_CONN_MAX_AGE segundos y se
+# verifican antes de reusarlas. Con COLECTOR_DB_POOL=1 se usa en cambio el pool de psycopg, de
+# COLECTOR_DB_POOL_MIN a COLECTOR_DB_POOL_MAX conexiones (Django no permite combinarlo con CONN_MAX_AGE).
+
+if os.environ.get('COLECTOR_DB', 'sqlite') == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('COLECTOR_DB_NOMBRE', 'colector_datos'),
+            'USER': os.environ.get('COLECTOR_DB_USUARIO', 'colector'),
+            'PASSWORD': os.environ.get('COLECTOR_DB_CLAVE', ''),
+            'HOST': os.environ.get('COLECTOR_DB_HOST', 'localhost'),
+            'PORT': os.environ.get('COLECTOR_DB_PUERTO', '5432'),
+            'CONN_MAX_AGE': int(os.environ.get('COLECTOR_DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
+    }
+    if os.environ.get('COLECTOR_DB_POOL') == '1':
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('COLECTOR_DB_POOL_MIN', 2)),
+            'max_size': int(os.environ.get('COLECTOR_DB_POOL_MAX', 10)),
+            'timeout': 10,
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'dblecturas.sqlite3',  # cambié el nombre de la base de datos por defecto para que sea mas representativo
+        }
+    }
+
+# Perfil de rendimiento de SQLite para varios operadores a la vez (WAL, busy_timeout, caché; ver lecturas/sqlite.py).
+# Se activa con COLECTOR_SQLITE_OPTIMIZADO=1; SQLITE_PRAGMAS permite cambiar alguno de los valores.
+SQLITE_OPTIMIZADO = os.environ.get('COLECTOR_SQLITE_OPTIMIZADO') == '1'
+
+# Almacén frío (lecturas/almacen_frio.py): un archivo por cada periodo que se sacó de la base con exportar_frio
+ALMACEN_FRIO_DIR = Path(os.environ.get('COLECTOR_ALMACEN_FRIO', BASE_DIR / 'almacen_frio'))
 
-DATABASES = {
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Se usa para las estadísticas del dashboard. Con varios procesos de servidor conviene usar una caché
+# compartida (Redis o Memcached) para que la invalidación llegue a todos.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'dblecturas.sqlite3',  # cambié el nombre de la base de datos por defecto para que sea mas representativo
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'colector-datos',
     }
 }
 
+# Avisos en vivo del avance de las rutas (lecturas.avisos). MemoriaBackend reparte dentro del proceso;
+# con varios procesos hay que usar un backend compartido con la misma interfaz.
+AVISOS = {
+    'BACKEND': 'lecturas.avisos.MemoriaBackend',
+    'OPCIONES': {'limite_cola': 100},
+}
+
+
+# Instrumentación de peticiones (lecturas.middleware): agrega el encabezado Server-Timing con las
+# consultas y tiempos de cada petición y registra en el log 'lecturas.instrumentacion' las lentas.
+# Con muestreo 0 el middleware no se instala, así que solo se mide por defecto en desarrollo; en producción
+# alcanza con medir una fracción (ej. 0.05). El encabezado se manda solo al staff o con DEBUG.
+
+INSTRUMENTACION_MUESTREO = 1.0 if DEBUG else 0
+INSTRUMENTACION_UMBRAL_LENTO_MS = 500
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'consola': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'lecturas.instrumentacion': {'handlers': ['consola'], 'level': 'WARNING', 'propagate': False},
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
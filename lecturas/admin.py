@@ -1,5 +1,97 @@
 from django.contrib import admin
-from .models import Operador, Cliente, Novedad, Lote, NovedadLectura
+from django.core.paginator import Paginator
+from django.db import connection, transaction
+from django.db.models import Count, F, Q
+from django.utils.functional import cached_property
+from .busqueda import filtrar_clientes, filtrar_lecturas, filtrar_suministros
+from .cache import invalidar, invalidar_periodo
+from .models import (Operador, Cliente, Novedad, Suministro, Lote, NovedadLectura, RutaPeriodo, AnomaliaConsumo,
+                     LoteHistorico, NovedadLecturaHistorica, AnomaliaConsumoHistorica)
+
+
+# Las tablas de lecturas tienen millones de filas: los listados del admin no pueden contar la tabla entera
+# ni armar los filtros con un DISTINCT sobre ella, y cada fila tiene que mostrarse sin consultas extra.
+MINIMO_ESTIMADO = 50000   # Por debajo de esta cantidad de filas se cuenta con COUNT(*)
+
+
+def filas_estimadas(modelo):
+    """Cantidad aproximada de filas de la tabla según las estadísticas del motor, o None si no hay"""
+    tabla = modelo._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [tabla])
+        elif connection.vendor == 'sqlite':
+            # sqlite_stat1 existe recién después del primer ANALYZE (o PRAGMA optimize)
+            cursor.execute("SELECT count(*) FROM sqlite_master WHERE name = 'sqlite_stat1'")
+            if not cursor.fetchone()[0]:
+                return None
+            # Hay una fila por índice y el primer número es la cantidad de filas del índice: en los índices
+            # parciales son solo las que cumplen la condición, así que la de la tabla es la mayor
+            cursor.execute('SELECT MAX(CAST(stat AS INTEGER)) FROM sqlite_stat1 WHERE tbl = %s', [tabla])
+        else:
+            return None
+        fila = cursor.fetchone()
+    if not fila or fila[0] is None or fila[0] < 0:
+        return None
+    return int(fila[0])
+
+
+class PaginadorEstimado(Paginator):
+    """Sin filtros ni búsqueda usa la cantidad estimada de filas de la tabla en lugar de COUNT(*)"""
+    @cached_property
+    def count(self):
+        if not self.object_list.query.where:
+            estimado = filas_estimadas(self.object_list.model)
+            if estimado is not None and estimado >= MINIMO_ESTIMADO:
+                return estimado
+        return super().count
+
+
+def _periodo(valor):
+    """Convierte 'AAAA-MM' en (año, mes), o None si no es un periodo"""
+    try:
+        ano, mes = (int(parte) for parte in (valor or '').split('-'))
+    except ValueError:
+        return None
+    return (ano, mes) if 1 <= mes <= 12 else None
+
+
+class PeriodoFilter(admin.SimpleListFilter):
+    """Filtro por periodo con las opciones sacadas del resumen de rutas (chico) y no de las lecturas"""
+    title = 'periodo'
+    parameter_name = 'periodo'
+    
+    def lookups(self, request, model_admin):
+        periodos = RutaPeriodo.objects.order_by('-ano_consumo', '-mes_consumo').values_list(
+            'ano_consumo', 'mes_consumo'
+        ).distinct()
+        return [(f'{ano}-{mes:02d}', f'{mes:02d}/{ano}') for ano, mes in periodos]
+    
+    def queryset(self, request, queryset):
+        periodo = _periodo(self.value())
+        if periodo:
+            return queryset.filter(ano_consumo=periodo[0], mes_consumo=periodo[1])
+        return queryset
+
+
+class RutaFilter(admin.SimpleListFilter):
+    """Filtro por ruta; las opciones aparecen cuando se eligió un periodo y son las rutas de ese periodo"""
+    title = 'ruta'
+    parameter_name = 'ruta'
+    
+    def lookups(self, request, model_admin):
+        periodo = _periodo(request.GET.get(PeriodoFilter.parameter_name))
+        if not periodo:
+            return []
+        rutas = RutaPeriodo.objects.filter(ano_consumo=periodo[0], mes_consumo=periodo[1]).order_by(
+            'ruta'
+        ).values_list('ruta', flat=True)
+        return [(ruta, ruta) for ruta in rutas]
+    
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(ruta=self.value())
+        return queryset
 
 
 @admin.register(Operador)
@@ -17,36 +109,161 @@ class ClienteAdmin(admin.ModelAdmin):
     list_display = ['cod_cli', 'denominacion', 'domicilio']
     search_fields = ['denominacion', 'domicilio']
     list_per_page = 50
+    
+    # La búsqueda usa el índice de texto completo en lugar de LIKE '%...%' sobre cada campo
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return filtrar_clientes(queryset, search_term), False
+    
+    # Las páginas de las rutas muestran la denominación y el domicilio, y su ETag depende de esta versión
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        invalidar('clientes')
+    
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        invalidar('clientes')
+    
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        invalidar('clientes')
 
 
 @admin.register(Novedad)
 class NovedadAdmin(admin.ModelAdmin):
     list_display = ['cod_novedad', 'descripcion']
     search_fields = ['descripcion']
+    
+    # El catálogo de novedades está en caché, así que hay que invalidarlo cuando se modifica desde acá
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        invalidar('novedades')
+    
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        invalidar('novedades')
+    
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        invalidar('novedades')
+
+
+@admin.register(Suministro)
+class SuministroAdmin(admin.ModelAdmin):
+    list_display = ['numero', 'numero_medidor', 'tipo_medidor']
+    search_fields = ['numero', 'numero_medidor']
+    list_per_page = 50
+    ordering = ['numero', 'numero_medidor']
+    paginator = PaginadorEstimado
+    show_full_result_count = False
+    
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return filtrar_suministros(queryset, search_term), False
+    
+    # El número de medidor también se muestra en las páginas de las rutas (misma versión que los clientes)
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        invalidar('clientes')
+    
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        invalidar('clientes')
+    
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        invalidar('clientes')
 
 
 @admin.register(Lote)
 class LoteAdmin(admin.ModelAdmin):
-    list_display = ['cod_lectura', 'cliente', 'ruta', 'orden', 'numero_medidor', 
-                   'lectura_anterior', 'lectura_actual', 'consumo_kwh', 'abierta', 'ano_consumo', 'mes_consumo']
-    list_filter = ['ano_consumo', 'mes_consumo', 'ruta', 'abierta', 'enviado_comercial']
-    search_fields = ['cliente__denominacion', 'numero_medidor', 'suministro_numero']
+    list_display = ['cod_lectura', 'cliente', 'ruta', 'orden', 'get_medidor', 
+                   'lectura_anterior', 'lectura_actual', 'consumo_kwh', 'ano_consumo', 'mes_consumo']
+    # El estado abierta/cerrada es de la ruta y se ve en Rutas del Periodo
+    list_filter = [PeriodoFilter, RutaFilter, 'enviado_comercial']
+    search_fields = ['cliente__denominacion', 'suministro__numero_medidor', 'suministro__numero']
+    list_select_related = ['cliente', 'suministro']
+    autocomplete_fields = ['cliente', 'suministro']
     list_per_page = 50
+    paginator = PaginadorEstimado
+    show_full_result_count = False
+    # Con cod_lectura el orden es total y sale del índice del periodo y la ruta (sin ordenar en memoria)
+    ordering = ['ano_consumo', 'mes_consumo', 'ruta', 'orden', 'cod_lectura']
     readonly_fields = ['consumo_kwh', 'fecha_hora_registro']
     
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return filtrar_lecturas(queryset, search_term), False
+    
+    def get_readonly_fields(self, request, obj=None):
+        # Una lectura no se cambia de periodo ni de ruta desde acá: el resumen y la versión se llevan por ruta
+        if obj is not None:
+            return self.readonly_fields + ['ano_consumo', 'mes_consumo', 'ruta']
+        return self.readonly_fields
+    
+    # Lo que se corrige desde acá pasa por el mismo registro que las vistas (RutaPeriodo.registrar_cambio): ajusta
+    # el resumen de la ruta y le pone a la lectura la versión nueva, así el cambio llega a los colectores y a las
+    # páginas que se validan con la versión de la ruta
+    def save_model(self, request, obj, form, change):
+        if obj.lectura_actual is None:
+            obj.consumo_kwh = None
+        with transaction.atomic():
+            if change:
+                leidas, sin_leer = ([obj.pk], []) if obj.tiene_lectura else ([], [obj.pk])
+                obj.version = RutaPeriodo.registrar_cambio(
+                    obj.ano_consumo, obj.mes_consumo, obj.ruta, leidos=Lote.objects.cambio_leidos(leidas, sin_leer)
+                ) or obj.version
+            else:
+                obj.version = RutaPeriodo.registrar_cambio(
+                    obj.ano_consumo, obj.mes_consumo, obj.ruta, leidos=int(obj.tiene_lectura),
+                    total_medidores=F('total_medidores') + 1,
+                )
+            super().save_model(request, obj, form, change)
+            if not obj.version:
+                # La ruta es nueva en el periodo: se arma su resumen
+                RutaPeriodo.reconstruir(obj.ano_consumo, obj.mes_consumo)
+        invalidar_periodo(obj.ano_consumo, obj.mes_consumo)
+    
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            RutaPeriodo.registrar_cambio(
+                obj.ano_consumo, obj.mes_consumo, obj.ruta, leidos=Lote.objects.cambio_leidos(sin_leer=[obj.pk]),
+                total_medidores=F('total_medidores') - 1,
+            )
+            super().delete_model(request, obj)
+        invalidar_periodo(obj.ano_consumo, obj.mes_consumo)
+    
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            rutas = list(queryset.order_by().values('ano_consumo', 'mes_consumo', 'ruta').annotate(
+                total=Count('pk'), leidas=Count('pk', filter=Q(lectura_actual__isnull=False)),
+            ))
+            super().delete_queryset(request, queryset)
+            for ruta in rutas:
+                RutaPeriodo.registrar_cambio(
+                    ruta['ano_consumo'], ruta['mes_consumo'], ruta['ruta'],
+                    leidos=-ruta['leidas'], total_medidores=F('total_medidores') - ruta['total'],
+                )
+        for ano, mes in {(ruta['ano_consumo'], ruta['mes_consumo']) for ruta in rutas}:
+            invalidar_periodo(ano, mes)
+    
+    @admin.display(description='Nº Medidor', ordering='suministro__numero_medidor')
+    def get_medidor(self, obj):
+        return obj.numero_medidor
+    
     fieldsets = (
         ('Periodo', {
             'fields': ('ano_consumo', 'mes_consumo')
         }),
         ('Cliente y Suministro', {
-            'fields': ('cliente', 'suministro_numero')
+            'fields': ('cliente', 'suministro')
         }),
         ('Ruta', {
             'fields': ('area', 'ruta', 'orden')
         }),
-        ('Medidor', {
-            'fields': ('tipo_medidor', 'numero_medidor')
-        }),
         ('Lecturas', {
             'fields': ('lectura_anterior', 'lectura_actual', 'consumo_kwh')
         }),
@@ -54,7 +271,7 @@ class LoteAdmin(admin.ModelAdmin):
             'fields': ('novedad_libre',)
         }),
         ('Estado', {
-            'fields': ('abierta', 'enviado_comercial')
+            'fields': ('enviado_comercial',)
         }),
         ('Auditoría', {
             'fields': ('operador', 'fecha_hora_registro', 'ubi_gps')
@@ -67,3 +284,116 @@ class NovedadLecturaAdmin(admin.ModelAdmin):
     list_display = ['lectura', 'novedad', 'fecha_registro']
     list_filter = ['novedad', 'fecha_registro']
     search_fields = ['lectura__cliente__denominacion', 'novedad__descripcion']
+    list_select_related = ['lectura', 'novedad']
+    raw_id_fields = ['lectura']
+    readonly_fields = ['version']
+    list_per_page = 50
+    paginator = PaginadorEstimado
+    show_full_result_count = False
+    
+    # Las novedades de una lectura también son un cambio de su ruta (ver LoteAdmin.save_model)
+    def registrar(self, lectura):
+        version = RutaPeriodo.registrar_cambio(lectura.ano_consumo, lectura.mes_consumo, lectura.ruta)
+        if version:
+            Lote.objects.filter(pk=lectura.pk).update(version=version)
+        return version
+    
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            obj.version = self.registrar(obj.lectura) or obj.version
+            super().save_model(request, obj, form, change)
+        invalidar_periodo(obj.lectura.ano_consumo, obj.lectura.mes_consumo)
+    
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            self.registrar(obj.lectura)
+            super().delete_model(request, obj)
+        invalidar_periodo(obj.lectura.ano_consumo, obj.lectura.mes_consumo)
+    
+    def delete_queryset(self, request, queryset):
+        lecturas = Lote.objects.filter(pk__in=queryset.values('lectura')).only('ano_consumo', 'mes_consumo', 'ruta')
+        with transaction.atomic():
+            for lectura in lecturas:
+                self.registrar(lectura)
+            super().delete_queryset(request, queryset)
+        for ano, mes in {(lectura.ano_consumo, lectura.mes_consumo) for lectura in lecturas}:
+            invalidar_periodo(ano, mes)
+
+
+@admin.register(RutaPeriodo)
+class RutaPeriodoAdmin(admin.ModelAdmin):
+    list_display = ['ruta', 'area', 'ano_consumo', 'mes_consumo', 'total_medidores', 'leidos', 'abierta', 'operador_nombre']
+    list_filter = ['ano_consumo', 'mes_consumo', 'abierta']
+    search_fields = ['ruta', 'area']
+    # Se mantiene desde las vistas y con el comando reconstruir_rutas, no se edita a mano
+    readonly_fields = ['total_medidores', 'leidos', 'operador_nombre']
+
+
+@admin.register(AnomaliaConsumo)
+class AnomaliaConsumoAdmin(admin.ModelAdmin):
+    list_display = ['lectura', 'get_medidor', 'tipo', 'consumo', 'mediana', 'consumo_estimado', 'lectura_sugerida',
+                    'revisada', 'ano_consumo', 'mes_consumo']
+    list_filter = [PeriodoFilter, 'tipo', 'revisada']
+    search_fields = ['lectura__suministro__numero_medidor', 'lectura__suministro__numero']
+    list_select_related = ['lectura__suministro']
+    raw_id_fields = ['lectura']
+    list_per_page = 50
+    paginator = PaginadorEstimado
+    show_full_result_count = False
+    # Las genera el comando detectar_anomalias; desde acá solo se marcan como revisadas
+    readonly_fields = ['ano_consumo', 'mes_consumo', 'tipo', 'consumo', 'mediana', 'consumo_estimado',
+                       'lectura_sugerida', 'fecha_deteccion']
+    actions = ['marcar_revisadas']
+    
+    def get_medidor(self, obj):
+        return obj.lectura.numero_medidor
+    get_medidor.short_description = 'Nº Medidor'
+    
+    @admin.action(description='Marcar como revisadas')
+    def marcar_revisadas(self, request, queryset):
+        cantidad = queryset.update(revisada=True)
+        self.message_user(request, f'{cantidad} anomalías marcadas como revisadas')
+
+
+class NovedadLecturaHistoricaInline(admin.TabularInline):
+    model = NovedadLecturaHistorica
+    fields = ['novedad', 'fecha_registro']
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+
+class AnomaliaConsumoHistoricaInline(admin.TabularInline):
+    model = AnomaliaConsumoHistorica
+    fields = ['tipo', 'consumo', 'mediana', 'consumo_estimado', 'lectura_sugerida', 'revisada', 'fecha_deteccion']
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+
+@admin.register(LoteHistorico)
+class LoteHistoricoAdmin(admin.ModelAdmin):
+    list_display = ['cod_lectura', 'cliente', 'ruta', 'orden', 'get_medidor', 
+                   'lectura_anterior', 'lectura_actual', 'consumo_kwh', 'ano_consumo', 'mes_consumo']
+    list_filter = [PeriodoFilter, RutaFilter]
+    search_fields = ['suministro__numero_medidor', 'suministro__numero']
+    list_select_related = ['cliente', 'suministro']
+    ordering = ['ano_consumo', 'mes_consumo', 'ruta', 'orden', 'cod_lectura']
+    list_per_page = 50
+    paginator = PaginadorEstimado
+    show_full_result_count = False
+    inlines = [NovedadLecturaHistoricaInline, AnomaliaConsumoHistoricaInline]
+    
+    # Solo consulta: las lecturas archivadas se mueven con el comando archivar_periodo
+    @admin.display(description='Nº Medidor', ordering='suministro__numero_medidor')
+    def get_medidor(self, obj):
+        return obj.numero_medidor
+    
+    def has_add_permission(self, request, obj=None):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
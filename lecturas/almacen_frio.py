@@ -0,0 +1,252 @@
+import json
+import os
+import struct
+import zipfile
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+from .models import LoteHistorico, NovedadLecturaHistorica
+
+
+# Almacén frío: los periodos archivados se pueden sacar de la base y guardar en un archivo por periodo, con
+# las columnas por separado y tipadas (enteros del tamaño justo, ruta/área/tipo de medidor como diccionario).
+# Cada archivo es un .npz: un zip con un .npy por columna. Sin comprimir (lo normal) cada columna se abre con
+# memmap, así una consulta solo lee del disco las páginas que necesita; con --comprimir ocupa menos pero se
+# carga entera en memoria al abrirla. Las filas van ordenadas por número de medidor para buscar con searchsorted.
+# numpy es opcional: solo lo necesitan los comandos exportar_frio y consultar_frio, que importan este módulo.
+
+VERSION_FORMATO = 1
+
+# (campo, tipo de columna). Los campos con nulos llevan además una columna <campo>_nulo
+CAMPOS = [
+    ('cod_lectura', 'entero'),
+    ('numero_medidor', 'texto'),
+    ('suministro_numero', 'texto'),
+    ('cliente_id', 'entero'),
+    ('area', 'diccionario'),
+    ('ruta', 'diccionario'),
+    ('orden', 'entero'),
+    ('tipo_medidor', 'diccionario'),
+    ('lectura_anterior', 'entero'),
+    ('lectura_actual', 'entero'),
+    ('consumo_kwh', 'entero'),
+    ('novedad_libre', 'diccionario'),
+    ('fecha_hora_registro', 'fecha'),
+    ('ubi_gps', 'texto'),
+    ('operador_id', 'entero'),
+    ('version', 'entero'),
+]
+
+# Los campos que no están en LoteHistorico sino en su suministro
+CONSULTA_SUMINISTRO = {
+    'suministro_numero': 'suministro__numero',
+    'numero_medidor': 'suministro__numero_medidor',
+    'tipo_medidor': 'suministro__tipo_medidor',
+}
+
+_EPOCA = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def directorio_frio(directorio=None):
+    return Path(directorio or settings.ALMACEN_FRIO_DIR)
+
+
+def archivo_periodo(ano, mes, directorio=None):
+    return directorio_frio(directorio) / f'lecturas_{int(ano):04d}_{int(mes):02d}.npz'
+
+
+def _tipo_minimo(valores, sin_signo=False):
+    """El tipo entero más chico en el que entran todos los valores"""
+    tipos = (np.uint8, np.uint16, np.uint32, np.uint64) if sin_signo else (np.int16, np.int32, np.int64)
+    if not len(valores):
+        return tipos[0]
+    minimo, maximo = valores.min(), valores.max()
+    for tipo in tipos:
+        if np.iinfo(tipo).min <= minimo and maximo <= np.iinfo(tipo).max:
+            return tipo
+    return tipos[-1]
+
+
+def codificar(campo, tipo, valores):
+    """Arma las columnas (nombre -> arreglo) de un campo a partir de sus valores, en el orden de las filas.
+    Si hay nulos se guardan como 0 (o texto vacío) y se agrega la columna <campo>_nulo."""
+    nulos = np.array([valor is None for valor in valores], dtype=bool)
+    if tipo == 'entero':
+        enteros = np.array([0 if valor is None else valor for valor in valores], dtype=np.int64)
+        columnas = {campo: enteros.astype(_tipo_minimo(enteros))}
+    elif tipo == 'texto':
+        columnas = {campo: np.array([(valor or '').encode('utf-8') for valor in valores], dtype='S')}
+    elif tipo == 'diccionario':
+        diccionario, codigos = np.unique(np.array([valor or '' for valor in valores], dtype=str), return_inverse=True)
+        columnas = {campo: codigos.astype(_tipo_minimo(codigos, sin_signo=True)), f'{campo}_diccionario': diccionario}
+    elif tipo == 'fecha':
+        microsegundos = [0 if valor is None else (valor - _EPOCA) // timedelta(microseconds=1) for valor in valores]
+        columnas = {campo: np.array(microsegundos, dtype=np.int64).view('datetime64[us]')}
+    else:
+        raise ValueError(f'Tipo de columna desconocido: {tipo}')
+    if nulos.any():
+        columnas[f'{campo}_nulo'] = nulos
+    return columnas
+
+
+def decodificar(columnas, campo, tipo, fila):
+    """Valor de un campo en una fila, con el mismo tipo que tenía en la base"""
+    nulos = columnas.get(f'{campo}_nulo')
+    if nulos is not None and nulos[fila]:
+        return None
+    valor = columnas[campo][fila]
+    if tipo == 'entero':
+        return int(valor)
+    if tipo == 'texto':
+        return bytes(valor).decode('utf-8')
+    if tipo == 'diccionario':
+        return str(columnas[f'{campo}_diccionario'][valor])
+    if tipo == 'fecha':
+        return _EPOCA + timedelta(microseconds=int(valor.astype(np.int64)))
+    raise ValueError(f'Tipo de columna desconocido: {tipo}')
+
+
+def exportar_periodo(ano, mes, directorio=None, comprimir=False):
+    """Escribe las lecturas archivadas del periodo (y sus novedades) en el archivo del periodo.
+    Devuelve (archivo, cantidad de lecturas). El archivo se escribe aparte y se reemplaza al final."""
+    filas = list(LoteHistorico.objects.filter(ano_consumo=ano, mes_consumo=mes).order_by('cod_lectura').values_list(
+        *(CONSULTA_SUMINISTRO.get(campo, campo) for campo, tipo in CAMPOS)
+    ))
+    columnas = {}
+    for (campo, tipo), valores in zip(CAMPOS, zip(*filas) if filas else [()] * len(CAMPOS)):
+        columnas.update(codificar(campo, tipo, valores))
+
+    # Orden por número de medidor; cod_lectura queda de desempate porque las filas venían ordenadas por él
+    orden = np.argsort(columnas['numero_medidor'], kind='stable')
+    for nombre, columna in columnas.items():
+        if not nombre.endswith('_diccionario'):
+            columnas[nombre] = columna[orden]
+
+    novedades = list(NovedadLecturaHistorica.objects.filter(
+        lectura__ano_consumo=ano, lectura__mes_consumo=mes
+    ).values_list('lectura_id', 'novedad_id', 'fecha_registro'))
+    # Las novedades van ordenadas por la fila de su lectura, así las de una lectura se encuentran con searchsorted
+    lecturas, cod_novedades, fechas = zip(*novedades) if novedades else ((), (), ())
+    codigos = columnas['cod_lectura']
+    posiciones = np.argsort(codigos)
+    filas_novedad = posiciones[np.searchsorted(codigos, np.array(lecturas, dtype=np.int64), sorter=posiciones)]
+    orden = np.argsort(filas_novedad, kind='stable')
+    columnas['novedades_fila'] = filas_novedad[orden].astype(_tipo_minimo(filas_novedad))
+    for nombre, columna in (*codificar('codigo', 'entero', cod_novedades).items(),
+                            *codificar('fecha', 'fecha', fechas).items()):
+        columnas[f'novedades_{nombre}'] = columna[orden]
+
+    archivo = archivo_periodo(ano, mes, directorio)
+    archivo.parent.mkdir(parents=True, exist_ok=True)
+    temporal = archivo.with_name(archivo.name + '.tmp')
+    with zipfile.ZipFile(temporal, 'w', zipfile.ZIP_DEFLATED if comprimir else zipfile.ZIP_STORED) as zf:
+        zf.comment = json.dumps({'version': VERSION_FORMATO, 'ano': ano, 'mes': mes, 'lecturas': len(filas),
+                                 'novedades': len(novedades)}).encode('utf-8')
+        for nombre, columna in columnas.items():
+            with zf.open(f'{nombre}.npy', 'w', force_zip64=True) as miembro:
+                np.lib.format.write_array(miembro, np.ascontiguousarray(columna), allow_pickle=False)
+    os.replace(temporal, archivo)
+    return archivo, len(filas)
+
+
+def _abrir_columnas(archivo):
+    """Columnas del archivo: las guardadas sin comprimir se abren con memmap en su posición dentro del zip"""
+    columnas = {}
+    with zipfile.ZipFile(archivo) as zf, open(archivo, 'rb') as crudo:
+        metadatos = json.loads(zf.comment)
+        for info in zf.infolist():
+            nombre = info.filename.removesuffix('.npy')
+            if info.compress_type != zipfile.ZIP_STORED:
+                with zf.open(info) as miembro:
+                    columnas[nombre] = np.lib.format.read_array(miembro, allow_pickle=False)
+                continue
+            # Encabezado local del zip: 30 bytes fijos, después el nombre y el campo extra
+            crudo.seek(info.header_offset + 26)
+            largo_nombre, largo_extra = struct.unpack('<HH', crudo.read(4))
+            crudo.seek(info.header_offset + 30 + largo_nombre + largo_extra)
+            version = np.lib.format.read_magic(crudo)
+            leer_encabezado = {(1, 0): np.lib.format.read_array_header_1_0,
+                               (2, 0): np.lib.format.read_array_header_2_0}[version]
+            forma, fortran, tipo = leer_encabezado(crudo)
+            if not np.prod(forma):
+                columnas[nombre] = np.empty(forma, dtype=tipo)
+            else:
+                columnas[nombre] = np.memmap(archivo, dtype=tipo, mode='r', offset=crudo.tell(), shape=forma,
+                                             order='F' if fortran else 'C')
+    return metadatos, columnas
+
+
+class PeriodoFrio:
+    """Un periodo del almacén frío, para consultarlo sin cargarlo en la base"""
+    def __init__(self, archivo):
+        self.archivo = Path(archivo)
+        self.metadatos, self.columnas = _abrir_columnas(self.archivo)
+        if self.metadatos['version'] != VERSION_FORMATO:
+            raise ValueError(f'{self.archivo.name}: versión de formato {self.metadatos["version"]} desconocida')
+        self.ano, self.mes = self.metadatos['ano'], self.metadatos['mes']
+
+    def __len__(self):
+        return len(self.columnas['cod_lectura'])
+
+    def lectura(self, fila):
+        """La lectura de la fila como diccionario (los campos de LoteHistorico y su suministro) con sus novedades"""
+        lectura = {'ano_consumo': self.ano, 'mes_consumo': self.mes}
+        lectura.update((campo, decodificar(self.columnas, campo, tipo, fila)) for campo, tipo in CAMPOS)
+        filas_novedad = self.columnas['novedades_fila']
+        desde, hasta = np.searchsorted(filas_novedad, [fila, fila + 1])
+        lectura['novedades'] = [
+            (decodificar(self.columnas, 'novedades_codigo', 'entero', i),
+             decodificar(self.columnas, 'novedades_fecha', 'fecha', i))
+            for i in range(desde, hasta)
+        ]
+        return lectura
+
+    def historia_medidor(self, numero_medidor):
+        """Lecturas del medidor en el periodo (búsqueda binaria sobre la columna ordenada)"""
+        medidores = self.columnas['numero_medidor']
+        codificado = numero_medidor.encode('utf-8')
+        buscado = np.array(codificado, dtype=medidores.dtype)
+        if buscado.item() != codificado:
+            return []   # Más largo que cualquier medidor del periodo
+        desde = np.searchsorted(medidores, buscado, side='left')
+        hasta = np.searchsorted(medidores, buscado, side='right')
+        return [self.lectura(fila) for fila in range(desde, hasta)]
+
+    def totales_por_ruta(self):
+        """Medidores, leídos y consumo total de cada ruta, calculados sobre las columnas"""
+        rutas = self.columnas['ruta']
+        nombres = self.columnas['ruta_diccionario']
+        leidas = ~self.columnas['lectura_actual_nulo'] if 'lectura_actual_nulo' in self.columnas else None
+        # Los consumos nulos se guardaron como 0, así que se pueden sumar directamente
+        medidores = np.bincount(rutas, minlength=len(nombres))
+        leidos = np.bincount(rutas, weights=leidas, minlength=len(nombres)) if leidas is not None else medidores
+        consumos = np.bincount(rutas, weights=self.columnas['consumo_kwh'], minlength=len(nombres))
+        return [
+            {'ruta': str(nombre), 'medidores': int(medidores[i]), 'leidos': int(leidos[i]),
+             'consumo_kwh': int(consumos[i])}
+            for i, nombre in enumerate(nombres)
+        ]
+
+
+def periodos_frios(directorio=None):
+    """Lista de (año, mes, archivo) de los periodos del almacén frío, del más viejo al más nuevo"""
+    periodos = []
+    for archivo in directorio_frio(directorio).glob('lecturas_*_*.npz'):
+        try:
+            ano, mes = (int(parte) for parte in archivo.stem.split('_')[1:])
+        except ValueError:
+            continue
+        periodos.append((ano, mes, archivo))
+    return sorted(periodos)
+
+
+def historia_medidor(numero_medidor, directorio=None):
+    """Lecturas del medidor en todos los periodos del almacén frío, en orden de periodo"""
+    return [
+        lectura
+        for ano, mes, archivo in periodos_frios(directorio)
+        for lectura in PeriodoFrio(archivo).historia_medidor(numero_medidor)
+    ]
@@ -0,0 +1,186 @@
+import warnings
+
+import numpy as np
+from django.db import connection, transaction
+
+from .models import AnomaliaConsumo, Lote
+
+
+# Detección de consumos sospechosos de un periodo, con NumPy: las lecturas del periodo y el consumo de los
+# periodos anteriores de cada medidor se cargan en arreglos y todas las reglas se evalúan de una vez sobre
+# el periodo entero (sin recorrer las lecturas una por una en Python).
+# numpy es opcional: solo lo necesita el comando detectar_anomalias, que importa este módulo.
+
+PERIODOS_HISTORIA = 6       # Periodos anteriores con los que se calcula la mediana de cada medidor
+FACTOR_PICO = 3.0           # Un consumo es pico si supera FACTOR_PICO veces la mediana...
+MINIMO_PICO = 100           # ...y la supera por lo menos en MINIMO_PICO kWh (para no marcar 5 contra 20 kWh)
+TOLERANCIA_DIGITOS = 0.5    # Con dos dígitos intercambiados el consumo tiene que quedar a ±50% de la mediana
+MAXIMO_DIGITOS = 10         # Dígitos en los que se buscan dos intercambiados
+
+# Códigos internos de cada tipo (0 es normal), en el mismo orden que AnomaliaConsumo.TIPOS
+TIPOS = [tipo for tipo, descripcion in AnomaliaConsumo.TIPOS]
+NORMAL = 0
+CERO, PICO, VUELTA, DIGITOS, NEGATIVO = range(1, len(TIPOS) + 1)
+
+# Todas las potencias de 10 que entran en int64 (10^0 a 10^18): las lecturas pueden tener más de MAXIMO_DIGITOS
+_POTENCIAS = 10 ** np.arange(19, dtype=np.int64)
+
+
+def periodos_anteriores(ano, mes, cantidad):
+    """Lista de (año, mes) de los cantidad periodos anteriores, del más cercano al más lejano"""
+    periodos = []
+    for _ in range(cantidad):
+        ano, mes = (ano, mes - 1) if mes > 1 else (ano - 1, 12)
+        periodos.append((ano, mes))
+    return periodos
+
+
+def _filas(queryset):
+    """Ejecuta la consulta del queryset con el cursor, sin armar diccionarios ni tuplas del ORM por fila"""
+    sql, parametros = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(sql, parametros)
+        return cursor.fetchall()
+
+
+def leer_periodo(ano, mes):
+    """Lecturas tomadas del periodo como arreglos:
+    (cod_lectura, suministro_id, numero_medidor, lectura_anterior, lectura_actual)"""
+    filas = _filas(Lote.objects.filter(
+        ano_consumo=ano, mes_consumo=mes, lectura_actual__isnull=False
+    ).order_by().values_list(
+        'cod_lectura', 'suministro_id', 'suministro__numero_medidor', 'lectura_anterior', 'lectura_actual'
+    ))
+    if not filas:
+        vacio = np.zeros(0, dtype=np.int64)
+        return vacio, vacio, np.zeros(0, dtype=str), vacio, vacio
+    codigos, suministros, medidores, anteriores, actuales = zip(*filas)
+    return (np.array(codigos, dtype=np.int64), np.array(suministros, dtype=np.int64), np.array(medidores, dtype=str),
+            np.array(anteriores, dtype=np.int64), np.array(actuales, dtype=np.int64))
+
+
+def leer_historia(suministros, periodos):
+    """Matriz (suministros x periodos) con el consumo de cada suministro en cada periodo anterior (NaN si no hay).
+    Cada periodo es una consulta por el índice del periodo (en la tabla de trabajo y en la de archivadas);
+    los suministros se cruzan por su código con searchsorted (el número de medidor solo no es único: lo es el
+    par número de suministro y medidor)."""
+    historia = np.full((len(suministros), len(periodos)), np.nan)
+    if not len(suministros):
+        return historia
+
+    orden = np.argsort(suministros, kind='stable')
+    ordenados = suministros[orden]
+    for columna, (ano, mes) in enumerate(periodos):
+        # Los periodos anteriores pueden estar archivados (archivar_periodo)
+        filas = _filas(Lote.objects.con_archivadas(
+            'suministro_id', 'consumo_kwh', ano_consumo=ano, mes_consumo=mes, consumo_kwh__isnull=False
+        ))
+        if not filas:
+            continue
+        otros, consumos = zip(*filas)
+        otros = np.array(otros, dtype=np.int64)
+        posiciones = np.minimum(np.searchsorted(ordenados, otros), len(ordenados) - 1)
+        coincide = ordenados[posiciones] == otros
+        historia[orden[posiciones[coincide]], columna] = np.array(consumos, dtype=np.float64)[coincide]
+    return historia
+
+
+def cantidad_digitos(valores):
+    """Cantidad de dígitos de cada valor (0 cuenta como un dígito)"""
+    return 1 + (valores[:, None] >= _POTENCIAS[None, 1:]).sum(axis=1)
+
+
+def digitos_invertidos(anteriores, actuales, medianas, tolerancia):
+    """Para cada lectura, busca dos dígitos vecinos que al intercambiarlos dejen el consumo cerca de la mediana.
+    Devuelve la lectura corregida, o -1 si ningún intercambio sirve."""
+    potencias = _POTENCIAS[:MAXIMO_DIGITOS]
+    digitos = (actuales[:, None] // potencias[None, :]) % 10
+    # Intercambiar los dígitos k y k+1 suma (d[k+1] - d[k]) * (10^k - 10^(k+1))
+    candidatas = actuales[:, None] + (digitos[:, 1:] - digitos[:, :-1]) * (potencias[:-1] - potencias[1:])[None, :]
+    posiciones = np.arange(MAXIMO_DIGITOS - 1)[None, :]
+
+    errores = np.abs((candidatas - anteriores[:, None]) - medianas[:, None])
+    validas = (
+        (candidatas != actuales[:, None])
+        & (posiciones + 1 < cantidad_digitos(actuales)[:, None])   # Sin inventar un dígito a la izquierda
+        & (candidatas >= anteriores[:, None])
+        & (errores <= tolerancia * medianas[:, None])
+    )
+    errores = np.where(validas, errores, np.inf)
+    mejor = errores.argmin(axis=1)
+    filas = np.arange(len(actuales))
+    return np.where(validas[filas, mejor], candidatas[filas, mejor], -1)
+
+
+def detectar(anteriores, actuales, historia, factor_pico=FACTOR_PICO, minimo_pico=MINIMO_PICO,
+             tolerancia=TOLERANCIA_DIGITOS):
+    """Clasifica cada lectura del periodo. Devuelve cuatro arreglos: el código de tipo (NORMAL si no tiene nada),
+    la mediana de los periodos anteriores, el consumo estimado (vuelta del medidor o dígitos corregidos; NaN si
+    no corresponde) y la lectura sugerida (dígitos corregidos; -1 si no corresponde)."""
+    consumos = actuales - anteriores
+    with warnings.catch_warnings():
+        # Los medidores sin ningún periodo anterior dan una mediana NaN, que es lo que se quiere
+        warnings.simplefilter('ignore', RuntimeWarning)
+        medianas = np.nanmedian(historia, axis=1) if historia.shape[1] else np.full(len(consumos), np.nan)
+    con_historia = ~np.isnan(medianas)
+
+    codigos = np.zeros(len(consumos), dtype=np.int8)
+    estimados = np.full(len(consumos), np.nan)
+    sugeridas = np.full(len(consumos), -1, dtype=np.int64)
+
+    codigos[(consumos == 0) & (~con_historia | (medianas > 0))] = CERO
+
+    picos = con_historia & (consumos > factor_pico * medianas) & (consumos - medianas > minimo_pico)
+    negativos = consumos < 0
+    codigos[picos] = PICO
+    codigos[negativos] = NEGATIVO
+
+    # Vuelta del medidor: la lectura actual es menor porque el contador pasó por cero. El consumo real es lo
+    # que faltaba para el máximo más la lectura actual, y tiene que ser razonable para ese medidor
+    # (con 19 dígitos el máximo no entra en int64: esas lecturas nunca se toman como vuelta)
+    digitos = cantidad_digitos(anteriores)
+    maximos = _POTENCIAS[np.minimum(digitos, len(_POTENCIAS) - 1)]
+    vueltas = maximos - anteriores + actuales
+    limite_vuelta = np.where(con_historia, np.maximum(factor_pico * medianas, minimo_pico), maximos / 10)
+    es_vuelta = negativos & (digitos < len(_POTENCIAS)) & (vueltas <= limite_vuelta)
+    codigos[es_vuelta] = VUELTA
+    estimados[es_vuelta] = vueltas[es_vuelta]
+
+    # Dígitos invertidos: solo se buscan entre los picos y los negativos que no son vuelta (son pocos)
+    sospechosas = np.flatnonzero(con_historia & (picos | (negativos & ~es_vuelta)))
+    if len(sospechosas):
+        corregidas = digitos_invertidos(anteriores[sospechosas], actuales[sospechosas], medianas[sospechosas],
+                                        tolerancia)
+        encontradas = corregidas >= 0
+        indices = sospechosas[encontradas]
+        codigos[indices] = DIGITOS
+        sugeridas[indices] = corregidas[encontradas]
+        estimados[indices] = corregidas[encontradas] - anteriores[indices]
+
+    return codigos, medianas, estimados, sugeridas
+
+
+def guardar(ano, mes, cod_lecturas, anteriores, actuales, codigos, medianas, estimados, sugeridas,
+            tamaño_bloque=5000):
+    """Reemplaza las anomalías sin revisar del periodo por las detectadas. Las ya revisadas se conservan."""
+    indices = np.flatnonzero(codigos != NORMAL)
+    with transaction.atomic():
+        AnomaliaConsumo.objects.filter(ano_consumo=ano, mes_consumo=mes, revisada=False).delete()
+        AnomaliaConsumo.objects.bulk_create(
+            (
+                AnomaliaConsumo(
+                    lectura_id=int(cod_lecturas[i]),
+                    ano_consumo=ano,
+                    mes_consumo=mes,
+                    tipo=TIPOS[codigos[i] - 1],
+                    consumo=int(actuales[i] - anteriores[i]),
+                    mediana=None if np.isnan(medianas[i]) else float(medianas[i]),
+                    consumo_estimado=None if np.isnan(estimados[i]) else int(estimados[i]),
+                    lectura_sugerida=None if sugeridas[i] < 0 else int(sugeridas[i]),
+                )
+                for i in indices
+            ),
+            batch_size=tamaño_bloque,
+            ignore_conflicts=True,   # Las revisadas que se vuelven a detectar quedan como estaban
+        )
+    return len(indices)
@@ -0,0 +1,439 @@
+import gzip
+import hashlib
+import json
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.dateparse import parse_datetime
+from django.urls import reverse
+from django.views import View
+
+from .avisos import RECARGAR, backend_avisos, canal_periodo
+from .busqueda import filtrar_clientes, filtrar_lecturas
+from .cache import TIEMPO_CACHE, avance_rutas, catalogo_novedades, invalidar_periodo, obtener_version, ultimo_periodo
+from .forms import validar_lectura
+from .models import Cliente, Lote, NovedadLectura, Operador, RutaPeriodo
+
+
+# Vistas JSON para los colectores de mano que trabajan sin conexión y sincronizan por ruta.
+# Las que usan los colectores (descarga, cambios, estado y subida de una ruta) son asíncronas: desplegadas con
+# ASGI (colector_datos/asgi.py), un equipo con mala señal no ocupa un hilo mientras espera. Con WSGI también
+# funcionan, Django las corre en un bucle de eventos por petición.
+
+
+MAXIMO_LECTURAS_POR_ENVIO = 5000
+MAXIMO_RESULTADOS_BUSQUEDA = 20
+
+# Avisos en vivo (server-sent events)
+REINTENTO_EVENTOS_MS = 3000     # Cuánto espera el navegador para reconectarse si se corta la conexión
+REINTENTO_SIN_ASGI_MS = 10000   # Con WSGI no se deja la conexión abierta: el navegador vuelve a pedir cada 10 s
+ESPERA_PING = 20                # Segundos sin avisos tras los que se manda un comentario para que no se corte
+
+# Columnas del paquete de descarga de una ruta (cada lectura viaja como una lista en este orden)
+CAMPOS_PAQUETE = ['pk', 'orden', 'cliente', 'domicilio', 'suministro_numero', 'numero_medidor',
+                  'lectura_anterior', 'lectura_actual', 'novedad_libre', 'novedades']
+
+
+def es_entero(valor):
+    """En JSON true y false llegan como bool, que en Python también es int"""
+    return isinstance(valor, int) and not isinstance(valor, bool)
+
+
+class ApiView(LoginRequiredMixin, View):
+    """Base de las vistas de la API: sin sesión devuelve 403 en lugar de redirigir al login"""
+    raise_exception = True
+
+
+class AsyncApiView(View):
+    """Base de las vistas asíncronas de la API. Hace lo mismo que ApiView, pero obtiene el usuario con
+    request.auser(): LoginRequiredMixin usa request.user, que consulta la base de forma sincrónica"""
+    async def dispatch(self, request, *args, **kwargs):
+        usuario = await request.auser()
+        if not usuario.is_authenticated:
+            raise PermissionDenied
+        return await super().dispatch(request, *args, **kwargs)
+
+
+async def filas_paquete(lecturas):
+    """Convierte las lecturas en listas con las columnas de CAMPOS_PAQUETE, sin instanciar modelos"""
+    novedades = {}
+    async for cod_lectura, cod_novedad in NovedadLectura.objects.filter(lectura__in=lecturas).values_list(
+        'lectura_id', 'novedad_id'
+    ):
+        novedades.setdefault(cod_lectura, []).append(cod_novedad)
+
+    return [
+        [*fila, novedades.get(fila[0], [])]
+        async for fila in lecturas.order_by('orden').values_list(
+            'cod_lectura', 'orden', 'cliente__denominacion', 'cliente__domicilio', 'suministro__numero',
+            'suministro__numero_medidor', 'lectura_anterior', 'lectura_actual', 'novedad_libre',
+        )
+    ]
+
+
+class DescargarRutaView(AsyncApiView):
+    """Devuelve en un solo paquete comprimido todo lo que el colector necesita para recorrer una ruta.
+
+    El paquete se arma con values_list (sin instanciar Lote ni Cliente), se guarda comprimido en la caché
+    con la versión de la ruta y la de los clientes y suministros (los datos de cada medidor que viajan en el
+    paquete) en la clave y lleva un ETag con esas versiones: si el colector manda
+    If-None-Match con la versión que ya tiene, recibe un 304 sin cuerpo. La variante comprimida y la sin
+    comprimir tienen cuerpos distintos, así que su ETag también es distinto (termina en -gz).
+    """
+    async def get(self, request, ano, mes, ruta):
+        resumen = await RutaPeriodo.objects.filter(ano_consumo=ano, mes_consumo=mes, ruta=ruta).afirst()
+        if resumen is None:
+            return JsonResponse({'error': 'La ruta no existe en el periodo indicado'}, status=404)
+
+        comprimida = 'gzip' in request.headers.get('Accept-Encoding', '')
+        # El nombre de la ruta viene de la URL y puede tener comillas o espacios, que no van en un ETag
+        nombre = hashlib.blake2b(ruta.encode(), digest_size=6).hexdigest()
+        clientes = await sync_to_async(obtener_version)('clientes')
+        etag = f'"{ano}-{mes}-{nombre}-v{resumen.version}-c{clientes}{"-gz" if comprimida else ""}"'
+        no_modificada = get_conditional_response(request, etag=etag)
+        if no_modificada is not None:
+            return no_modificada
+
+        clave = f'lecturas:paquete:{ano}:{mes}:{ruta}:{resumen.version}:{clientes}'
+        paquete = await cache.aget(clave)
+        if paquete is None:
+            # Comprimir una ruta grande lleva unos milisegundos de CPU: se hace en un hilo aparte para no
+            # frenar al resto de los colectores conectados
+            paquete = await sync_to_async(gzip.compress, thread_sensitive=False)(
+                await self.armar_paquete(resumen), compresslevel=6
+            )
+            await cache.aset(clave, paquete, TIEMPO_CACHE)
+
+        if comprimida:
+            response = HttpResponse(paquete, content_type='application/json')
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(gzip.decompress(paquete), content_type='application/json')
+
+        response['ETag'] = etag
+        patch_vary_headers(response, ['Accept-Encoding'])
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    async def armar_paquete(self, resumen):
+        """Arma el JSON compacto de la ruta: los nombres de los campos van una sola vez"""
+        lecturas = Lote.objects.filter(
+            ano_consumo=resumen.ano_consumo, mes_consumo=resumen.mes_consumo, ruta=resumen.ruta
+        )
+        return json.dumps({
+            'ano': resumen.ano_consumo,
+            'mes': resumen.mes_consumo,
+            'ruta': resumen.ruta,
+            'area': resumen.area,
+            'version': resumen.version,
+            'abierta': resumen.abierta,
+            'campos': CAMPOS_PAQUETE,
+            'lecturas': await filas_paquete(lecturas),
+        }, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class CambiosRutaView(AsyncApiView):
+    """Sincronización incremental: devuelve solo las lecturas de la ruta modificadas después de la versión
+    que el colector ya tiene (parámetro desde). La respuesta trae la versión actual, que es el próximo cursor.
+    """
+    async def get(self, request, ano, mes, ruta):
+        try:
+            desde = int(request.GET['desde'])
+        except (KeyError, ValueError):
+            return JsonResponse({'error': 'Falta el parámetro "desde" (versión que ya tiene el colector)'}, status=400)
+
+        resumen = await RutaPeriodo.objects.filter(ano_consumo=ano, mes_consumo=mes, ruta=ruta).afirst()
+        if resumen is None:
+            return JsonResponse({'error': 'La ruta no existe en el periodo indicado'}, status=404)
+
+        lecturas = Lote.objects.filter(ano_consumo=ano, mes_consumo=mes, ruta=ruta, version__gt=desde)
+        return JsonResponse({
+            'version': resumen.version,
+            'abierta': resumen.abierta,
+            'leidos': resumen.leidos,
+            'faltantes': resumen.faltantes,
+            'campos': CAMPOS_PAQUETE,
+            'lecturas': await filas_paquete(lecturas) if desde < resumen.version else [],
+        }, json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')})
+
+
+class EstadoRutaView(AsyncApiView):
+    """Estado de una ruta para que el colector consulte cada tanto si hay algo nuevo (polling).
+
+    Es una sola consulta sobre RutaPeriodo. Lleva un ETag con la versión de la ruta: si el colector manda
+    If-None-Match con la que ya tiene, recibe un 304; si no, sabe que tiene que pedir los cambios.
+    """
+    async def get(self, request, ano, mes, ruta):
+        estado = await RutaPeriodo.objects.filter(ano_consumo=ano, mes_consumo=mes, ruta=ruta).values(
+            'version', 'abierta', 'total_medidores', 'leidos'
+        ).afirst()
+        if estado is None:
+            return JsonResponse({'error': 'La ruta no existe en el periodo indicado'}, status=404)
+
+        etag = f'"{ano}-{mes}-{ruta}-v{estado["version"]}"'
+        no_modificada = get_conditional_response(request, etag=etag)
+        if no_modificada is not None:
+            return no_modificada
+
+        response = JsonResponse({**estado, 'faltantes': estado['total_medidores'] - estado['leidos']})
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+class SubirLecturasView(AsyncApiView):
+    """Recibe en un solo envío las lecturas tomadas en una ruta y las guarda en una transacción.
+
+    Cuerpo esperado:
+        {"lecturas": [{"pk": 1, "lectura_actual": 1234, "novedades": [1, 3], "novedad_libre": "...",
+                       "ubi_gps": "-34.6,-58.4", "fecha_hora": "2025-03-10T09:15:00-03:00"}, ...]}
+
+    Devuelve el resultado de cada lectura, en el mismo orden en que se enviaron. Una lectura que viene más de
+    una vez en el mismo envío se rechaza en todas sus apariciones (no se sabe cuál es la última que tomó el colector).
+    """
+    async def post(self, request, ano, mes, ruta):
+        try:
+            datos = json.loads(request.body)
+            items = datos['lecturas']
+        except (ValueError, KeyError, TypeError):
+            return JsonResponse({'error': 'El cuerpo debe ser un JSON con la lista "lecturas"'}, status=400)
+
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            return JsonResponse({'error': '"lecturas" debe ser una lista de objetos'}, status=400)
+        if len(items) > MAXIMO_LECTURAS_POR_ENVIO:
+            return JsonResponse({'error': f'No se pueden enviar más de {MAXIMO_LECTURAS_POR_ENVIO} lecturas juntas'}, status=400)
+
+        resumen = await RutaPeriodo.objects.filter(ano_consumo=ano, mes_consumo=mes, ruta=ruta).afirst()
+        if resumen is None:
+            return JsonResponse({'error': 'La ruta no existe en el periodo indicado'}, status=404)
+        if not resumen.abierta:
+            return JsonResponse({'error': 'No se puede modificar una ruta cerrada'}, status=409)
+
+        usuario = await request.auser()
+        # Con el usuario en el mismo SELECT: registrar_cambio guarda su nombre en el resumen de la ruta
+        operador = await Operador.objects.select_related('user').filter(user=usuario).afirst()
+
+        # Todo lo que hace falta para validar se trae con una consulta (y el catálogo de la caché)
+        codigos = [item.get('pk') for item in items if es_entero(item.get('pk'))]
+        repetidos = {pk for pk, veces in Counter(codigos).items() if veces > 1}
+        lotes = await Lote.objects.filter(ano_consumo=ano, mes_consumo=mes, ruta=ruta).ain_bulk(codigos)
+        novedades_validas = {cod_novedad for cod_novedad, descripcion in await sync_to_async(catalogo_novedades)()}
+
+        resultados = []
+        modificados = {}
+        novedades_nuevas = {}
+        leidas, sin_leer = [], []
+        ahora = timezone.now()
+
+        for item in items:
+            pk = item.get('pk')
+            if not es_entero(pk):
+                resultados.append({'pk': pk, 'ok': False,
+                                   'errores': ['El código de la lectura debe ser un número entero']})
+                continue
+            if pk in repetidos:
+                resultados.append({'pk': pk, 'ok': False, 'errores': ['La lectura está repetida en el envío']})
+                continue
+            lote = lotes.get(pk)
+            errores = self.validar(item, lote, novedades_validas)
+            if errores:
+                resultados.append({'pk': pk, 'ok': False, 'errores': errores})
+                continue
+
+            if 'lectura_actual' in item:
+                lectura_actual = item['lectura_actual']
+                (sin_leer if lectura_actual is None else leidas).append(lote.pk)
+                lote.lectura_actual = lectura_actual
+                lote.consumo_kwh = lectura_actual - lote.lectura_anterior if lectura_actual is not None else None
+            if 'novedad_libre' in item:
+                lote.novedad_libre = item['novedad_libre']
+            if 'ubi_gps' in item:
+                lote.ubi_gps = item['ubi_gps']
+            if 'novedades' in item:
+                novedades_nuevas[lote.pk] = set(item['novedades'])
+
+            lote.fecha_hora_registro = self.fecha_hora(item) or ahora
+            lote.operador = operador
+            modificados[lote.pk] = lote
+            resultados.append({'pk': lote.pk, 'ok': True})
+
+        version = resumen.version
+        if modificados:
+            version = await sync_to_async(self.guardar)(ano, mes, ruta, leidas, sin_leer, operador, modificados,
+                                                        novedades_nuevas)
+            if not version:
+                return JsonResponse({'error': 'No se puede modificar una ruta cerrada'}, status=409)
+
+        return JsonResponse({
+            'version': version,
+            'guardadas': len(modificados),
+            'rechazadas': len(items) - len(modificados),
+            'resultados': resultados,
+        })
+
+    def guardar(self, ano, mes, ruta, leidas, sin_leer, operador, modificados, novedades_nuevas):
+        """Guarda las lecturas validadas en una transacción y devuelve la versión nueva de la ruta (0 si se
+        cerró mientras tanto). Es sincrónica porque el ORM asíncrono no tiene transacciones: se llama con
+        sync_to_async, que la corre en el hilo de la conexión.
+        Los leídos se cuentan dentro de la transacción (Lote.objects.cambio_leidos): si el colector reenvía el mismo
+        lote después de un timeout, las lecturas que ya se guardaron no vuelven a sumar"""
+        with transaction.atomic():
+            leidos = Lote.objects.cambio_leidos(leidas, sin_leer)
+            version = RutaPeriodo.registrar_cambio(ano, mes, ruta, leidos=leidos, operador=operador,
+                                                   solo_abierta=True)
+            if not version:
+                return 0
+            for lote in modificados.values():
+                lote.version = version
+
+            # bulk_update no pasa por Lote.save, por eso el consumo se calcula arriba
+            Lote.objects.bulk_update(
+                modificados.values(),
+                ['lectura_actual', 'consumo_kwh', 'novedad_libre', 'ubi_gps', 'fecha_hora_registro', 'operador',
+                 'version'],
+                batch_size=500,
+            )
+            if novedades_nuevas:
+                NovedadLectura.reemplazar(novedades_nuevas, version)
+        invalidar_periodo(ano, mes)
+        return version
+
+    def validar(self, item, lote, novedades_validas):
+        """Devuelve la lista de errores de una lectura (vacía si es válida)"""
+        if lote is None:
+            return ['La lectura no existe o no pertenece a la ruta']
+
+        errores = []
+        if 'lectura_actual' in item:
+            lectura_actual = item['lectura_actual']
+            if lectura_actual is not None and not es_entero(lectura_actual):
+                errores.append('La lectura debe ser un número entero')
+            else:
+                try:
+                    # Los límites del IntegerField en la base (si no, el UPDATE falla con un desborde)
+                    if lectura_actual is not None:
+                        Lote._meta.get_field('lectura_actual').run_validators(lectura_actual)
+                    validar_lectura(lectura_actual, lote.lectura_anterior)
+                except ValidationError as e:
+                    errores.extend(e.messages)
+
+        if 'novedades' in item:
+            novedades = item['novedades']
+            if (not isinstance(novedades, list) or not all(es_entero(n) for n in novedades)
+                    or not set(novedades) <= novedades_validas):
+                errores.append('Hay novedades que no existen')
+
+        for campo, largo in (('novedad_libre', None), ('ubi_gps', 100)):
+            valor = item.get(campo)
+            if valor is not None and (not isinstance(valor, str) or (largo and len(valor) > largo)):
+                errores.append(f'El campo {campo} no es válido')
+
+        if item.get('fecha_hora') and self.fecha_hora(item) is None:
+            errores.append('La fecha y hora no tiene un formato válido (ISO 8601)')
+
+        return errores
+
+    def fecha_hora(self, item):
+        """Momento en que el colector tomó la lectura (si viene sin zona horaria se toma la local)"""
+        try:
+            fecha_hora = parse_datetime(item.get('fecha_hora') or '')
+        except (ValueError, TypeError):
+            return None
+        if fecha_hora is not None and timezone.is_naive(fecha_hora):
+            fecha_hora = timezone.make_aware(fecha_hora)
+        return fecha_hora
+
+
+def evento_sse(nombre, datos):
+    return f'event: {nombre}\ndata: {json.dumps(datos, ensure_ascii=False, separators=(",", ":"))}\n\n'
+
+
+class AvanceRutasView(AsyncApiView):
+    """Avance de las rutas de un periodo en vivo, como server-sent events, para el listado de rutas.
+
+    Al conectarse se manda el estado de todas las rutas (evento "estado", de la caché) y después solo la ruta
+    que cambió (evento "ruta"), a medida que RutaPeriodo.registrar_cambio la publica. Los supervisores
+    conectados no consultan la base por cada cambio, sea cual sea su cantidad.
+    Con WSGI la conexión no queda abierta (ocuparía un hilo por supervisor): se manda el estado y el
+    navegador vuelve a pedirlo cada REINTENTO_SIN_ASGI_MS.
+    """
+    async def get(self, request, ano, mes):
+        if not isinstance(request, ASGIRequest):
+            avance = await sync_to_async(avance_rutas)(ano, mes)
+            response = HttpResponse(f'retry: {REINTENTO_SIN_ASGI_MS}\n\n{evento_sse("estado", avance)}',
+                                    content_type='text/event-stream')
+        else:
+            response = StreamingHttpResponse(self.eventos(ano, mes), content_type='text/event-stream')
+            response['X-Accel-Buffering'] = 'no'   # Que el proxy no junte los eventos
+        patch_cache_control(response, no_cache=True)
+        return response
+
+    async def eventos(self, ano, mes):
+        # Primero la suscripción y después el estado, así no se pierde un cambio que llegue en el medio
+        with backend_avisos().suscribir(canal_periodo(ano, mes)) as suscripcion:
+            yield f'retry: {REINTENTO_EVENTOS_MS}\n\n'
+            yield evento_sse('estado', await sync_to_async(avance_rutas)(ano, mes))
+            while True:
+                mensaje = await suscripcion.recibir(ESPERA_PING)
+                if mensaje is None:
+                    yield ': ping\n\n'
+                elif mensaje['tipo'] == RECARGAR['tipo']:
+                    yield evento_sse('estado', await sync_to_async(avance_rutas)(ano, mes, refrescar=True))
+                else:
+                    yield evento_sse('ruta', mensaje)
+
+
+class BuscarView(ApiView):
+    """Busca clientes por nombre o domicilio y lecturas del periodo por medidor, suministro o cliente.
+
+    Parámetros: q (texto a buscar) y opcionalmente ano y mes (por defecto el periodo elegido en la sesión
+    o el último cargado). Admite prefijos ("rodr"), partes del número de medidor ("1001") y errores de
+    tipeo en los nombres ("rodrigues").
+    """
+    def get(self, request):
+        texto = request.GET.get('q', '').strip()
+        if not texto:
+            return JsonResponse({'error': 'Falta el parámetro "q" con el texto a buscar'}, status=400)
+
+        try:
+            ano = int(request.GET.get('ano') or request.session['periodo_año'])
+            mes = int(request.GET.get('mes') or request.session['periodo_mes'])
+        except (KeyError, ValueError):
+            ano, mes = ultimo_periodo() or (None, None)
+
+        clientes = filtrar_clientes(Cliente.objects.all(), texto).order_by('denominacion').values_list(
+            'cod_cli', 'denominacion', 'domicilio'
+        )[:MAXIMO_RESULTADOS_BUSQUEDA]
+
+        lecturas = filtrar_lecturas(Lote.objects.all(), texto, ano, mes).order_by(
+            'ruta', 'orden'
+        ).values_list(
+            'cod_lectura', 'ruta', 'orden', 'cliente__denominacion', 'cliente__domicilio',
+            'suministro__numero_medidor', 'suministro__numero', 'lectura_actual',
+        )[:MAXIMO_RESULTADOS_BUSQUEDA]
+
+        return JsonResponse({
+            'ano': ano,
+            'mes': mes,
+            'clientes': [
+                {'cod_cli': cod_cli, 'denominacion': denominacion, 'domicilio': domicilio}
+                for cod_cli, denominacion, domicilio in clientes
+            ],
+            'lecturas': [
+                {
+                    'pk': pk, 'ruta': ruta, 'orden': orden, 'cliente': cliente, 'domicilio': domicilio,
+                    'numero_medidor': numero_medidor, 'suministro_numero': suministro_numero,
+                    'leida': lectura_actual is not None,
+                    'url': f"{reverse('tomar_lecturas_periodo', args=[ano, mes, ruta])}?desde={orden}",
+                }
+                for pk, ruta, orden, cliente, domicilio, numero_medidor, suministro_numero, lectura_actual in lecturas
+            ],
+        }, json_dumps_params={'ensure_ascii': False})
@@ -1,6 +1,11 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class LecturasConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'lecturas'
+
+    def ready(self):
+        from .sqlite import aplicar_pragmas
+        connection_created.connect(aplicar_pragmas, dispatch_uid='lecturas_pragmas_sqlite')
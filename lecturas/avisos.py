@@ -0,0 +1,117 @@
+import asyncio
+import functools
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+# Avisos de cambios en las rutas (publicar/suscribir), para que los supervisores vean el avance en vivo.
+# RutaPeriodo.registrar_cambio publica el estado nuevo de la ruta cuando se confirma la transacción y la
+# vista de eventos (api.AvanceRutasView) lo reenvía a cada supervisor conectado, sin volver a consultar la base.
+#
+# El backend se elige con el setting AVISOS, igual que CACHES:
+#   AVISOS = {'BACKEND': 'lecturas.avisos.MemoriaBackend', 'OPCIONES': {'limite_cola': 100}}
+# MemoriaBackend solo reparte dentro del proceso: con varios procesos (varios workers de uvicorn o gunicorn)
+# hace falta un backend que pase por afuera (Redis pub/sub, LISTEN/NOTIFY de PostgreSQL) con la misma interfaz.
+
+# Mensaje que indica que hay que volver a mandar el estado completo del periodo
+RECARGAR = {'tipo': 'recargar'}
+
+
+class BackendAvisos:
+    """Interfaz de los backends: publicar se puede llamar desde cualquier hilo (vistas sincrónicas) y
+    suscribir devuelve un context manager con recibir(), que se espera desde el bucle de eventos"""
+    def publicar(self, canal, mensaje):
+        raise NotImplementedError
+
+    def suscribir(self, canal):
+        raise NotImplementedError
+
+
+class Suscripcion:
+    """Suscripción a un canal de MemoriaBackend, atada al bucle de eventos en que se creó"""
+    def __init__(self, backend, canal, limite_cola):
+        self.backend = backend
+        self.canal = canal
+        self.cola = asyncio.Queue(limite_cola)
+        self.bucle = asyncio.get_running_loop()
+
+    def __enter__(self):
+        self.backend._agregar(self)
+        return self
+
+    def __exit__(self, *exc):
+        self.backend._quitar(self)
+
+    def entregar(self, mensaje):
+        """Corre en el bucle de la suscripción. Si el que mira no da abasto, se descartan los avisos
+        pendientes y se le pide que recargue el estado completo"""
+        try:
+            self.cola.put_nowait(mensaje)
+        except asyncio.QueueFull:
+            while not self.cola.empty():
+                self.cola.get_nowait()
+            self.cola.put_nowait(RECARGAR)
+
+    async def recibir(self, espera):
+        """Devuelve el próximo mensaje, o None si no llegó ninguno en espera segundos"""
+        try:
+            return await asyncio.wait_for(self.cola.get(), espera)
+        except asyncio.TimeoutError:
+            return None
+
+
+class MemoriaBackend(BackendAvisos):
+    """Reparte los avisos entre las suscripciones del mismo proceso"""
+    def __init__(self, limite_cola=100):
+        self.limite_cola = limite_cola
+        self._suscripciones = {}
+        self._candado = threading.Lock()
+
+    def publicar(self, canal, mensaje):
+        with self._candado:
+            destinos = list(self._suscripciones.get(canal, ()))
+        for suscripcion in destinos:
+            try:
+                suscripcion.bucle.call_soon_threadsafe(suscripcion.entregar, mensaje)
+            except RuntimeError:
+                # El bucle ya se cerró; la suscripción se quita sola al salir del with
+                pass
+
+    def suscribir(self, canal):
+        return Suscripcion(self, canal, self.limite_cola)
+
+    def _agregar(self, suscripcion):
+        with self._candado:
+            self._suscripciones.setdefault(suscripcion.canal, set()).add(suscripcion)
+
+    def _quitar(self, suscripcion):
+        with self._candado:
+            suscripciones = self._suscripciones.get(suscripcion.canal, set())
+            suscripciones.discard(suscripcion)
+            if not suscripciones:
+                self._suscripciones.pop(suscripcion.canal, None)
+
+
+@functools.lru_cache(maxsize=None)
+def backend_avisos():
+    configuracion = getattr(settings, 'AVISOS', {})
+    clase = import_string(configuracion.get('BACKEND', 'lecturas.avisos.MemoriaBackend'))
+    return clase(**configuracion.get('OPCIONES', {}))
+
+
+def canal_periodo(ano, mes):
+    return f'avance:{int(ano)}:{int(mes)}'
+
+
+def publicar_avance(ano, mes, estado):
+    """Publica el estado nuevo de una ruta (ruta, version, abierta, total_medidores, leidos)"""
+    backend_avisos().publicar(canal_periodo(ano, mes), {
+        'tipo': 'ruta', **estado, 'faltantes': estado['total_medidores'] - estado['leidos'],
+    })
+
+
+def publicar_recarga(ano, mes):
+    """Avisa que cambió todo el periodo (se reconstruyó el resumen o se abrió de nuevo)"""
+    backend_avisos().publicar(canal_periodo(ano, mes), RECARGAR)
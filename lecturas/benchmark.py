@@ -0,0 +1,167 @@
+import random
+import re
+import statistics
+import time
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+
+from .exportacion import lecturas_a_exportar
+from .models import Cliente, Lote, Novedad, Operador, RutaPeriodo, Suministro
+from .views import desde_posicion
+
+
+# Herramientas para medir el rendimiento de las vistas con datos sintéticos.
+# Las usan los comandos benchmark_vistas y carga_concurrente, siempre sobre una base de prueba.
+
+
+USUARIO_BENCHMARK = 'benchmark'
+CLAVE_BENCHMARK = 'benchmark123'
+NOVEDADES_BENCHMARK = ['Medidor roto', 'Perro suelto', 'Domicilio cerrado', 'Lectura estimada', 'Medidor ilegible']
+
+
+def nombre_ruta(numero):
+    return f'R{numero:04d}'
+
+
+def generar_periodo(ano, mes, medidores, rutas, proporcion_leidos=0.5, tamaño_bloque=5000, semilla=1):
+    """Carga un periodo sintético de medidores repartidos en rutas, con bulk_create de a bloques.
+    En cada ruta quedan leídos los primeros medidores según proporcion_leidos."""
+    azar = random.Random(semilla)
+    por_ruta = max(medidores // rutas, 1)
+    base_cliente = (Cliente.objects.order_by('-cod_cli').values_list('cod_cli', flat=True).first() or 0) + 1
+
+    def filas():
+        for numero in range(medidores):
+            ruta, orden = divmod(numero, por_ruta)
+            yield numero, min(ruta, rutas - 1), orden + 1
+
+    with transaction.atomic():
+        filas_pendientes = filas()
+        while True:
+            bloque = list(islice(filas_pendientes, tamaño_bloque))
+            if not bloque:
+                break
+            Cliente.objects.bulk_create(
+                Cliente(cod_cli=base_cliente + numero, denominacion=f'Cliente {numero}', domicilio=f'Calle {numero}')
+                for numero, ruta, orden in bloque
+            )
+            suministros = Suministro.objects.resolver(
+                (f'S{numero:08d}', f'M{numero:08d}', 'MONOFASICO') for numero, ruta, orden in bloque
+            )
+            lotes = []
+            for numero, ruta, orden in bloque:
+                lectura_anterior = azar.randint(100, 90000)
+                leido = orden <= por_ruta * proporcion_leidos
+                consumo = azar.randint(50, 600) if leido else None
+                lotes.append(Lote(
+                    ano_consumo=ano,
+                    mes_consumo=mes,
+                    cliente_id=base_cliente + numero,
+                    suministro_id=suministros[f'S{numero:08d}', f'M{numero:08d}'],
+                    area=f'A{ruta % 10}',
+                    ruta=nombre_ruta(ruta),
+                    orden=orden,
+                    lectura_anterior=lectura_anterior,
+                    lectura_actual=lectura_anterior + consumo if leido else None,
+                    consumo_kwh=consumo,
+                ))
+            Lote.objects.bulk_create(lotes)
+        Cliente.ajustar_secuencia()
+        RutaPeriodo.reconstruir(ano, mes)
+
+
+def preparar_usuario():
+    """Crea (si no existe) el catálogo de novedades y un supervisor con operador para recorrer las vistas"""
+    for descripcion in NOVEDADES_BENCHMARK:
+        Novedad.objects.get_or_create(descripcion=descripcion)
+    usuario = User.objects.filter(username=USUARIO_BENCHMARK).first()
+    if usuario is None:
+        usuario = User.objects.create_user(USUARIO_BENCHMARK, password=CLAVE_BENCHMARK, first_name='Benchmark',
+                                           is_staff=True)
+        Operador.objects.create(user=usuario)
+    return usuario
+
+
+class Medicion:
+    """Cuenta consultas y tiempo de SQL de todo lo que se ejecute dentro del bloque with"""
+    def __init__(self):
+        self.consultas = 0
+        self.tiempo_sql = 0.0
+        self.tiempo_total = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.consultas += 1
+            self.tiempo_sql += time.perf_counter() - inicio
+
+    def __enter__(self):
+        self._wrapper = connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tiempo_total = time.perf_counter() - self._inicio
+        self._wrapper.__exit__(*exc)
+
+
+def medir(cliente, metodo, url, datos=None, **extra):
+    """Hace la petición con el cliente de pruebas y devuelve (respuesta, medición).
+    Las respuestas en streaming se consumen enteras dentro de la medición."""
+    with Medicion() as medicion:
+        if metodo == 'get':
+            respuesta = cliente.get(url, datos, **extra)
+        elif isinstance(datos, (str, bytes)):
+            respuesta = cliente.post(url, datos, content_type='application/json', **extra)
+        else:
+            respuesta = cliente.post(url, datos, **extra)
+        if respuesta.streaming:
+            b''.join(respuesta.streaming_content)
+    return respuesta, medicion
+
+
+def resumir(mediciones):
+    """Resume varias mediciones del mismo escenario: la primera es con la caché vacía"""
+    primera = mediciones[0]
+    return {
+        'consultas': primera.consultas,
+        'consultas_cache': min(m.consultas for m in mediciones),
+        'sql_ms': statistics.median(m.tiempo_sql for m in mediciones) * 1000,
+        'total_ms': statistics.median(m.tiempo_total for m in mediciones) * 1000,
+        'maximo_ms': max(m.tiempo_total for m in mediciones) * 1000,
+    }
+
+
+# Planes que indican que se recorre toda la tabla (SQLite y PostgreSQL) o que se ordena en memoria
+RECORRIDO_COMPLETO = re.compile(r'\bSCAN lecturas_lote\b|Seq Scan on lecturas_lote')
+ORDEN_EN_MEMORIA = re.compile(r'USE TEMP B-TREE FOR ORDER BY')
+
+
+def consultas_con_indice(ano, mes):
+    """Consultas de las vistas que tienen que resolverse con un índice de Lote.
+
+    Devuelve (nombre, consulta, tiene que venir ordenada por el índice). Las usan verificar_indices y los tests.
+    """
+    ruta = Lote.objects.filter(ano_consumo=ano, mes_consumo=mes).values_list('ruta', flat=True).first() or ''
+    periodo = Lote.objects.filter(ano_consumo=ano, mes_consumo=mes)
+    de_la_ruta = periodo.filter(ruta=ruta)
+    return [
+        ('TomarLecturasView', desde_posicion(de_la_ruta, 1, 0).order_by('orden', 'cod_lectura'), True),
+        ('TomarLecturasView (pendientes)', desde_posicion(
+            de_la_ruta.filter(lectura_actual__isnull=True), 1, 0
+        ).order_by('orden', 'cod_lectura'), True),
+        ('DashboardView (mis lecturas)', periodo.filter(operador_id=0).order_by(), False),
+        ('Exportación a comercial', lecturas_a_exportar(ano, mes), True),
+        ('Sincronización de colectores', de_la_ruta.filter(version__gt=0).order_by(), False),
+    ]
+
+
+def problema_en_plan(plan, ordenada):
+    """Devuelve el fragmento del plan que indica que no se usa el índice, o None si está bien"""
+    problema = RECORRIDO_COMPLETO.search(plan) or (ordenada and ORDEN_EN_MEMORIA.search(plan))
+    return problema.group() if problema else None
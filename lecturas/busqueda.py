@@ -0,0 +1,148 @@
+import difflib
+import functools
+import re
+import unicodedata
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+
+# Búsqueda de clientes (nombre y domicilio) y de lecturas (medidor y suministro).
+# En SQLite usa los índices FTS5 que crean las migraciones 0006_busqueda y 0010_suministros; en otros
+# motores, o si el SQLite no tiene FTS5, cae en consultas icontains comunes.
+
+LARGO_MINIMO_CORRECCION = 4   # Las palabras más cortas y los números no se corrigen (hay demasiados parecidos)
+MAXIMO_CANDIDATOS = 5000
+
+CLIENTES_FTS = 'SELECT rowid FROM lecturas_cliente_fts WHERE lecturas_cliente_fts MATCH %s'
+SUMINISTROS_FTS = 'SELECT rowid FROM lecturas_suministro_fts WHERE lecturas_suministro_fts MATCH %s'
+
+
+@functools.lru_cache(maxsize=None)
+def _tablas_fts(nombre_base):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM sqlite_master WHERE name IN ('lecturas_cliente_fts', 'lecturas_suministro_fts')"
+        )
+        return cursor.fetchone()[0] == 2
+
+
+def fts_disponible():
+    return connection.vendor == 'sqlite' and _tablas_fts(str(connection.settings_dict['NAME']))
+
+
+def palabras(texto):
+    """Separa el texto en palabras en minúsculas y sin acentos (igual que el tokenizador de FTS5)"""
+    texto = unicodedata.normalize('NFKD', texto.lower())
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return re.findall(r'\w+', texto)
+
+
+def corregir(palabra):
+    """Si ninguna palabra indexada empieza con palabra, devuelve las más parecidas (errores de tipeo)"""
+    if len(palabra) < LARGO_MINIMO_CORRECCION or palabra.isdigit():
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM lecturas_cliente_fts_vocab WHERE term >= %s AND term < %s LIMIT 1',
+            [palabra, palabra + '\uffff'],
+        )
+        if cursor.fetchone():
+            return []
+        # Los candidatos comparten las dos primeras letras, así no se recorre todo el vocabulario
+        cursor.execute(
+            'SELECT term FROM lecturas_cliente_fts_vocab WHERE term >= %s AND term < %s LIMIT %s',
+            [palabra[:2], palabra[:2] + '\uffff', MAXIMO_CANDIDATOS],
+        )
+        candidatos = [term for term, in cursor.fetchall()]
+    return difflib.get_close_matches(palabra, candidatos, n=3, cutoff=0.75)
+
+
+def expresion_fts(texto, tolerar_errores=False):
+    """Arma la expresión MATCH para clientes: todas las palabras tienen que aparecer, como prefijo.
+    Con tolerar_errores, a las palabras que no existen en el índice se les suman las más parecidas."""
+    grupos = []
+    for palabra in palabras(texto):
+        alternativas = [f'"{palabra}"*']
+        if tolerar_errores:
+            alternativas += [f'"{parecida}"' for parecida in corregir(palabra)]
+        grupos.append(alternativas[0] if len(alternativas) == 1 else f'({" OR ".join(alternativas)})')
+    return ' '.join(grupos) or None
+
+
+def expresion_trigram(texto):
+    """Arma la expresión MATCH para medidores y suministros: cada parte del texto puede estar en cualquier
+    lugar del número. El índice trigram no encuentra textos de menos de 3 caracteres."""
+    partes = [parte for parte in re.findall(r'\w+', texto.lower()) if len(parte) >= 3]
+    return ' '.join(f'"{parte}"' for parte in partes) or None
+
+
+def filtrar_clientes(queryset, texto):
+    """Filtra un queryset de Cliente por nombre o domicilio"""
+    if not fts_disponible():
+        consulta = Q()
+        for palabra in texto.split():
+            consulta &= Q(denominacion__icontains=palabra) | Q(domicilio__icontains=palabra)
+        return queryset.filter(consulta)
+
+    expresion = expresion_fts(texto, tolerar_errores=True)
+    if expresion is None:
+        return queryset.none()
+    return queryset.filter(pk__in=RawSQL(CLIENTES_FTS, [expresion]))
+
+
+def filtrar_suministros(queryset, texto):
+    """Filtra un queryset de Suministro por número de suministro o de medidor"""
+    if not fts_disponible():
+        consulta = Q()
+        for palabra in texto.split():
+            consulta &= Q(numero_medidor__icontains=palabra) | Q(numero__icontains=palabra)
+        return queryset.filter(consulta)
+
+    expresion = expresion_trigram(texto)
+    if expresion is None:
+        return queryset.none()
+    return queryset.filter(pk__in=RawSQL(SUMINISTROS_FTS, [expresion]))
+
+
+def filtrar_lecturas(queryset, texto, ano=None, mes=None):
+    """Filtra un queryset de Lote por número de medidor, número de suministro o nombre/domicilio del cliente.
+
+    Si se pasa el periodo, el filtro va dentro de la subconsulta con +columna para que SQLite no use el
+    índice del periodo (que recorrería todas sus lecturas) y parta de los resultados del índice FTS5.
+    """
+    if not fts_disponible():
+        if ano is not None and mes is not None:
+            queryset = queryset.filter(ano_consumo=ano, mes_consumo=mes)
+        consulta = Q()
+        for palabra in texto.split():
+            consulta &= (Q(suministro__numero_medidor__icontains=palabra) | Q(suministro__numero__icontains=palabra)
+                         | Q(cliente__denominacion__icontains=palabra) | Q(cliente__domicilio__icontains=palabra))
+        return queryset.filter(consulta)
+
+    periodo, parametros_periodo = '', []
+    if ano is not None and mes is not None:
+        periodo, parametros_periodo = ' AND +ano_consumo = %s AND +mes_consumo = %s', [ano, mes]
+
+    partes, parametros = [], []
+    expresion = expresion_trigram(texto)
+    if expresion:
+        partes.append(f'SELECT cod_lectura FROM lecturas_lote WHERE suministro_id IN ({SUMINISTROS_FTS}){periodo}')
+        parametros += [expresion, *parametros_periodo]
+    expresion = expresion_fts(texto, tolerar_errores=True)
+    if expresion:
+        partes.append(f'SELECT cod_lectura FROM lecturas_lote WHERE cliente_id IN ({CLIENTES_FTS}){periodo}')
+        parametros += [expresion, *parametros_periodo]
+
+    if not partes:
+        return queryset.none()
+    return queryset.filter(pk__in=RawSQL(' UNION '.join(partes), parametros))
+
+
+def reconstruir_indices():
+    """Vuelve a generar los índices FTS5 desde las tablas (por si se cargaron datos sin los triggers)"""
+    with connection.cursor() as cursor:
+        for tabla in ('lecturas_cliente_fts', 'lecturas_suministro_fts'):
+            cursor.execute(f"INSERT INTO {tabla}({tabla}) VALUES ('rebuild')")
+            cursor.execute(f"INSERT INTO {tabla}({tabla}) VALUES ('optimize')")
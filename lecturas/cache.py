@@ -0,0 +1,124 @@
+import time
+
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+
+from .models import Lote, Novedad, RutaPeriodo
+
+
+TIEMPO_CACHE = 60 * 60   # Una hora; igual las claves cambian solas cuando se invalida la versión
+
+
+def _clave_version(nombre):
+    return f'lecturas:version:{nombre}'
+
+
+def obtener_version(nombre):
+    """Devuelve el contador de versión asociado a nombre (lo crea si no existe).
+
+    El valor inicial se toma del reloj para que, si la caché pierde el contador, la nueva
+    versión nunca coincida con una anterior y no se sirvan datos viejos.
+    """
+    clave = _clave_version(nombre)
+    version = cache.get(clave)
+    if version is None:
+        cache.add(clave, time.time_ns(), None)
+        version = cache.get(clave, time.time_ns())
+    return version
+
+
+def invalidar(nombre):
+    """Incrementa la versión de nombre, con lo que todas las claves que dependen de ella quedan viejas"""
+    clave = _clave_version(nombre)
+    try:
+        return cache.incr(clave)
+    except ValueError:
+        version = time.time_ns()
+        cache.set(clave, version, None)
+        return version
+
+
+def nombre_periodo(ano, mes):
+    return f'periodo:{int(ano)}:{int(mes)}'
+
+
+def invalidar_periodo(ano, mes):
+    """Se llama cada vez que cambian las lecturas o el estado de las rutas de un periodo"""
+    invalidar(nombre_periodo(ano, mes))
+
+
+def ultimo_periodo():
+    """Devuelve (año, mes) del último periodo cargado, o None si no hay lecturas"""
+    clave = f'lecturas:ultimo_periodo:{obtener_version("periodos")}'
+    periodo = cache.get(clave)
+    if periodo is None:
+        periodo = Lote.objects.order_by('-ano_consumo', '-mes_consumo').values_list(
+            'ano_consumo', 'mes_consumo'
+        ).first() or ()
+        cache.set(clave, periodo, TIEMPO_CACHE)
+    return tuple(periodo) or None
+
+
+def catalogo_novedades():
+    """Lista de (cod_novedad, descripcion) de los tipos de novedad. Se invalida al crear, editar o borrar uno"""
+    clave = f'lecturas:catalogo_novedades:{obtener_version("novedades")}'
+    catalogo = cache.get(clave)
+    if catalogo is None:
+        catalogo = list(Novedad.objects.order_by('cod_novedad').values_list('cod_novedad', 'descripcion'))
+        cache.set(clave, catalogo, TIEMPO_CACHE)
+    return catalogo
+
+
+def estado_rutas(ano, mes):
+    """Diccionario {ruta: abierta} del periodo, leído de RutaPeriodo y cacheado hasta el próximo cambio"""
+    clave = f'lecturas:estado_rutas:{int(ano)}:{int(mes)}:{obtener_version(nombre_periodo(ano, mes))}'
+    estados = cache.get(clave)
+    if estados is None:
+        estados = dict(RutaPeriodo.objects.filter(ano_consumo=ano, mes_consumo=mes).values_list('ruta', 'abierta'))
+        cache.set(clave, estados, TIEMPO_CACHE)
+    return estados
+
+
+def ruta_abierta(ano, mes, ruta):
+    """Indica si se pueden registrar lecturas en la ruta (las rutas que no existen se consideran cerradas)"""
+    return estado_rutas(ano, mes).get(ruta, False)
+
+
+def avance_rutas(ano, mes, refrescar=False):
+    """Avance de cada ruta del periodo (lo que muestra el listado de rutas), cacheado hasta el próximo cambio.
+    Es el estado inicial que reciben los supervisores al conectarse a los avisos en vivo. Con refrescar se lee
+    de la base aunque esté en la caché (el aviso de recarga puede llegar antes de que se invalide)"""
+    clave = f'lecturas:avance_rutas:{int(ano)}:{int(mes)}:{obtener_version(nombre_periodo(ano, mes))}'
+    avance = None if refrescar else cache.get(clave)
+    if avance is None:
+        avance = [
+            {**ruta, 'faltantes': ruta['total_medidores'] - ruta['leidos']}
+            for ruta in RutaPeriodo.objects.filter(ano_consumo=ano, mes_consumo=mes).order_by('ruta').values(
+                'ruta', 'version', 'abierta', 'total_medidores', 'leidos'
+            )
+        ]
+        cache.set(clave, avance, TIEMPO_CACHE)
+    return avance
+
+
+def estadisticas_periodo(ano, mes, operador=None):
+    """Estadísticas del dashboard para un periodo, calculadas sobre el resumen de rutas y cacheadas"""
+    version = obtener_version(nombre_periodo(ano, mes))
+    cod_ope = operador.cod_ope if operador else 0
+    clave = f'lecturas:estadisticas:{int(ano)}:{int(mes)}:{cod_ope}:{version}'
+
+    estadisticas = cache.get(clave)
+    if estadisticas is None:
+        estadisticas = RutaPeriodo.objects.filter(ano_consumo=ano, mes_consumo=mes).aggregate(
+            total_rutas=Count('pk'),
+            rutas_abiertas=Count('pk', filter=Q(abierta=True)),
+            total_lecturas=Sum('total_medidores', default=0),
+            lecturas_tomadas=Sum('leidos', default=0),
+        )
+        estadisticas['mis_lecturas'] = Lote.objects.filter(
+            ano_consumo=ano, mes_consumo=mes, operador=operador
+        ).count() if operador else 0
+        estadisticas['lecturas_pendientes'] = estadisticas['total_lecturas'] - estadisticas['lecturas_tomadas']
+        cache.set(clave, estadisticas, TIEMPO_CACHE)
+
+    return estadisticas
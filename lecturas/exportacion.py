@@ -0,0 +1,85 @@
+import csv
+import json
+from array import array
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from .models import Lote, RutaPeriodo
+
+
+# Columnas que recibe el sistema comercial (cod_lectura va primero porque se usa para marcar lo enviado)
+COLUMNAS_EXPORTACION = [
+    'cod_lectura', 'ano_consumo', 'mes_consumo', 'suministro_numero', 'area', 'ruta', 'orden',
+    'numero_medidor', 'lectura_anterior', 'lectura_actual', 'consumo_kwh', 'novedad_libre',
+    'fecha_hora_registro', 'ubi_gps',
+]
+
+# De dónde sale cada columna cuando no es un campo de Lote (los datos del medidor están en Suministro)
+CAMPOS_SUMINISTRO = {'suministro_numero': 'suministro__numero', 'numero_medidor': 'suministro__numero_medidor'}
+
+FORMATOS = ['csv', 'json']
+
+
+class _Eco:
+    """Objeto tipo archivo que devuelve lo que se escribe, para usar csv.writer sin buffer"""
+    def write(self, valor):
+        return valor
+
+
+def lecturas_a_exportar(ano, mes, solo_pendientes=True):
+    """Lecturas de las rutas cerradas del periodo, como tuplas y ordenadas por ruta y código"""
+    cerradas = RutaPeriodo.objects.filter(ano_consumo=ano, mes_consumo=mes, abierta=False).values('ruta')
+    lecturas = Lote.objects.filter(ano_consumo=ano, mes_consumo=mes, ruta__in=cerradas)
+    if solo_pendientes:
+        lecturas = lecturas.filter(enviado_comercial=False)
+    return lecturas.order_by('ruta', 'cod_lectura').values_list(
+        *(CAMPOS_SUMINISTRO.get(columna, columna) for columna in COLUMNAS_EXPORTACION)
+    )
+
+
+def generar_exportacion(ano, mes, formato='csv', tamaño_bloque=2000, solo_pendientes=True):
+    """Generador que devuelve la exportación del periodo en bloques de texto.
+
+    Las filas se leen con iterator() de a tamaño_bloque; de cada una solo se guarda el código
+    (8 bytes). Las lecturas se marcan como enviadas a comercial recién cuando el consumidor pide
+    algo más después del último bloque, es decir, cuando ya escribió la exportación completa: si la
+    descarga se corta a la mitad no se marca nada y se puede volver a exportar.
+    """
+    filas = lecturas_a_exportar(ano, mes, solo_pendientes).iterator(chunk_size=tamaño_bloque)
+    enviados = array('q')
+
+    if formato == 'csv':
+        escritor = csv.writer(_Eco(), delimiter=';')
+        yield escritor.writerow(COLUMNAS_EXPORTACION)
+    else:
+        yield '['
+
+    primero = True
+    while True:
+        bloque = list(islice(filas, tamaño_bloque))
+        if not bloque:
+            break
+
+        if formato == 'csv':
+            yield ''.join(escritor.writerow(fila) for fila in bloque)
+        else:
+            texto = ',\n'.join(
+                json.dumps(dict(zip(COLUMNAS_EXPORTACION, fila)), cls=DjangoJSONEncoder) for fila in bloque
+            )
+            yield texto if primero else ',\n' + texto
+        primero = False
+        enviados.extend(fila[0] for fila in bloque)
+
+    if formato == 'json':
+        yield ']\n'
+
+    with transaction.atomic():
+        for inicio in range(0, len(enviados), tamaño_bloque):
+            marcar_enviados(enviados[inicio:inicio + tamaño_bloque].tolist())
+
+
+def marcar_enviados(codigos):
+    """Marca como enviadas a comercial las lecturas indicadas con un único UPDATE"""
+    return Lote.objects.filter(cod_lectura__in=codigos).update(enviado_comercial=True)
@@ -1,9 +1,24 @@
 from django import forms
 from django.core.exceptions import ValidationError
 from .models import Lote, Novedad
+from .cache import catalogo_novedades
 from datetime import datetime
 
 
+def validar_lectura(lectura_actual, lectura_anterior):
+    """Reglas de validación de una lectura, compartidas por el formulario y la API de los colectores"""
+    # Validar que sea mayor a 0
+    if lectura_actual is not None and lectura_actual <= 0:
+        raise ValidationError('La lectura debe ser mayor a 0')
+    
+    # Validar que sea mayor o igual a lectura anterior
+    if lectura_actual is not None and lectura_anterior is not None:
+        if lectura_actual < lectura_anterior:
+            raise ValidationError(
+                f'La lectura actual ({lectura_actual}) no puede ser menor a la lectura anterior ({lectura_anterior})'
+            )
+
+
 class LoginForm(forms.Form):
     """Formulario de login"""
     username = forms.CharField(
@@ -79,18 +94,7 @@ class LecturaForm(forms.ModelForm):
     
     def clean_lectura_actual(self):
         lectura_actual = self.cleaned_data.get('lectura_actual')
-        
-        # Validar que sea mayor a 0
-        if lectura_actual is not None and lectura_actual <= 0:
-            raise ValidationError('La lectura debe ser mayor a 0')
-        
-        # Validar que sea mayor o igual a lectura anterior
-        if lectura_actual is not None and self.lectura_anterior is not None:
-            if lectura_actual < self.lectura_anterior:
-                raise ValidationError(
-                    f'La lectura actual ({lectura_actual}) no puede ser menor a la lectura anterior ({self.lectura_anterior})'
-                )
-        
+        validar_lectura(lectura_actual, self.lectura_anterior)
         return lectura_actual
 
 
@@ -114,10 +118,8 @@ class NovedadForm(forms.Form):
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        # Cargar novedades predefinidas dinámicamente
-        self.fields['novedades_predefinidas'].choices = [
-            (nov.cod_novedad, nov.descripcion) for nov in Novedad.objects.all()
-        ]
+        # Cargar novedades predefinidas dinámicamente (desde la caché, no hace falta ir a la base cada vez)
+        self.fields['novedades_predefinidas'].choices = catalogo_novedades()
     
     def clean(self):
         cleaned_data = super().clean()
@@ -0,0 +1,91 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from lecturas.cache import invalidar, invalidar_periodo
+from lecturas.models import Lote, RutaPeriodo
+
+
+# Columnas que se copian tal cual del periodo anterior
+COLUMNAS_COPIADAS = ['cliente', 'suministro', 'area', 'ruta', 'orden']
+
+
+class Command(BaseCommand):
+    help = ('Abre un periodo nuevo copiando los medidores del periodo anterior, con la lectura actual '
+            '(o la anterior si no se leyó) como lectura anterior')
+
+    def add_arguments(self, parser):
+        parser.add_argument('ano', type=int, help='Año de consumo del periodo nuevo (AAAA)')
+        parser.add_argument('mes', type=int, help='Mes de consumo del periodo nuevo (1-12)')
+        parser.add_argument('--desde', type=int, nargs=2, metavar=('AAAA', 'MM'),
+                            help='Periodo del que se copian los medidores (por defecto el mes anterior)')
+
+    def handle(self, *args, **options):
+        ano, mes = options['ano'], options['mes']
+        if not 1 <= mes <= 12:
+            raise CommandError('El mes debe estar entre 1 y 12')
+        ano_origen, mes_origen = options['desde'] or ((ano, mes - 1) if mes > 1 else (ano - 1, 12))
+        if (ano_origen, mes_origen) == (ano, mes):
+            raise CommandError('El periodo de origen tiene que ser distinto del nuevo')
+
+        rutas = list(Lote.objects.filter(ano_consumo=ano_origen, mes_consumo=mes_origen).order_by('ruta')
+                     .values_list('ruta', flat=True).distinct())
+        if not rutas:
+            raise CommandError(f'El periodo {mes_origen}/{ano_origen} no tiene lecturas')
+        ya_abiertas = set(Lote.objects.filter(ano_consumo=ano, mes_consumo=mes).order_by()
+                          .values_list('ruta', flat=True).distinct())
+
+        sql, parametros_fijos = self.armar_insert(ano, mes, ano_origen, mes_origen)
+        inicio = time.monotonic()
+        total = 0
+
+        # Cada ruta es una transacción: si el comando se corta, se vuelve a correr y sigue con las que faltan
+        for numero, ruta in enumerate(rutas, start=1):
+            if ruta in ya_abiertas:
+                self.stdout.write(f'  [{numero}/{len(rutas)}] Ruta {ruta}: ya estaba abierta, se saltea')
+                continue
+
+            inicio_ruta = time.monotonic()
+            with transaction.atomic(), connection.cursor() as cursor:
+                # Vuelvo a verificar dentro de la transacción por si otra ejecución abrió la ruta recién
+                if Lote.objects.filter(ano_consumo=ano, mes_consumo=mes, ruta=ruta).exists():
+                    continue
+                cursor.execute(sql, [*parametros_fijos, ruta])
+                filas = cursor.rowcount
+            total += filas
+            self.stdout.write(f'  [{numero}/{len(rutas)}] Ruta {ruta}: {filas} medidores '
+                              f'en {time.monotonic() - inicio_ruta:.2f}s')
+
+        RutaPeriodo.reconstruir(ano, mes)
+        invalidar('periodos')
+        invalidar_periodo(ano, mes)
+
+        transcurrido = time.monotonic() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f'Periodo {mes}/{ano} abierto desde {mes_origen}/{ano_origen}: {total} lecturas nuevas '
+            f'en {transcurrido:.1f}s ({total / max(transcurrido, 1e-9):.0f} filas/s)'
+        ))
+
+    def armar_insert(self, ano, mes, ano_origen, mes_origen):
+        """Arma el INSERT ... SELECT de una ruta: las filas se copian dentro de la base, sin pasar por Python.
+        Los nombres salen del modelo y los valores van como parámetros, así sirve en cualquier motor."""
+        campos = Lote._meta
+
+        def columna(nombre):
+            return connection.ops.quote_name(campos.get_field(nombre).column)
+
+        copiadas = [columna(nombre) for nombre in COLUMNAS_COPIADAS]
+
+        destino = copiadas + [columna(nombre) for nombre in (
+            'ano_consumo', 'mes_consumo', 'lectura_anterior', 'abierta', 'enviado_comercial', 'version',
+        )]
+        origen = copiadas + ['%s', '%s', f'COALESCE({columna("lectura_actual")}, {columna("lectura_anterior")})',
+                             '%s', '%s', '%s']
+        sql = (
+            f'INSERT INTO {connection.ops.quote_name(campos.db_table)} ({", ".join(destino)}) '
+            f'SELECT {", ".join(origen)} FROM {connection.ops.quote_name(campos.db_table)} '
+            f'WHERE {columna("ano_consumo")} = %s AND {columna("mes_consumo")} = %s AND {columna("ruta")} = %s '
+            f'ORDER BY {columna("orden")}'
+        )
+        return sql, [ano, mes, True, False, 0, ano_origen, mes_origen]
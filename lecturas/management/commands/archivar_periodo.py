@@ -0,0 +1,126 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from lecturas.cache import invalidar, invalidar_periodo
+from lecturas.models import (AnomaliaConsumo, AnomaliaConsumoHistorica, Lote, LoteHistorico, NovedadLectura,
+                             NovedadLecturaHistorica, RutaPeriodo)
+
+
+class Command(BaseCommand):
+    help = ('Pasa un periodo ya exportado a comercial de la tabla de lecturas a la de lecturas archivadas '
+            '(o lo vuelve a traer con --restaurar), así la tabla de trabajo solo tiene los periodos en curso')
+
+    def add_arguments(self, parser):
+        parser.add_argument('ano', type=int, help='Año de consumo (AAAA)')
+        parser.add_argument('mes', type=int, help='Mes de consumo (1-12)')
+        parser.add_argument('--restaurar', action='store_true',
+                            help='Devuelve el periodo archivado a la tabla de trabajo')
+
+    def handle(self, *args, **options):
+        ano, mes = options['ano'], options['mes']
+        if not 1 <= mes <= 12:
+            raise CommandError('El mes debe estar entre 1 y 12')
+
+        if options['restaurar']:
+            origen = (LoteHistorico, NovedadLecturaHistorica, AnomaliaConsumoHistorica)
+            destino = (Lote, NovedadLectura, AnomaliaConsumo)
+            if Lote.objects.filter(ano_consumo=ano, mes_consumo=mes).exists():
+                raise CommandError(f'El periodo {mes}/{ano} ya tiene lecturas en la tabla de trabajo')
+        else:
+            origen = (Lote, NovedadLectura, AnomaliaConsumo)
+            destino = (LoteHistorico, NovedadLecturaHistorica, AnomaliaConsumoHistorica)
+            if Lote.objects.filter(ano_consumo=ano, mes_consumo=mes, enviado_comercial=False).exists():
+                raise CommandError(f'El periodo {mes}/{ano} tiene lecturas sin exportar a comercial; '
+                                   'solo se archivan periodos exportados completos')
+            if LoteHistorico.objects.filter(ano_consumo=ano, mes_consumo=mes).exists():
+                raise CommandError(f'El periodo {mes}/{ano} ya tiene lecturas archivadas')
+
+        rutas = list(origen[0].objects.filter(ano_consumo=ano, mes_consumo=mes).order_by('ruta')
+                     .values_list('ruta', flat=True).distinct())
+        if not rutas:
+            donde = 'archivadas' if options['restaurar'] else 'en la tabla de trabajo'
+            raise CommandError(f'El periodo {mes}/{ano} no tiene lecturas {donde}')
+
+        sentencias = self.armar_sentencias(origen, destino)
+        inicio = time.monotonic()
+        total = 0
+
+        # Una transacción por ruta: si se corta, se vuelve a correr (con --restaurar o sin) y no queda nada a medias
+        for numero, ruta in enumerate(rutas, start=1):
+            with transaction.atomic(), connection.cursor() as cursor:
+                if not options['restaurar']:
+                    self.guardar_version(ano, mes, ruta)
+                filas = 0
+                for sql, cuenta in sentencias:
+                    cursor.execute(sql, [ano, mes, ruta])
+                    if cuenta:
+                        filas = cursor.rowcount
+                if not options['restaurar']:
+                    # Sin lecturas en la tabla de trabajo la ruta no tiene nada que mostrar en el listado
+                    RutaPeriodo.objects.filter(ano_consumo=ano, mes_consumo=mes, ruta=ruta).delete()
+            total += filas
+            self.stdout.write(f'  [{numero}/{len(rutas)}] Ruta {ruta}: {filas} lecturas')
+
+        if options['restaurar']:
+            # El resumen se borró al archivar: se arma de nuevo, con una versión mayor que la que tenía la ruta
+            RutaPeriodo.reconstruir(ano, mes)
+        invalidar('periodos')
+        invalidar_periodo(ano, mes)
+
+        transcurrido = time.monotonic() - inicio
+        accion = 'restaurado' if options['restaurar'] else 'archivado'
+        self.stdout.write(self.style.SUCCESS(
+            f'Periodo {mes}/{ano} {accion}: {total} lecturas en {transcurrido:.1f}s '
+            f'({total / max(transcurrido, 1e-9):.0f} filas/s)'
+        ))
+
+    def guardar_version(self, ano, mes, ruta):
+        """Deja en las lecturas de la ruta la versión de su resumen, que se borra al archivar. Al restaurar,
+        RutaPeriodo.reconstruir parte de la mayor versión de las lecturas, así la ruta nunca vuelve a una versión
+        que los colectores o los navegadores ya tienen con otro contenido."""
+        version = RutaPeriodo.objects.filter(ano_consumo=ano, mes_consumo=mes, ruta=ruta).values_list(
+            'version', flat=True
+        ).first()
+        if version:
+            Lote.objects.filter(ano_consumo=ano, mes_consumo=mes, ruta=ruta).update(version=version)
+
+    def armar_sentencias(self, origen, destino):
+        """Arma las sentencias que mueven una ruta (los parámetros son año, mes y ruta). Se copian las lecturas,
+        sus novedades y sus anomalías (con la revisión) y después se borran del origen, todo dentro de la base y con
+        los mismos códigos."""
+        lotes, novedades, anomalias = origen
+        lotes_destino, novedades_destino, anomalias_destino = destino
+
+        def tabla(modelo):
+            return connection.ops.quote_name(modelo._meta.db_table)
+
+        def columnas(modelo):
+            return ', '.join(connection.ops.quote_name(campo.column) for campo in modelo._meta.concrete_fields)
+
+        def columna(modelo, nombre):
+            return connection.ops.quote_name(modelo._meta.get_field(nombre).column)
+
+        # Las dos tablas de cada par tienen las mismas columnas
+        for modelo, modelo_destino in zip(origen, destino):
+            assert columnas(modelo) == columnas(modelo_destino)
+
+        ruta = (f'{columna(lotes, "ano_consumo")} = %s AND {columna(lotes, "mes_consumo")} = %s '
+                f'AND {columna(lotes, "ruta")} = %s')
+        lecturas_ruta = f'SELECT {columna(lotes, "cod_lectura")} FROM {tabla(lotes)} WHERE {ruta}'
+
+        sentencias = [
+            (f'INSERT INTO {tabla(lotes_destino)} ({columnas(lotes)}) '
+             f'SELECT {columnas(lotes)} FROM {tabla(lotes)} WHERE {ruta}', True),
+        ]
+        # Las novedades y las anomalías se copian y se borran antes que las lecturas a las que apuntan
+        for modelo, modelo_destino in ((novedades, novedades_destino), (anomalias, anomalias_destino)):
+            de_la_ruta = f'{columna(modelo, "lectura")} IN ({lecturas_ruta})'
+            sentencias += [
+                (f'INSERT INTO {tabla(modelo_destino)} ({columnas(modelo)}) '
+                 f'SELECT {columnas(modelo)} FROM {tabla(modelo)} WHERE {de_la_ruta}', False),
+                (f'DELETE FROM {tabla(modelo)} WHERE {de_la_ruta}', False),
+            ]
+        sentencias.append((f'DELETE FROM {tabla(lotes)} WHERE {ruta}', False))
+        return sentencias
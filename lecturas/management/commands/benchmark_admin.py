@@ -0,0 +1,120 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from lecturas.benchmark import generar_periodo, medir, nombre_ruta, resumir
+from lecturas.models import AnomaliaConsumo, Lote, Novedad, NovedadLectura
+
+
+ANO, MES = 2026, 1
+
+# Máximo de consultas por página del admin. Incluye sesión, usuario y los mensajes del admin; no depende de la
+# cantidad de lecturas ni de filas por página (un N+1 o un COUNT de más lo hace fallar).
+LIMITES_CONSULTAS = {
+    'lotes': 6,
+    'lotes (periodo)': 6,
+    'lotes (periodo y ruta)': 6,
+    'lotes (búsqueda)': 8,   # Los términos del índice de texto completo
+    'lote (edición)': 7,
+    'novedades_lectura': 7,
+    'suministros': 5,
+    'anomalias': 6,
+    'autocompletar suministro': 5,
+}
+
+
+class Command(BaseCommand):
+    help = ('Genera un periodo sintético grande en una base de prueba y mide consultas y latencia de los listados '
+            'del admin de lecturas, novedades, suministros y anomalías')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--medidores', type=int, default=100000, help='Cantidad de lecturas del periodo sintético')
+        parser.add_argument('--rutas', type=int, default=100, help='Cantidad de rutas en que se reparten')
+        parser.add_argument('--repeticiones', type=int, default=3, help='Veces que se mide cada escenario')
+        parser.add_argument('--sin-limites', action='store_true', help='Solo informa, no falla por exceder límites')
+
+    def handle(self, *args, **options):
+        if options['medidores'] < options['rutas'] or options['rutas'] <= 0:
+            raise CommandError('Tiene que haber al menos un medidor por ruta')
+
+        setup_test_environment()
+        nombre_original = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            resultados = self.correr(options)
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+            teardown_test_environment()
+
+        self.informar(resultados, options)
+
+    def correr(self, options):
+        self.stdout.write(f'Generando {options["medidores"]} lecturas en {options["rutas"]} rutas...')
+        generar_periodo(ANO, MES, options['medidores'], options['rutas'])
+        novedades = [Novedad.objects.create(descripcion=f'Novedad {numero}') for numero in range(5)]
+        lecturas = list(Lote.objects.values_list('cod_lectura', flat=True)[:5000])
+        NovedadLectura.objects.bulk_create(
+            NovedadLectura(lectura_id=cod_lectura, novedad=novedades[numero % len(novedades)])
+            for numero, cod_lectura in enumerate(lecturas)
+        )
+        AnomaliaConsumo.objects.bulk_create(
+            AnomaliaConsumo(lectura_id=cod_lectura, ano_consumo=ANO, mes_consumo=MES, tipo='cero', consumo=0)
+            for cod_lectura in lecturas[:1000]
+        )
+        # Las estadísticas que usa el paginador para estimar la cantidad de filas (en producción las mantiene
+        # el autovacuum de PostgreSQL o un ANALYZE / PRAGMA optimize periódico en SQLite)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        usuario = User.objects.create_superuser('admin_benchmark', password='benchmark123')
+        cliente = Client()
+        cliente.force_login(usuario)
+
+        periodo = f'{ANO}-{MES:02d}'
+        escenarios = [
+            ('lotes', lambda: (reverse('admin:lecturas_lote_changelist'), None)),
+            ('lotes (periodo)', lambda: (reverse('admin:lecturas_lote_changelist'), {'periodo': periodo})),
+            ('lotes (periodo y ruta)', lambda: (
+                reverse('admin:lecturas_lote_changelist'), {'periodo': periodo, 'ruta': nombre_ruta(1)},
+            )),
+            ('lotes (búsqueda)', lambda: (reverse('admin:lecturas_lote_changelist'), {'q': 'M00001234'})),
+            ('lote (edición)', lambda: (reverse('admin:lecturas_lote_change', args=[lecturas[0]]), None)),
+            ('novedades_lectura', lambda: (reverse('admin:lecturas_novedadlectura_changelist'), None)),
+            ('suministros', lambda: (reverse('admin:lecturas_suministro_changelist'), None)),
+            ('anomalias', lambda: (reverse('admin:lecturas_anomaliaconsumo_changelist'), {'periodo': periodo})),
+            ('autocompletar suministro', lambda: (reverse('admin:autocomplete'), {
+                'term': 'M0000', 'app_label': 'lecturas', 'model_name': 'lote', 'field_name': 'suministro',
+            })),
+        ]
+
+        resultados = {}
+        for nombre, armar in escenarios:
+            mediciones = []
+            for repeticion in range(options['repeticiones']):
+                url, datos = armar()
+                respuesta, medicion = medir(cliente, 'get', url, datos)
+                if respuesta.status_code >= 400:
+                    raise CommandError(f'{nombre}: el admin respondió {respuesta.status_code}')
+                mediciones.append(medicion)
+            resultados[nombre] = resumir(mediciones)
+        return resultados
+
+    def informar(self, resultados, options):
+        self.stdout.write('')
+        self.stdout.write(f'{"Página del admin":<28}{"Consultas":>10}{"SQL ms":>10}{"Total ms":>10}{"Máx ms":>10}')
+        excedidos = []
+        for nombre, r in resultados.items():
+            limite = LIMITES_CONSULTAS.get(nombre)
+            linea = (f'{nombre:<28}{r["consultas"]:>10}{r["sql_ms"]:>10.1f}{r["total_ms"]:>10.1f}'
+                     f'{r["maximo_ms"]:>10.1f}')
+            if limite is not None and r['consultas'] > limite:
+                excedidos.append(nombre)
+                self.stdout.write(self.style.ERROR(linea + '  <- excede el límite'))
+            else:
+                self.stdout.write(linea)
+
+        if excedidos and not options['sin_limites']:
+            raise CommandError(f'Páginas del admin que exceden su límite: {", ".join(excedidos)}')
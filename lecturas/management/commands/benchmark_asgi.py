@@ -0,0 +1,142 @@
+import asyncio
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import AsyncClient, Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from lecturas.benchmark import generar_periodo, preparar_usuario
+from lecturas.models import RutaPeriodo
+
+
+ANO, MES = 2026, 1
+
+VISTAS = {
+    'estado': lambda ruta, version: reverse('api_estado_ruta', args=[ANO, MES, ruta]),
+    'cambios': lambda ruta, version: f"{reverse('api_cambios_ruta', args=[ANO, MES, ruta])}?desde={version}",
+    'descargar': lambda ruta, version: reverse('api_descargar_ruta', args=[ANO, MES, ruta]),
+}
+
+
+class Command(BaseCommand):
+    help = ('Compara cuántos colectores conectados a la vez atiende la API desplegada con WSGI (un hilo por '
+            'petición, como wsgi.py con un servidor de hilos) y con ASGI (las vistas asíncronas en un bucle '
+            'de eventos, como asgi.py)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--colectores', type=int, default=100, help='Colectores conectados a la vez')
+        parser.add_argument('--peticiones', type=int, default=10, help='Peticiones que hace cada colector')
+        parser.add_argument('--hilos-wsgi', type=int, default=8, help='Hilos de trabajo del servidor WSGI')
+        parser.add_argument('--demora-red-ms', type=float, default=200,
+                            help='Tiempo que tarda en llegar cada petición desde el equipo (red móvil lenta)')
+        parser.add_argument('--vista', choices=sorted(VISTAS), default='estado', help='Vista de la API que se consulta')
+        parser.add_argument('--medidores', type=int, default=2000, help='Lecturas del periodo sintético')
+        parser.add_argument('--rutas', type=int, default=20, help='Rutas en que se reparten')
+
+    def handle(self, *args, **options):
+        if min(options['colectores'], options['peticiones'], options['hilos_wsgi'], options['rutas']) <= 0:
+            raise CommandError('Las cantidades tienen que ser mayores a 0')
+
+        setup_test_environment()
+        nombre_original = connection.settings_dict['NAME']
+        if connection.vendor == 'sqlite':
+            # Los hilos del servidor WSGI y el de la base del lado ASGI tienen que ver el mismo archivo
+            connection.settings_dict['TEST']['NAME'] = os.path.join(tempfile.gettempdir(), 'colector_asgi.sqlite3')
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.comparar(options)
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+            teardown_test_environment()
+
+    def comparar(self, options):
+        generar_periodo(ANO, MES, options['medidores'], options['rutas'], proporcion_leidos=0.5)
+        cliente = Client()
+        cliente.force_login(preparar_usuario())
+
+        # Cada colector consulta siempre su ruta, repartidos en las rutas del periodo
+        rutas = list(RutaPeriodo.objects.filter(ano_consumo=ANO, mes_consumo=MES).order_by('ruta').values_list(
+            'ruta', 'version'
+        ))
+        armar_url = VISTAS[options['vista']]
+        urls = [armar_url(*rutas[numero % len(rutas)]) for numero in range(options['colectores'])]
+        demora = options['demora_red_ms'] / 1000
+
+        self.stdout.write(f"{options['colectores']} colectores x {options['peticiones']} peticiones a "
+                          f"api_{options['vista']}_ruta, {options['demora_red_ms']:.0f} ms de red por petición")
+        self.stdout.write(f"{'Despliegue':<22}{'Peticiones':>11}{'Errores':>9}{'Total s':>9}{'Pet./s':>9}"
+                          f"{'Mediana ms':>12}{'p95 ms':>9}")
+
+        resultado = self.correr_wsgi(urls, cliente.cookies, options['peticiones'], options['hilos_wsgi'], demora)
+        self.informar(f"WSGI ({options['hilos_wsgi']} hilos)", *resultado)
+        resultado = asyncio.run(self.correr_asgi(urls, cliente.cookies, options['peticiones'], demora))
+        self.informar('ASGI (async)', *resultado)
+
+        self.stdout.write('La demora de red se simula del lado del servidor: en WSGI el hilo queda tomado mientras '
+                          'llega la petición, en ASGI el bucle atiende a otros colectores mientras tanto.')
+
+    def correr_wsgi(self, urls, cookies, peticiones, hilos, demora):
+        """Cada colector es un hilo, pero solo hilos de ellos pueden estar siendo atendidos a la vez"""
+        trabajadores = threading.BoundedSemaphore(hilos)
+        latencias, errores = [], []
+        candado = threading.Lock()
+
+        def colector(url):
+            cliente = Client()
+            cliente.cookies = cookies
+            try:
+                for _ in range(peticiones):
+                    inicio = time.perf_counter()
+                    with trabajadores:
+                        time.sleep(demora)
+                        respuesta = cliente.get(url)
+                    with candado:
+                        latencias.append(time.perf_counter() - inicio)
+                        if respuesta.status_code != 200:
+                            errores.append(respuesta.status_code)
+            finally:
+                connection.close()
+
+        colectores = [threading.Thread(target=colector, args=(url,)) for url in urls]
+        inicio = time.perf_counter()
+        for hilo in colectores:
+            hilo.start()
+        for hilo in colectores:
+            hilo.join()
+        return latencias, errores, time.perf_counter() - inicio
+
+    async def correr_asgi(self, urls, cookies, peticiones, demora):
+        """Cada colector es una tarea del mismo bucle de eventos; las consultas van al hilo de la base"""
+        latencias, errores = [], []
+
+        async def colector(url):
+            cliente = AsyncClient()
+            cliente.cookies = cookies
+            for _ in range(peticiones):
+                inicio = time.perf_counter()
+                await asyncio.sleep(demora)
+                respuesta = await cliente.get(url)
+                latencias.append(time.perf_counter() - inicio)
+                if respuesta.status_code != 200:
+                    errores.append(respuesta.status_code)
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(colector(url) for url in urls))
+        transcurrido = time.perf_counter() - inicio
+        await sync_to_async(connections.close_all)()
+        return latencias, errores, transcurrido
+
+    def informar(self, nombre, latencias, errores, transcurrido):
+        latencias.sort()
+        self.stdout.write(
+            f'{nombre:<22}{len(latencias):>11}{len(errores):>9}{transcurrido:>9.2f}'
+            f'{len(latencias) / transcurrido:>9.0f}{statistics.median(latencias) * 1000:>12.1f}'
+            f'{latencias[int(len(latencias) * 0.95) - 1] * 1000:>9.1f}'
+        )
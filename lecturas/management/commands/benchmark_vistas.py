@@ -0,0 +1,203 @@
+import json
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from lecturas import urls
+from lecturas.benchmark import generar_periodo, medir, nombre_ruta, preparar_usuario, resumir
+from lecturas.models import Lote, Novedad
+
+
+ANO, MES = 2026, 1   # Tiene que ser un periodo que acepte PeriodoForm
+
+# Máximo de consultas permitido por escenario (con la caché vacía). Incluye las 2 consultas de sesión y usuario.
+LIMITES_CONSULTAS = {
+    'login': 3,
+    'dashboard': 5,
+    'seleccionar_periodo (GET)': 3,
+    'seleccionar_periodo (POST)': 4,
+    'listar_rutas': 2,   # Redirige a la URL con el periodo de la sesión
+    'listar_rutas_periodo': 4,
+    'listar_rutas_periodo (304)': 3,
+    'tomar_lecturas': 2,
+    'tomar_lecturas_periodo (primera página)': 6,
+    'tomar_lecturas_periodo (desde el medio)': 6,
+    'tomar_lecturas_periodo (siguiente sin leer)': 7,
+    'tomar_lecturas_periodo (304)': 3,
+    'guardar_lectura': 11,   # El UPDATE que bloquea la lectura antes de contarla
+    'eliminar_lectura': 9,
+    'agregar_novedad (GET)': 8,
+    'agregar_novedad (POST)': 11,
+    'cerrar_ruta': 5,
+    'abrir_ruta': 5,
+    'exportar_periodo': 6,
+    'crear_tipo_novedad (GET)': 3,
+    'crear_tipo_novedad (POST)': 4,
+    'editar_tipo_novedad (GET)': 4,
+    'editar_tipo_novedad (POST)': 5,
+    'eliminar_tipo_novedad': 9,   # También revisa las novedades de las lecturas archivadas
+    'listar_tipos_novedades': 4,
+    'listar_tipos_novedades (304)': 2,
+    'estadisticas_vistas': 3,
+    'api_descargar_ruta': 6,
+    'api_subir_lecturas': 13,
+    'api_cambios_ruta': 6,
+    'api_estado_ruta': 3,
+    'api_avance_rutas': 3,
+    'api_buscar': 7,
+    'logout': 5,
+}
+
+
+class Command(BaseCommand):
+    help = ('Genera un periodo sintético en una base de prueba, recorre todas las vistas de lecturas/urls.py '
+            'y mide consultas, tiempo de SQL y latencia de cada una')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--medidores', type=int, default=1000, help='Cantidad de lecturas del periodo sintético')
+        parser.add_argument('--rutas', type=int, default=10, help='Cantidad de rutas en que se reparten')
+        parser.add_argument('--repeticiones', type=int, default=5, help='Veces que se mide cada escenario')
+        parser.add_argument('--max-ms', type=float,
+                            help='Latencia máxima (mediana, en ms) permitida para cualquier vista')
+        parser.add_argument('--sin-limites', action='store_true', help='Solo informa, no falla por exceder límites')
+
+    def handle(self, *args, **options):
+        if options['medidores'] < options['rutas'] or options['rutas'] <= 0:
+            raise CommandError('Tiene que haber al menos un medidor por ruta')
+
+        setup_test_environment()
+        nombre_original = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            resultados = self.correr(options)
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+            teardown_test_environment()
+
+        self.informar(resultados, options)
+
+    def correr(self, options):
+        self.stdout.write(f'Generando {options["medidores"]} lecturas en {options["rutas"]} rutas...')
+        generar_periodo(ANO, MES, options['medidores'], options['rutas'])
+        usuario = preparar_usuario()
+
+        cliente = Client()
+        cliente.force_login(usuario)
+        sesion = cliente.session
+        sesion['periodo_año'] = str(ANO)
+        sesion['periodo_mes'] = str(MES)
+        sesion.save()
+
+        ruta = nombre_ruta(0)
+        lecturas = list(Lote.objects.filter(ano_consumo=ANO, mes_consumo=MES, ruta=ruta).order_by('orden')
+                        .values_list('cod_lectura', 'lectura_anterior'))
+        cod_lectura, lectura_anterior = lecturas[-1]
+        cod_novedad = Novedad.objects.values_list('cod_novedad', flat=True).first()
+        lote_api = json.dumps({'lecturas': [
+            {'pk': pk, 'lectura_actual': anterior + 10, 'novedades': [cod_novedad]} for pk, anterior in lecturas[:50]
+        ]})
+
+        def novedad_temporal(repeticion):
+            return Novedad.objects.create(descripcion=f'Temporal {repeticion}').pk
+
+        def condicional(url, datos=None):
+            # Primero se pide la página entera (fuera de la medición) y después con el ETag que devolvió
+            return url, datos, {'HTTP_IF_NONE_MATCH': cliente.get(url, datos)['ETag']}
+
+        url_rutas = reverse('listar_rutas_periodo', args=[ANO, MES])
+        url_ruta = reverse('tomar_lecturas_periodo', args=[ANO, MES, ruta])
+
+        # (nombre, método, función que arma (url, datos) o (url, datos, encabezados) para cada repetición).
+        # Los escenarios (304) tienen que responder 304 Not Modified
+        escenarios = [
+            ('login', 'get', lambda r: (reverse('login'), None)),
+            ('dashboard', 'get', lambda r: (reverse('dashboard'), None)),
+            ('seleccionar_periodo (GET)', 'get', lambda r: (reverse('seleccionar_periodo'), None)),
+            ('seleccionar_periodo (POST)', 'post', lambda r: (reverse('seleccionar_periodo'), {'año': ANO, 'mes': MES})),
+            ('listar_rutas', 'get', lambda r: (reverse('listar_rutas'), None)),
+            ('listar_rutas_periodo', 'get', lambda r: (url_rutas, None)),
+            ('listar_rutas_periodo (304)', 'get', lambda r: condicional(url_rutas)),
+            ('tomar_lecturas', 'get', lambda r: (reverse('tomar_lecturas', args=[ruta]), None)),
+            ('tomar_lecturas_periodo (primera página)', 'get', lambda r: (url_ruta, None)),
+            ('tomar_lecturas_periodo (desde el medio)', 'get', lambda r: (url_ruta, {'desde': len(lecturas) // 2})),
+            ('tomar_lecturas_periodo (siguiente sin leer)', 'get', lambda r: (url_ruta, {'pendiente': 0})),
+            ('tomar_lecturas_periodo (304)', 'get', lambda r: condicional(url_ruta)),
+            ('guardar_lectura', 'post',
+             lambda r: (reverse('guardar_lectura', args=[cod_lectura]), {'lectura_actual': lectura_anterior + r + 1})),
+            ('eliminar_lectura', 'post', lambda r: (reverse('eliminar_lectura', args=[cod_lectura]), {})),
+            ('agregar_novedad (GET)', 'get', lambda r: (reverse('agregar_novedad', args=[cod_lectura]), None)),
+            ('agregar_novedad (POST)', 'post', lambda r: (
+                reverse('agregar_novedad', args=[cod_lectura]),
+                {'novedades_predefinidas': [cod_novedad], 'novedad_libre': f'Observación {r}'},
+            )),
+            ('api_descargar_ruta', 'get', lambda r: (reverse('api_descargar_ruta', args=[ANO, MES, ruta]), None)),
+            ('api_subir_lecturas', 'post', lambda r: (reverse('api_subir_lecturas', args=[ANO, MES, ruta]), lote_api)),
+            ('api_cambios_ruta', 'get', lambda r: (reverse('api_cambios_ruta', args=[ANO, MES, ruta]), {'desde': 1})),
+            ('api_estado_ruta', 'get', lambda r: (reverse('api_estado_ruta', args=[ANO, MES, ruta]), None)),
+            ('api_avance_rutas', 'get', lambda r: (reverse('api_avance_rutas', args=[ANO, MES]), None)),
+            ('api_buscar', 'get', lambda r: (reverse('api_buscar'), {'q': f'Cliente {r + 1}'})),
+            ('cerrar_ruta', 'post', lambda r: (reverse('cerrar_ruta'), {'ruta': ruta})),
+            ('exportar_periodo', 'post', lambda r: (reverse('exportar_periodo'), {'formato': 'csv'})),
+            ('abrir_ruta', 'post', lambda r: (reverse('abrir_ruta'), {'ruta': ruta})),
+            ('crear_tipo_novedad (GET)', 'get', lambda r: (reverse('crear_tipo_novedad'), None)),
+            ('crear_tipo_novedad (POST)', 'post',
+             lambda r: (reverse('crear_tipo_novedad'), {'descripcion': f'Novedad nueva {r}'})),
+            ('editar_tipo_novedad (GET)', 'get', lambda r: (reverse('editar_tipo_novedad', args=[cod_novedad]), None)),
+            ('editar_tipo_novedad (POST)', 'post', lambda r: (
+                reverse('editar_tipo_novedad', args=[cod_novedad]), {'descripcion': f'Medidor roto {r}'},
+            )),
+            ('eliminar_tipo_novedad', 'post',
+             lambda r: (reverse('eliminar_tipo_novedad', args=[novedad_temporal(r)]), {})),
+            ('listar_tipos_novedades', 'get', lambda r: (reverse('listar_tipos_novedades'), None)),
+            ('listar_tipos_novedades (304)', 'get', lambda r: condicional(reverse('listar_tipos_novedades'))),
+            ('estadisticas_vistas', 'get', lambda r: (reverse('estadisticas_vistas'), None)),
+            ('logout', 'get', lambda r: (reverse('logout'), None)),
+        ]
+
+        # Aviso si aparece una URL nueva que el benchmark no recorre
+        cubiertas = {nombre.split(' (')[0] for nombre, metodo, armar in escenarios}
+        for patron in urls.urlpatterns:
+            if patron.name and patron.name not in cubiertas:
+                self.stdout.write(self.style.WARNING(f'La URL "{patron.name}" no tiene escenario en el benchmark'))
+
+        resultados = {}
+        for nombre, metodo, armar in escenarios:
+            mediciones = []
+            for repeticion in range(options['repeticiones']):
+                if nombre == 'logout':
+                    cliente.force_login(usuario)
+                if repeticion == 0:
+                    cache.clear()
+                url, datos, *encabezados = armar(repeticion)
+                respuesta, medicion = medir(cliente, metodo, url, datos, **dict(*encabezados))
+                if respuesta.status_code >= 400:
+                    raise CommandError(f'{nombre}: la vista respondió {respuesta.status_code}')
+                if nombre.endswith('(304)') and respuesta.status_code != 304:
+                    raise CommandError(f'{nombre}: la vista respondió {respuesta.status_code} en lugar de 304')
+                mediciones.append(medicion)
+            resultados[nombre] = resumir(mediciones)
+        return resultados
+
+    def informar(self, resultados, options):
+        self.stdout.write('')
+        self.stdout.write(f'{"Vista":<46}{"Consultas":>10}{"Con caché":>10}{"SQL ms":>10}{"Total ms":>10}'
+                          f'{"Máx ms":>10}')
+        excedidos = []
+        for nombre, r in resultados.items():
+            limite = LIMITES_CONSULTAS.get(nombre)
+            excede = (limite is not None and r['consultas'] > limite) or (
+                options['max_ms'] is not None and r['total_ms'] > options['max_ms'])
+            linea = (f'{nombre:<46}{r["consultas"]:>10}{r["consultas_cache"]:>10}{r["sql_ms"]:>10.1f}'
+                     f'{r["total_ms"]:>10.1f}{r["maximo_ms"]:>10.1f}')
+            if excede:
+                excedidos.append(nombre)
+                self.stdout.write(self.style.ERROR(linea + '  <- excede el límite'))
+            else:
+                self.stdout.write(linea)
+
+        if excedidos and not options['sin_limites']:
+            raise CommandError(f'Vistas que exceden su límite: {", ".join(excedidos)}')
@@ -0,0 +1,141 @@
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Sum
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from lecturas.benchmark import generar_periodo, preparar_usuario
+from lecturas.models import Lote, RutaPeriodo
+
+
+ANO, MES = 2026, 1
+
+
+class Command(BaseCommand):
+    help = ('Prueba de carga: varios operadores guardando lecturas al mismo tiempo (GuardarLecturaView) '
+            'sobre una base de prueba del motor configurado. Mide lecturas por segundo, latencia y errores')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=8, help='Operadores simultáneos')
+        parser.add_argument('--lecturas', type=int, default=50, help='Lecturas que guarda cada operador')
+        parser.add_argument('--misma-ruta', action='store_true',
+                            help='Todos los operadores en la misma ruta (máxima contención sobre RutaPeriodo)')
+        parser.add_argument('--comparar-sqlite', action='store_true',
+                            help='Corre la prueba dos veces, sin y con el perfil SQLITE_OPTIMIZADO')
+
+    def handle(self, *args, **options):
+        hilos, por_hilo = options['hilos'], options['lecturas']
+        if hilos <= 0 or por_hilo <= 0:
+            raise CommandError('La cantidad de hilos y de lecturas tiene que ser mayor a 0')
+
+        if options['comparar_sqlite'] and connection.vendor != 'sqlite':
+            raise CommandError('--comparar-sqlite solo tiene sentido con SQLite')
+        perfiles = [False, True] if options['comparar_sqlite'] else [None]
+
+        setup_test_environment()
+        try:
+            for optimizado in perfiles:
+                if optimizado is None:
+                    self.probar(hilos, por_hilo, options['misma_ruta'])
+                    continue
+                self.stdout.write(f'--- SQLITE_OPTIMIZADO={optimizado}')
+                with override_settings(SQLITE_OPTIMIZADO=optimizado):
+                    self.probar(hilos, por_hilo, options['misma_ruta'])
+        finally:
+            teardown_test_environment()
+
+    def probar(self, hilos, por_hilo, misma_ruta):
+        """Crea una base de prueba nueva, corre la carga y la borra"""
+        nombre_original = connection.settings_dict['NAME']
+        if connection.vendor == 'sqlite':
+            # La base de prueba de SQLite es en memoria por defecto; los hilos tienen que compartir un archivo
+            connection.settings_dict['TEST']['NAME'] = os.path.join(tempfile.gettempdir(), 'colector_carga.sqlite3')
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.correr(hilos, por_hilo, misma_ruta)
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+
+    def correr(self, hilos, por_hilo, misma_ruta):
+        rutas = 1 if misma_ruta else hilos
+        generar_periodo(ANO, MES, hilos * por_hilo, rutas, proporcion_leidos=0)
+        usuario = preparar_usuario()
+
+        # Cada operador recibe su parte de la ruta, para que no guarden dos veces la misma lectura
+        trabajos = [[] for _ in range(hilos)]
+        for numero, (pk, anterior, ruta) in enumerate(Lote.objects.filter(ano_consumo=ANO, mes_consumo=MES).order_by(
+            'ruta', 'orden'
+        ).values_list('cod_lectura', 'lectura_anterior', 'ruta')):
+            hilo = numero % hilos if misma_ruta else int(ruta[1:])
+            trabajos[hilo].append((pk, anterior))
+
+        latencias = []
+        errores = []
+        candado = threading.Lock()
+        largada = threading.Barrier(hilos + 1)
+
+        def operador(cliente, trabajo):
+            largada.wait()
+            try:
+                for pk, anterior in trabajo:
+                    inicio = time.perf_counter()
+                    try:
+                        cliente.post(reverse('guardar_lectura', args=[pk]), {'lectura_actual': anterior + 10})
+                    except Exception as e:
+                        with candado:
+                            errores.append(f'{type(e).__name__}: {e}')
+                        continue
+                    with candado:
+                        latencias.append(time.perf_counter() - inicio)
+            finally:
+                connection.close()
+
+        # Los inicios de sesión se hacen antes, para medir solo la toma de lecturas
+        hilos_operadores = []
+        for trabajo in trabajos:
+            cliente = Client()
+            cliente.force_login(usuario)
+            sesion = cliente.session
+            sesion['periodo_año'] = str(ANO)
+            sesion['periodo_mes'] = str(MES)
+            sesion.save()
+            hilos_operadores.append(threading.Thread(target=operador, args=(cliente, trabajo)))
+        for hilo in hilos_operadores:
+            hilo.start()
+        largada.wait()
+        inicio = time.perf_counter()
+        for hilo in hilos_operadores:
+            hilo.join()
+        transcurrido = time.perf_counter() - inicio
+
+        # Lo que quedó en la base tiene que coincidir con lo que respondieron las vistas
+        guardadas = Lote.objects.filter(ano_consumo=ANO, mes_consumo=MES, lectura_actual__isnull=False).count()
+        leidos = RutaPeriodo.objects.filter(ano_consumo=ANO, mes_consumo=MES).aggregate(
+            total=Sum('leidos', default=0)
+        )['total']
+
+        base = connection.settings_dict
+        with connection.cursor() as cursor:
+            diario = cursor.execute('PRAGMA journal_mode').fetchone()[0] if connection.vendor == 'sqlite' else '-'
+        self.stdout.write(f'Motor: {connection.vendor} (CONN_MAX_AGE={base["CONN_MAX_AGE"]}, '
+                          f'pool={"pool" in base["OPTIONS"]}, journal_mode={diario}), {hilos} operadores, '
+                          f'{"una ruta" if misma_ruta else "una ruta cada uno"}')
+        self.stdout.write(f'Peticiones: {hilos * por_hilo}, guardadas: {guardadas}, errores: {len(errores)}')
+        self.stdout.write(f'Tiempo total: {transcurrido:.2f}s ({guardadas / transcurrido:.0f} lecturas/s)')
+        if latencias:
+            latencias.sort()
+            self.stdout.write(f'Latencia: mediana {statistics.median(latencias) * 1000:.1f} ms, '
+                              f'p95 {latencias[int(len(latencias) * 0.95) - 1] * 1000:.1f} ms, '
+                              f'máxima {latencias[-1] * 1000:.1f} ms')
+        for error in sorted(set(errores))[:5]:
+            self.stdout.write(self.style.WARNING(f'  {error} (x{errores.count(error)})'))
+
+        if leidos != guardadas:
+            raise CommandError(f'El resumen de rutas quedó inconsistente: {leidos} leídos y {guardadas} lecturas')
@@ -0,0 +1,170 @@
+import csv
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from lecturas.cache import invalidar, invalidar_periodo
+from lecturas.models import Cliente, Lote, RutaPeriodo, Suministro
+
+
+# Columnas que exporta el sistema comercial, en el orden en que vienen en el archivo
+COLUMNAS = ['cod_cli', 'denominacion', 'domicilio', 'suministro_numero', 'area', 'ruta',
+            'orden', 'tipo_medidor', 'numero_medidor', 'lectura_anterior']
+
+# Diseño del archivo de ancho fijo (columna, ancho en caracteres)
+DISEÑO_ANCHO_FIJO = [
+    ('cod_cli', 10),
+    ('denominacion', 60),
+    ('domicilio', 80),
+    ('suministro_numero', 15),
+    ('area', 10),
+    ('ruta', 10),
+    ('orden', 6),
+    ('tipo_medidor', 10),
+    ('numero_medidor', 15),
+    ('lectura_anterior', 10),
+]
+
+
+class Command(BaseCommand):
+    help = 'Carga el lote de lecturas de un periodo a partir del archivo exportado por el sistema comercial'
+
+    def add_arguments(self, parser):
+        parser.add_argument('ano', type=int, help='Año de consumo (AAAA)')
+        parser.add_argument('mes', type=int, help='Mes de consumo (1-12)')
+        parser.add_argument('archivo', help='Ruta al archivo exportado')
+        parser.add_argument('--formato', choices=['csv', 'fijo'], default='csv',
+                            help='csv (con encabezado) o fijo (ancho fijo, sin encabezado)')
+        parser.add_argument('--delimitador', default=';', help='Delimitador del CSV (por defecto ";")')
+        parser.add_argument('--encoding', default='utf-8', help='Codificación del archivo')
+        parser.add_argument('--tamano-lote', type=int, default=2000,
+                            help='Cantidad de filas que se insertan por cada bulk_create')
+
+    def handle(self, *args, **options):
+        ano = options['ano']
+        mes = options['mes']
+        tamaño = options['tamano_lote']
+
+        if not 1 <= mes <= 12:
+            raise CommandError('El mes debe estar entre 1 y 12')
+        if tamaño <= 0:
+            raise CommandError('El tamaño de lote debe ser mayor a 0')
+
+        # No permito cargar dos veces el mismo periodo (duplicaría todos los medidores)
+        if Lote.objects.filter(ano_consumo=ano, mes_consumo=mes).exists():
+            raise CommandError(f'El periodo {mes}/{ano} ya tiene lecturas cargadas')
+
+        try:
+            archivo = open(options['archivo'], newline='', encoding=options['encoding'])
+        except OSError as e:
+            raise CommandError(f'No se pudo abrir el archivo: {e}')
+
+        inicio = time.monotonic()
+        total = 0
+        clientes_nuevos = 0
+
+        with archivo:
+            if options['formato'] == 'csv':
+                filas = self.leer_csv(archivo, options['delimitador'])
+            else:
+                filas = self.leer_ancho_fijo(archivo)
+
+            # Toda la carga es una única transacción: si alguna fila falla, el periodo queda vacío
+            # y se puede volver a correr el comando. Solo se mantiene en memoria un bloque por vez.
+            with transaction.atomic():
+                while True:
+                    bloque = list(islice(filas, tamaño))
+                    if not bloque:
+                        break
+
+                    clientes_nuevos += self.resolver_clientes(bloque)
+                    suministros = Suministro.objects.resolver(
+                        (fila['suministro_numero'], fila['numero_medidor'], fila['tipo_medidor']) for fila in bloque
+                    )
+                    Lote.objects.bulk_create(
+                        [self.armar_lote(ano, mes, fila, suministros) for fila in bloque],
+                        batch_size=tamaño,
+                    )
+
+                    total += len(bloque)
+                    transcurrido = time.monotonic() - inicio
+                    self.stdout.write(f'  {total} filas cargadas ({total / transcurrido:.0f} filas/s)')
+
+                # Los clientes se crean con el código de comercial
+                Cliente.ajustar_secuencia()
+
+                # Resumen de avance de las rutas del periodo recién cargado
+                RutaPeriodo.reconstruir(ano, mes)
+
+        # El dashboard tiene que enterarse de que hay un periodo nuevo
+        invalidar('periodos')
+        invalidar('clientes')
+        invalidar_periodo(ano, mes)
+
+        transcurrido = time.monotonic() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f'Periodo {mes}/{ano}: {total} lecturas y {clientes_nuevos} clientes nuevos '
+            f'en {transcurrido:.1f}s ({total / max(transcurrido, 1e-9):.0f} filas/s)'
+        ))
+
+    def leer_csv(self, archivo, delimitador):
+        """Genera las filas del CSV como diccionarios, validando el encabezado"""
+        lector = csv.DictReader(archivo, delimiter=delimitador)
+        faltantes = set(COLUMNAS) - set(lector.fieldnames or [])
+        if faltantes:
+            raise CommandError(f'Faltan columnas en el archivo: {", ".join(sorted(faltantes))}')
+        for fila in lector:
+            yield self.normalizar(fila, lector.line_num)
+
+    def leer_ancho_fijo(self, archivo):
+        """Genera las filas del archivo de ancho fijo como diccionarios"""
+        for numero, linea in enumerate(archivo, start=1):
+            if not linea.strip():
+                continue
+            fila = {}
+            posicion = 0
+            for columna, ancho in DISEÑO_ANCHO_FIJO:
+                fila[columna] = linea[posicion:posicion + ancho]
+                posicion += ancho
+            yield self.normalizar(fila, numero)
+
+    def normalizar(self, fila, numero):
+        """Limpia los espacios y convierte las columnas numéricas"""
+        fila = {columna: (fila.get(columna) or '').strip() for columna in COLUMNAS}
+        try:
+            fila['cod_cli'] = int(fila['cod_cli'])
+            fila['orden'] = int(fila['orden'])
+            fila['lectura_anterior'] = int(fila['lectura_anterior'])
+        except ValueError:
+            raise CommandError(f'Línea {numero}: cod_cli, orden y lectura_anterior deben ser números enteros')
+        return fila
+
+    def resolver_clientes(self, bloque):
+        """Crea en una sola inserción los clientes del bloque que todavía no existen"""
+        codigos = {fila['cod_cli'] for fila in bloque}
+        existentes = set(Cliente.objects.filter(cod_cli__in=codigos).values_list('cod_cli', flat=True))
+
+        nuevos = {}
+        for fila in bloque:
+            if fila['cod_cli'] not in existentes and fila['cod_cli'] not in nuevos:
+                nuevos[fila['cod_cli']] = Cliente(
+                    cod_cli=fila['cod_cli'],
+                    denominacion=fila['denominacion'],
+                    domicilio=fila['domicilio'],
+                )
+        Cliente.objects.bulk_create(nuevos.values())
+        return len(nuevos)
+
+    def armar_lote(self, ano, mes, fila, suministros):
+        return Lote(
+            ano_consumo=ano,
+            mes_consumo=mes,
+            cliente_id=fila['cod_cli'],
+            suministro_id=suministros[fila['suministro_numero'], fila['numero_medidor']],
+            area=fila['area'],
+            ruta=fila['ruta'],
+            orden=fila['orden'],
+            lectura_anterior=fila['lectura_anterior'],
+        )
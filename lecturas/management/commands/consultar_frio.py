@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = ('Consulta el almacén frío sin cargarlo en la base: historia de un medidor en todos los periodos '
+            'guardados o consumo total por ruta de un periodo. Necesita numpy')
+
+    def add_arguments(self, parser):
+        consulta = parser.add_mutually_exclusive_group(required=True)
+        consulta.add_argument('--medidor', help='Número de medidor del que se muestra la historia')
+        consulta.add_argument('--rutas', nargs=2, type=int, metavar=('AAAA', 'MM'),
+                              help='Periodo del que se muestran los totales por ruta')
+        parser.add_argument('--directorio', help='Directorio del almacén frío (por defecto ALMACEN_FRIO_DIR)')
+
+    def handle(self, *args, **options):
+        try:
+            from lecturas import almacen_frio
+        except ImportError as e:
+            raise CommandError(f'Para el almacén frío hace falta numpy (pip install numpy): {e}')
+
+        inicio = time.perf_counter()
+        if options['medidor']:
+            lecturas = almacen_frio.historia_medidor(options['medidor'], options['directorio'])
+            for lectura in lecturas:
+                actual = '-' if lectura['lectura_actual'] is None else lectura['lectura_actual']
+                consumo = '-' if lectura['consumo_kwh'] is None else lectura['consumo_kwh']
+                novedades = ', '.join(str(codigo) for codigo, fecha in lectura['novedades'])
+                self.stdout.write(
+                    f'{lectura["mes_consumo"]:>2}/{lectura["ano_consumo"]}  ruta {lectura["ruta"]:<10} '
+                    f'{lectura["lectura_anterior"]:>10} -> {actual:>10}  {consumo:>8} kWh'
+                    + (f'  novedades: {novedades}' if novedades else '')
+                )
+            resumen = f'{len(lecturas)} lecturas del medidor {options["medidor"]}'
+        else:
+            ano, mes = options['rutas']
+            archivo = almacen_frio.archivo_periodo(ano, mes, options['directorio'])
+            if not archivo.exists():
+                raise CommandError(f'El periodo {mes}/{ano} no está en el almacén frío ({archivo})')
+            rutas = almacen_frio.PeriodoFrio(archivo).totales_por_ruta()
+            self.stdout.write(f'{"Ruta":<12}{"Medidores":>10}{"Leídos":>10}{"Consumo kWh":>14}')
+            for ruta in rutas:
+                self.stdout.write(f'{ruta["ruta"]:<12}{ruta["medidores"]:>10}{ruta["leidos"]:>10}'
+                                  f'{ruta["consumo_kwh"]:>14}')
+            resumen = f'{len(rutas)} rutas de {mes}/{ano}'
+
+        self.stdout.write(self.style.SUCCESS(f'{resumen} en {(time.perf_counter() - inicio) * 1000:.1f} ms'))
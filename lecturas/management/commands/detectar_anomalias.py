@@ -0,0 +1,77 @@
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = ('Busca consumos sospechosos en las lecturas de un periodo (consumo cero, picos contra la mediana de '
+            'los periodos anteriores, vuelta del medidor, dígitos invertidos) y los guarda para revisarlos '
+            'desde el admin. Necesita numpy')
+
+    def add_arguments(self, parser):
+        parser.add_argument('ano', type=int, help='Año de consumo (AAAA)')
+        parser.add_argument('mes', type=int, help='Mes de consumo (1-12)')
+        parser.add_argument('--periodos', type=int, default=6,
+                            help='Periodos anteriores con los que se calcula la mediana de cada medidor')
+        parser.add_argument('--factor-pico', type=float, default=3.0,
+                            help='Veces la mediana a partir de las que un consumo es pico')
+        parser.add_argument('--minimo-pico', type=int, default=100,
+                            help='kWh por encima de la mediana que tiene que superar un pico')
+        parser.add_argument('--sin-guardar', action='store_true', help='Solo informa, no guarda las anomalías')
+        parser.add_argument('--mostrar', type=int, default=10, help='Ejemplos de cada tipo que se muestran')
+
+    def handle(self, *args, **options):
+        try:
+            import numpy as np
+            from lecturas import anomalias
+        except ImportError as e:
+            raise CommandError(f'Para detectar anomalías hace falta numpy (pip install numpy): {e}')
+
+        ano, mes = options['ano'], options['mes']
+        if not 1 <= mes <= 12:
+            raise CommandError('El mes debe estar entre 1 y 12')
+        if options['periodos'] < 1:
+            raise CommandError('Hace falta por lo menos un periodo anterior')
+
+        inicio = time.perf_counter()
+        cod_lecturas, suministros, medidores, anteriores, actuales = anomalias.leer_periodo(ano, mes)
+        if not len(cod_lecturas):
+            raise CommandError(f'El periodo {mes}/{ano} no tiene lecturas tomadas')
+        periodos = anomalias.periodos_anteriores(ano, mes, options['periodos'])
+        historia = anomalias.leer_historia(suministros, periodos)
+        lectura = time.perf_counter()
+
+        codigos, medianas, estimados, sugeridas = anomalias.detectar(
+            anteriores, actuales, historia, factor_pico=options['factor_pico'], minimo_pico=options['minimo_pico'],
+        )
+        analisis = time.perf_counter()
+
+        guardadas = 0
+        if not options['sin_guardar']:
+            guardadas = anomalias.guardar(ano, mes, cod_lecturas, anteriores, actuales, codigos, medianas,
+                                          estimados, sugeridas)
+        fin = time.perf_counter()
+
+        self.stdout.write(f'{len(cod_lecturas)} lecturas de {mes}/{ano}, {(~np.isnan(medianas)).sum()} '
+                          f'con historia en los {len(periodos)} periodos anteriores')
+        self.stdout.write(f'Lectura de la base {lectura - inicio:.2f}s, análisis {analisis - lectura:.2f}s, '
+                          f'guardado {fin - analisis:.2f}s')
+
+        cantidades = Counter(codigos[codigos != anomalias.NORMAL].tolist())
+        for codigo, tipo in enumerate(anomalias.TIPOS, start=1):
+            self.stdout.write(f'  {tipo:<10}{cantidades.get(codigo, 0):>10}')
+            for i in np.flatnonzero(codigos == codigo)[:options['mostrar']]:
+                detalle = f'medidor {medidores[i]}: {anteriores[i]} -> {actuales[i]}'
+                if not np.isnan(medianas[i]):
+                    detalle += f', mediana {medianas[i]:.0f}'
+                if sugeridas[i] >= 0:
+                    detalle += f', ¿quiso decir {sugeridas[i]}?'
+                elif not np.isnan(estimados[i]):
+                    detalle += f', consumo estimado {estimados[i]:.0f}'
+                self.stdout.write(f'      {detalle}')
+
+        if options['sin_guardar']:
+            self.stdout.write(self.style.WARNING('No se guardó nada (--sin-guardar)'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{guardadas} anomalías guardadas para revisar'))
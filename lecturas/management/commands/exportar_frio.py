@@ -0,0 +1,76 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from lecturas.models import AnomaliaConsumoHistorica, Lote, LoteHistorico, NovedadLecturaHistorica
+
+
+class Command(BaseCommand):
+    help = ('Guarda las lecturas archivadas de un periodo (archivar_periodo) en un archivo por columnas del '
+            'almacén frío y, con --borrar, las saca de la base. Necesita numpy')
+
+    def add_arguments(self, parser):
+        parser.add_argument('ano', type=int, help='Año de consumo (AAAA)')
+        parser.add_argument('mes', type=int, help='Mes de consumo (1-12)')
+        parser.add_argument('--directorio', help='Directorio del almacén frío (por defecto ALMACEN_FRIO_DIR)')
+        parser.add_argument('--comprimir', action='store_true',
+                            help='Comprime las columnas (ocupa menos, pero al consultar se carga entero en memoria)')
+        parser.add_argument('--borrar', action='store_true',
+                            help='Después de verificar el archivo borra las lecturas archivadas de la base')
+
+    def handle(self, *args, **options):
+        try:
+            from lecturas import almacen_frio
+        except ImportError as e:
+            raise CommandError(f'Para el almacén frío hace falta numpy (pip install numpy): {e}')
+
+        ano, mes = options['ano'], options['mes']
+        if not 1 <= mes <= 12:
+            raise CommandError('El mes debe estar entre 1 y 12')
+        if Lote.objects.filter(ano_consumo=ano, mes_consumo=mes).exists():
+            raise CommandError(f'El periodo {mes}/{ano} está en la tabla de trabajo: primero hay que archivarlo '
+                               '(python manage.py archivar_periodo)')
+        cantidad = LoteHistorico.objects.filter(ano_consumo=ano, mes_consumo=mes).count()
+        if not cantidad:
+            raise CommandError(f'El periodo {mes}/{ano} no tiene lecturas archivadas')
+
+        inicio = time.monotonic()
+        archivo, escritas = almacen_frio.exportar_periodo(ano, mes, options['directorio'], options['comprimir'])
+        transcurrido = time.monotonic() - inicio
+
+        # Se vuelve a abrir el archivo para comprobar que está completo antes de borrar nada
+        periodo = almacen_frio.PeriodoFrio(archivo)
+        if len(periodo) != cantidad or escritas != cantidad:
+            raise CommandError(f'{archivo} tiene {len(periodo)} lecturas y en la base hay {cantidad}; no se borra nada')
+
+        self.stdout.write(f'{archivo}: {cantidad} lecturas, {periodo.metadatos["novedades"]} novedades, '
+                          f'{archivo.stat().st_size / 1024 / 1024:.1f} MB en {transcurrido:.1f}s '
+                          f'({cantidad / max(transcurrido, 1e-9):.0f} filas/s)')
+
+        if options['borrar']:
+            self.borrar(ano, mes)
+            self.stdout.write(self.style.SUCCESS(f'Periodo {mes}/{ano} guardado en el almacén frío y borrado de la '
+                                                 'base (en SQLite el espacio se recupera con VACUUM)'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Periodo {mes}/{ano} guardado en el almacén frío; las lecturas '
+                                                 'siguen archivadas en la base (--borrar para sacarlas)'))
+
+    def borrar(self, ano, mes):
+        """Borra las lecturas archivadas del periodo, sus novedades y sus anomalías, directamente con SQL (las
+        anomalías no van al almacén frío: para entonces ya se revisaron)"""
+        def tabla(modelo):
+            return connection.ops.quote_name(modelo._meta.db_table)
+
+        def columna(modelo, nombre):
+            return connection.ops.quote_name(modelo._meta.get_field(nombre).column)
+
+        periodo = f'{columna(LoteHistorico, "ano_consumo")} = %s AND {columna(LoteHistorico, "mes_consumo")} = %s'
+        with transaction.atomic(), connection.cursor() as cursor:
+            for modelo in (NovedadLecturaHistorica, AnomaliaConsumoHistorica):
+                cursor.execute(
+                    f'DELETE FROM {tabla(modelo)} WHERE {columna(modelo, "lectura")} IN '
+                    f'(SELECT {columna(LoteHistorico, "cod_lectura")} FROM {tabla(LoteHistorico)} WHERE {periodo})',
+                    [ano, mes],
+                )
+            cursor.execute(f'DELETE FROM {tabla(LoteHistorico)} WHERE {periodo}', [ano, mes])
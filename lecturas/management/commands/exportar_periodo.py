@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from lecturas.exportacion import FORMATOS, generar_exportacion
+
+
+class Command(BaseCommand):
+    help = 'Exporta las lecturas de las rutas cerradas de un periodo y las marca como enviadas a comercial'
+
+    def add_arguments(self, parser):
+        parser.add_argument('ano', type=int, help='Año de consumo (AAAA)')
+        parser.add_argument('mes', type=int, help='Mes de consumo (1-12)')
+        parser.add_argument('--formato', choices=FORMATOS, default='csv')
+        parser.add_argument('--salida', help='Archivo de salida (por defecto la salida estándar)')
+        parser.add_argument('--todas', action='store_true',
+                            help='Incluye también las lecturas que ya se enviaron a comercial')
+        parser.add_argument('--tamano-bloque', type=int, default=2000,
+                            help='Cantidad de filas que se leen y marcan por vez')
+
+    def handle(self, *args, **options):
+        if not 1 <= options['mes'] <= 12:
+            raise CommandError('El mes debe estar entre 1 y 12')
+
+        partes = generar_exportacion(
+            options['ano'],
+            options['mes'],
+            formato=options['formato'],
+            tamaño_bloque=options['tamano_bloque'],
+            solo_pendientes=not options['todas'],
+        )
+
+        if not options['salida']:
+            for parte in partes:
+                self.stdout.write(parte, ending='')
+            return
+
+        try:
+            salida = open(options['salida'], 'w', newline='', encoding='utf-8')
+        except OSError as e:
+            raise CommandError(f'No se pudo crear el archivo: {e}')
+        with salida:
+            for parte in partes:
+                salida.write(parte)
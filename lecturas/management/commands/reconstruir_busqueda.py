@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from lecturas.busqueda import fts_disponible, reconstruir_indices
+
+
+class Command(BaseCommand):
+    help = 'Regenera los índices de búsqueda (FTS5) de clientes y lecturas a partir de las tablas'
+
+    def handle(self, *args, **options):
+        if not fts_disponible():
+            raise CommandError('Esta base no tiene índices FTS5 (no es SQLite o falta aplicar la migración 0006_busqueda); '
+                               'la búsqueda usa consultas comunes y no hay nada que reconstruir')
+        reconstruir_indices()
+        self.stdout.write(self.style.SUCCESS('Índices de búsqueda reconstruidos'))
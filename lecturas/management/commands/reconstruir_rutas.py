@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from lecturas.cache import invalidar_periodo
+from lecturas.models import Lote, RutaPeriodo
+
+
+class Command(BaseCommand):
+    help = 'Recalcula desde las lecturas el resumen de avance (RutaPeriodo) de un periodo o de todos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('ano', type=int, nargs='?', help='Año de consumo (AAAA)')
+        parser.add_argument('mes', type=int, nargs='?', help='Mes de consumo (1-12)')
+
+    def handle(self, *args, **options):
+        ano = options['ano']
+        mes = options['mes']
+
+        if (ano is None) != (mes is None):
+            raise CommandError('Hay que indicar año y mes, o ninguno de los dos para reconstruir todos los periodos')
+
+        if ano is None:
+            periodos = Lote.objects.order_by('ano_consumo', 'mes_consumo').values_list(
+                'ano_consumo', 'mes_consumo'
+            ).distinct()
+        else:
+            periodos = [(ano, mes)]
+
+        for ano, mes in periodos:
+            RutaPeriodo.reconstruir(ano, mes)
+            invalidar_periodo(ano, mes)
+            cantidad = RutaPeriodo.objects.filter(ano_consumo=ano, mes_consumo=mes).count()
+            self.stdout.write(f'Periodo {mes}/{ano}: {cantidad} rutas')
+
+        self.stdout.write(self.style.SUCCESS('Resumen de rutas reconstruido'))
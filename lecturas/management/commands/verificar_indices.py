@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from lecturas.benchmark import consultas_con_indice, problema_en_plan
+from lecturas.cache import ultimo_periodo
+
+
+class Command(BaseCommand):
+    help = 'Verifica con EXPLAIN que las consultas de las vistas usan índices y no recorren toda la tabla Lote'
+
+    def add_arguments(self, parser):
+        parser.add_argument('ano', type=int, nargs='?', help='Año de consumo (por defecto el último cargado)')
+        parser.add_argument('mes', type=int, nargs='?', help='Mes de consumo (por defecto el último cargado)')
+
+    def handle(self, *args, **options):
+        ano, mes = options['ano'], options['mes']
+        if ano is None or mes is None:
+            ano, mes = ultimo_periodo() or (2000, 1)
+
+        fallas = 0
+        for nombre, consulta, ordenada in consultas_con_indice(ano, mes):
+            plan = consulta.explain()
+            problema = problema_en_plan(plan, ordenada)
+            if problema:
+                fallas += 1
+                self.stdout.write(self.style.ERROR(f'[FALLA] {nombre}'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'[OK] {nombre}'))
+            if problema or options['verbosity'] > 1:
+                self.stdout.write('    ' + plan.replace('\n', '\n    '))
+
+        if fallas:
+            raise CommandError(f'{fallas} consultas no usan índice ({connection.vendor})')
@@ -0,0 +1,199 @@
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.base import Template
+
+
+# Medición de cada petición: consultas, tiempo de SQL, tiempo de plantillas y tiempo total.
+# Se configura con INSTRUMENTACION_MUESTREO (fracción de peticiones que se miden; con 0 el middleware
+# ni se instala) e INSTRUMENTACION_UMBRAL_LENTO_MS (a partir de cuánto se registra una petición lenta).
+# El encabezado Server-Timing expone tiempos internos, así que solo se manda al staff o con DEBUG.
+
+logger = logging.getLogger('lecturas.instrumentacion')
+
+_medicion_actual = ContextVar('medicion_actual', default=None)
+_render_original = Template.render
+
+_contadores = {}
+_candado = threading.Lock()
+_instalada = False
+
+
+class MedicionPeticion:
+    def __init__(self):
+        self.consultas = 0
+        self.tiempo_sql = 0.0
+        self.tiempo_plantillas = 0.0
+        self.renderizando = False
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.consultas += 1
+            self.tiempo_sql += time.perf_counter() - inicio
+
+
+def _medir_consulta(execute, sql, params, many, context):
+    """Wrapper instalado en todas las conexiones: suma la consulta a la medición de la petición actual, si hay.
+
+    La medición viaja en un ContextVar y no en la conexión porque las vistas asíncronas consultan la base
+    desde otro hilo (sync_to_async), que tiene su propia conexión pero recibe una copia del contexto.
+    """
+    medicion = _medicion_actual.get()
+    if medicion is None:
+        return execute(sql, params, many, context)
+    return medicion(execute, sql, params, many, context)
+
+
+def _instalar_en_conexion(sender=None, connection=None, **kwargs):
+    # Va al principio de la lista: connection.execute_wrapper() saca siempre el último al terminar
+    if _medir_consulta not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _medir_consulta)
+
+
+def _render_medido(self, context):
+    """Reemplazo de Template.render que acumula el tiempo de la plantilla de más afuera.
+
+    Los include y extends se renderizan dentro de esa, así que no se cuentan dos veces. El tiempo
+    incluye las consultas que se disparan desde la plantilla (también suman en el tiempo de SQL).
+    """
+    medicion = _medicion_actual.get()
+    if medicion is None or medicion.renderizando:
+        return _render_original(self, context)
+
+    medicion.renderizando = True
+    inicio = time.perf_counter()
+    try:
+        return _render_original(self, context)
+    finally:
+        medicion.tiempo_plantillas += time.perf_counter() - inicio
+        medicion.renderizando = False
+
+
+def _instalar():
+    """Reemplaza Template.render y engancha las conexiones una sola vez por proceso, aunque el middleware se
+    cree varias veces (cada handler de WSGI/ASGI o cliente de pruebas arma su propia cadena)"""
+    global _instalada
+    with _candado:
+        if _instalada:
+            return
+        Template.render = _render_medido
+        connection_created.connect(_instalar_en_conexion, dispatch_uid='lecturas_instrumentacion')
+        for conexion in connections.all(initialized_only=True):
+            _instalar_en_conexion(connection=conexion)
+        _instalada = True
+
+
+def estadisticas_por_vista():
+    """Copia de los contadores acumulados por nombre de URL desde que arrancó el proceso"""
+    with _candado:
+        return {nombre: dict(valores) for nombre, valores in _contadores.items()}
+
+
+def _acumular(nombre, medicion, total_ms, lenta):
+    with _candado:
+        valores = _contadores.setdefault(nombre, {
+            'peticiones': 0, 'lentas': 0, 'consultas': 0, 'sql_ms': 0.0, 'plantillas_ms': 0.0,
+            'total_ms': 0.0, 'maximo_ms': 0.0,
+        })
+        valores['peticiones'] += 1
+        valores['lentas'] += lenta
+        valores['consultas'] += medicion.consultas
+        valores['sql_ms'] += medicion.tiempo_sql * 1000
+        valores['plantillas_ms'] += medicion.tiempo_plantillas * 1000
+        valores['total_ms'] += total_ms
+        valores['maximo_ms'] = max(valores['maximo_ms'], total_ms)
+
+
+class InstrumentacionMiddleware:
+    """Mide las peticiones muestreadas, agrega el encabezado Server-Timing y registra las lentas.
+
+    En las respuestas en streaming (exportación) solo se mide hasta que empieza el envío. Funciona igual
+    con WSGI y con ASGI (sin pasar las vistas asíncronas a un hilo).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.muestreo = getattr(settings, 'INSTRUMENTACION_MUESTREO', 0)
+        self.umbral_ms = getattr(settings, 'INSTRUMENTACION_UMBRAL_LENTO_MS', 500)
+        if not self.muestreo:
+            raise MiddlewareNotUsed
+        _instalar()
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if self.muestreo < 1 and random.random() >= self.muestreo:
+            return self.get_response(request)
+
+        medicion = MedicionPeticion()
+        token = _medicion_actual.set(medicion)
+        inicio = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _medicion_actual.reset(token)
+        return self.registrar(request, response, medicion, inicio, getattr(request, 'user', None))
+
+    async def __acall__(self, request):
+        if self.muestreo < 1 and random.random() >= self.muestreo:
+            return await self.get_response(request)
+
+        medicion = MedicionPeticion()
+        token = _medicion_actual.set(medicion)
+        inicio = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _medicion_actual.reset(token)
+        # request.user consultaría la base de forma sincrónica; auser() ya quedó cacheado por la vista
+        usuario = await request.auser() if hasattr(request, 'auser') else None
+        return self.registrar(request, response, medicion, inicio, usuario)
+
+    def registrar(self, request, response, medicion, inicio, usuario):
+        """Agrega el Server-Timing (solo para el staff o con DEBUG), acumula los contadores de la vista y registra
+        la petición si fue lenta"""
+        total_ms = (time.perf_counter() - inicio) * 1000
+
+        if settings.DEBUG or getattr(usuario, 'is_staff', False):
+            response['Server-Timing'] = ', '.join([
+                f'sql;dur={medicion.tiempo_sql * 1000:.1f};desc="{medicion.consultas} consultas"',
+                f'plantillas;dur={medicion.tiempo_plantillas * 1000:.1f}',
+                f'total;dur={total_ms:.1f}',
+            ])
+
+        nombre = request.resolver_match.url_name if request.resolver_match else None
+        lenta = total_ms >= self.umbral_ms
+        _acumular(nombre or '(sin nombre)', medicion, total_ms, lenta)
+        if lenta:
+            logger.warning(
+                'Petición lenta: %s %s (%s) %.0f ms, %d consultas, %.0f ms de SQL, %.0f ms de plantillas',
+                request.method, request.path, nombre, total_ms, medicion.consultas,
+                medicion.tiempo_sql * 1000, medicion.tiempo_plantillas * 1000,
+                extra={
+                    'metodo': request.method,
+                    'ruta': request.path,
+                    'vista': nombre,
+                    'estado': response.status_code,
+                    'usuario': getattr(usuario, 'username', None),
+                    'consultas': medicion.consultas,
+                    'sql_ms': round(medicion.tiempo_sql * 1000, 1),
+                    'plantillas_ms': round(medicion.tiempo_plantillas * 1000, 1),
+                    'total_ms': round(total_ms, 1),
+                },
+            )
+        return response
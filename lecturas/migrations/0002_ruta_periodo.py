@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:17
+
+from django.db import migrations, models
+
+
+def cargar_resumenes(apps, schema_editor):
+    """Arma el resumen de las rutas de todos los periodos que ya estaban cargados"""
+    Lote = apps.get_model('lecturas', 'Lote')
+    RutaPeriodo = apps.get_model('lecturas', 'RutaPeriodo')
+    rutas = Lote.objects.order_by().values('ano_consumo', 'mes_consumo', 'ruta').annotate(
+        area_ruta=models.Max('area'),
+        total=models.Count('cod_lectura'),
+        cantidad_leidos=models.Count('cod_lectura', filter=models.Q(lectura_actual__isnull=False)),
+        cantidad_abiertas=models.Count('cod_lectura', filter=models.Q(abierta=True)),
+        ultimo_operador=models.Max('operador__user__first_name'),
+    )
+    RutaPeriodo.objects.bulk_create(
+        RutaPeriodo(
+            ano_consumo=ruta['ano_consumo'],
+            mes_consumo=ruta['mes_consumo'],
+            ruta=ruta['ruta'],
+            area=ruta['area_ruta'],
+            total_medidores=ruta['total'],
+            leidos=ruta['cantidad_leidos'],
+            abierta=ruta['cantidad_abiertas'] > 0,
+            operador_nombre=ruta['ultimo_operador'] or '',
+        )
+        for ruta in rutas.iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lecturas', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RutaPeriodo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ano_consumo', models.IntegerField(verbose_name='Año de Consumo')),
+                ('mes_consumo', models.IntegerField(verbose_name='Mes de Consumo')),
+                ('ruta', models.CharField(max_length=50, verbose_name='Ruta')),
+                ('area', models.CharField(max_length=50, verbose_name='Área')),
+                ('total_medidores', models.IntegerField(default=0, verbose_name='Total Medidores')),
+                ('leidos', models.IntegerField(default=0, verbose_name='Leídos')),
+                ('abierta', models.BooleanField(default=True, verbose_name='Ruta Abierta')),
+                ('operador_nombre', models.CharField(blank=True, default='', max_length=150, verbose_name='Último Operador')),
+            ],
+            options={
+                'verbose_name': 'Ruta del Periodo',
+                'verbose_name_plural': 'Rutas del Periodo',
+                'unique_together': {('ano_consumo', 'mes_consumo', 'ruta')},
+            },
+        ),
+        migrations.RunPython(cargar_resumenes, migrations.RunPython.noop),
+    ]
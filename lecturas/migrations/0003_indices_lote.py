@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lecturas', '0002_ruta_periodo'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='lote',
+            name='lecturas_lo_ano_con_adaca1_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='lote',
+            name='lecturas_lo_ruta_04d5d3_idx',
+        ),
+        migrations.AddIndex(
+            model_name='lote',
+            index=models.Index(fields=['ano_consumo', 'mes_consumo', 'ruta', 'orden'], name='lote_periodo_ruta_orden_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lote',
+            index=models.Index(condition=models.Q(('lectura_actual__isnull', True)), fields=['ano_consumo', 'mes_consumo', 'ruta', 'orden'], name='lote_pendientes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lote',
+            index=models.Index(condition=models.Q(('abierta', False), ('enviado_comercial', False)), fields=['ano_consumo', 'mes_consumo', 'cod_lectura'], name='lote_a_exportar_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lecturas', '0003_indices_lote'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rutaperiodo',
+            name='version',
+            field=models.PositiveIntegerField(default=1, verbose_name='Versión'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lecturas', '0004_version_ruta_periodo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lote',
+            name='version',
+            field=models.PositiveIntegerField(default=0, verbose_name='Versión'),
+        ),
+        migrations.AddField(
+            model_name='novedadlectura',
+            name='version',
+            field=models.PositiveIntegerField(default=0, verbose_name='Versión'),
+        ),
+        migrations.AddIndex(
+            model_name='lote',
+            index=models.Index(fields=['ano_consumo', 'mes_consumo', 'ruta', 'version'], name='lote_cambios_idx'),
+        ),
+    ]
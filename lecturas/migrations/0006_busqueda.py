@@ -0,0 +1,101 @@
+from django.db import migrations
+
+
+# Índices de texto completo (FTS5) para buscar clientes, medidores y suministros.
+# Son tablas "external content": no duplican los datos, solo el índice, y los triggers las mantienen
+# al día con cualquier escritura (incluidos bulk_create, bulk_update y SQL directo).
+# Los números de medidor y suministro usan el tokenizador trigram, que permite buscar cualquier parte
+# del número ("1001" encuentra "MED1001"); nombres y domicilios se buscan por prefijo de cada palabra.
+# Solo existen en SQLite (3.34 o posterior, por trigram); con otros motores la búsqueda usa consultas
+# comunes (ver lecturas/busqueda.py).
+
+CREAR = [
+    """CREATE VIRTUAL TABLE lecturas_cliente_fts USING fts5(
+        denominacion, domicilio,
+        content='lecturas_cliente', content_rowid='cod_cli',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    "CREATE VIRTUAL TABLE lecturas_cliente_fts_vocab USING fts5vocab(lecturas_cliente_fts, row)",
+    """CREATE TRIGGER lecturas_cliente_fts_ai AFTER INSERT ON lecturas_cliente BEGIN
+        INSERT INTO lecturas_cliente_fts(rowid, denominacion, domicilio)
+        VALUES (new.cod_cli, new.denominacion, new.domicilio);
+    END""",
+    """CREATE TRIGGER lecturas_cliente_fts_ad AFTER DELETE ON lecturas_cliente BEGIN
+        INSERT INTO lecturas_cliente_fts(lecturas_cliente_fts, rowid, denominacion, domicilio)
+        VALUES ('delete', old.cod_cli, old.denominacion, old.domicilio);
+    END""",
+    """CREATE TRIGGER lecturas_cliente_fts_au AFTER UPDATE OF denominacion, domicilio ON lecturas_cliente
+    WHEN old.denominacion IS NOT new.denominacion OR old.domicilio IS NOT new.domicilio BEGIN
+        INSERT INTO lecturas_cliente_fts(lecturas_cliente_fts, rowid, denominacion, domicilio)
+        VALUES ('delete', old.cod_cli, old.denominacion, old.domicilio);
+        INSERT INTO lecturas_cliente_fts(rowid, denominacion, domicilio)
+        VALUES (new.cod_cli, new.denominacion, new.domicilio);
+    END""",
+    """CREATE VIRTUAL TABLE lecturas_lote_fts USING fts5(
+        numero_medidor, suministro_numero,
+        content='lecturas_lote', content_rowid='cod_lectura',
+        tokenize='trigram'
+    )""",
+    """CREATE TRIGGER lecturas_lote_fts_ai AFTER INSERT ON lecturas_lote BEGIN
+        INSERT INTO lecturas_lote_fts(rowid, numero_medidor, suministro_numero)
+        VALUES (new.cod_lectura, new.numero_medidor, new.suministro_numero);
+    END""",
+    """CREATE TRIGGER lecturas_lote_fts_ad AFTER DELETE ON lecturas_lote BEGIN
+        INSERT INTO lecturas_lote_fts(lecturas_lote_fts, rowid, numero_medidor, suministro_numero)
+        VALUES ('delete', old.cod_lectura, old.numero_medidor, old.suministro_numero);
+    END""",
+    # Lote.save() escribe todas las columnas, por eso el WHEN: tomar una lectura no toca el índice
+    """CREATE TRIGGER lecturas_lote_fts_au AFTER UPDATE OF numero_medidor, suministro_numero ON lecturas_lote
+    WHEN old.numero_medidor IS NOT new.numero_medidor OR old.suministro_numero IS NOT new.suministro_numero BEGIN
+        INSERT INTO lecturas_lote_fts(lecturas_lote_fts, rowid, numero_medidor, suministro_numero)
+        VALUES ('delete', old.cod_lectura, old.numero_medidor, old.suministro_numero);
+        INSERT INTO lecturas_lote_fts(rowid, numero_medidor, suministro_numero)
+        VALUES (new.cod_lectura, new.numero_medidor, new.suministro_numero);
+    END""",
+    # Indexa lo que ya estaba cargado
+    "INSERT INTO lecturas_cliente_fts(lecturas_cliente_fts) VALUES ('rebuild')",
+    "INSERT INTO lecturas_lote_fts(lecturas_lote_fts) VALUES ('rebuild')",
+]
+
+BORRAR = [
+    'DROP TRIGGER IF EXISTS lecturas_lote_fts_au',
+    'DROP TRIGGER IF EXISTS lecturas_lote_fts_ad',
+    'DROP TRIGGER IF EXISTS lecturas_lote_fts_ai',
+    'DROP TABLE IF EXISTS lecturas_lote_fts',
+    'DROP TRIGGER IF EXISTS lecturas_cliente_fts_au',
+    'DROP TRIGGER IF EXISTS lecturas_cliente_fts_ad',
+    'DROP TRIGGER IF EXISTS lecturas_cliente_fts_ai',
+    'DROP TABLE IF EXISTS lecturas_cliente_fts_vocab',
+    'DROP TABLE IF EXISTS lecturas_cliente_fts',
+]
+
+
+def tiene_fts5(connection):
+    if connection.vendor != 'sqlite' or connection.Database.sqlite_version_info < (3, 34):
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return any(opcion == 'ENABLE_FTS5' for opcion, in cursor.fetchall())
+
+
+def crear_indices(apps, schema_editor):
+    if tiene_fts5(schema_editor.connection):
+        for sql in CREAR:
+            schema_editor.execute(sql)
+
+
+def borrar_indices(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in BORRAR:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lecturas', '0005_version_lecturas'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices, borrar_indices),
+    ]
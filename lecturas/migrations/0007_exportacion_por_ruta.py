@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lecturas', '0006_busqueda'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='lote',
+            name='lote_a_exportar_idx',
+        ),
+        migrations.AddIndex(
+            model_name='lote',
+            index=models.Index(condition=models.Q(('enviado_comercial', False)), fields=['ano_consumo', 'mes_consumo', 'ruta', 'cod_lectura'], name='lote_a_exportar_idx'),
+        ),
+    ]
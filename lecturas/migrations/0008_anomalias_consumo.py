@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lecturas', '0007_exportacion_por_ruta'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnomaliaConsumo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ano_consumo', models.IntegerField(verbose_name='Año de Consumo')),
+                ('mes_consumo', models.IntegerField(verbose_name='Mes de Consumo')),
+                ('tipo', models.CharField(choices=[('cero', 'Consumo cero'), ('pico', 'Pico de consumo'), ('vuelta', 'Vuelta del medidor'), ('digitos', 'Dígitos invertidos'), ('negativo', 'Consumo negativo')], max_length=10, verbose_name='Tipo')),
+                ('consumo', models.IntegerField(verbose_name='Consumo (kWh)')),
+                ('mediana', models.FloatField(blank=True, null=True, verbose_name='Mediana Periodos Anteriores')),
+                ('consumo_estimado', models.IntegerField(blank=True, null=True, verbose_name='Consumo Estimado')),
+                ('lectura_sugerida', models.IntegerField(blank=True, null=True, verbose_name='Lectura Sugerida')),
+                ('revisada', models.BooleanField(default=False, verbose_name='Revisada')),
+                ('fecha_deteccion', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Detección')),
+                ('lectura', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='anomalias', to='lecturas.lote')),
+            ],
+            options={
+                'verbose_name': 'Anomalía de Consumo',
+                'verbose_name_plural': 'Anomalías de Consumo',
+                'indexes': [models.Index(fields=['ano_consumo', 'mes_consumo', 'tipo'], name='anomalia_periodo_tipo_idx')],
+                'unique_together': {('lectura', 'tipo')},
+            },
+        ),
+    ]
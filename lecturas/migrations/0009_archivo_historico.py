@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lecturas', '0008_anomalias_consumo'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='lote',
+            options={'verbose_name': 'Lectura', 'verbose_name_plural': 'Lecturas'},
+        ),
+        migrations.CreateModel(
+            name='LoteHistorico',
+            fields=[
+                ('cod_lectura', models.IntegerField(primary_key=True, serialize=False)),
+                ('ano_consumo', models.IntegerField(verbose_name='Año de Consumo')),
+                ('mes_consumo', models.IntegerField(verbose_name='Mes de Consumo')),
+                ('suministro_numero', models.CharField(max_length=50, verbose_name='Nº Suministro')),
+                ('area', models.CharField(max_length=50, verbose_name='Área')),
+                ('ruta', models.CharField(max_length=50, verbose_name='Ruta')),
+                ('orden', models.IntegerField(verbose_name='Orden')),
+                ('tipo_medidor', models.CharField(max_length=50, verbose_name='Tipo de Medidor')),
+                ('numero_medidor', models.CharField(max_length=50, verbose_name='Nº Medidor')),
+                ('lectura_anterior', models.IntegerField(verbose_name='Lectura Anterior')),
+                ('lectura_actual', models.IntegerField(blank=True, null=True, verbose_name='Lectura Actual')),
+                ('consumo_kwh', models.IntegerField(blank=True, null=True, verbose_name='Consumo (kWh)')),
+                ('novedad_libre', models.TextField(blank=True, null=True, verbose_name='Novedad Libre')),
+                ('enviado_comercial', models.BooleanField(default=False, verbose_name='Enviado a Comercial')),
+                ('abierta', models.BooleanField(default=True, verbose_name='Ruta Abierta')),
+                ('fecha_hora_registro', models.DateTimeField(blank=True, null=True, verbose_name='Fecha/Hora Registro')),
+                ('ubi_gps', models.CharField(blank=True, max_length=100, null=True, verbose_name='Ubicación GPS')),
+                ('version', models.PositiveIntegerField(default=0, verbose_name='Versión')),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lecturas_archivadas', to='lecturas.cliente')),
+                ('operador', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='lecturas_archivadas', to='lecturas.operador')),
+            ],
+            options={
+                'verbose_name': 'Lectura Archivada',
+                'verbose_name_plural': 'Lecturas Archivadas',
+            },
+        ),
+        migrations.CreateModel(
+            name='NovedadLecturaHistorica',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('fecha_registro', models.DateTimeField()),
+                ('version', models.PositiveIntegerField(default=0, verbose_name='Versión')),
+                ('lectura', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='novedades', to='lecturas.lotehistorico')),
+                ('novedad', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='novedades_archivadas', to='lecturas.novedad')),
+            ],
+            options={
+                'verbose_name': 'Novedad de Lectura Archivada',
+                'verbose_name_plural': 'Novedades de Lecturas Archivadas',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='lotehistorico',
+            index=models.Index(fields=['numero_medidor', 'ano_consumo', 'mes_consumo'], name='historico_medidor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lotehistorico',
+            index=models.Index(fields=['ano_consumo', 'mes_consumo', 'ruta', 'orden'], name='historico_periodo_ruta_idx'),
+        ),
+    ]
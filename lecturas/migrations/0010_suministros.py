@@ -0,0 +1,188 @@
+import importlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Los datos fijos del suministro y el medidor pasan de cada lectura mensual a la tabla Suministro.
+# Los suministros se arman con los pares distintos (suministro, medidor) de las lecturas de trabajo y las
+# archivadas, y cada lectura queda apuntando al suyo. El índice de búsqueda de medidores y suministros
+# (0006_busqueda) se mueve de las lecturas a los suministros: tiene una entrada por suministro en lugar de
+# una por suministro y por mes.
+
+busqueda = importlib.import_module('lecturas.migrations.0006_busqueda')
+
+CREAR_FTS = [
+    """CREATE VIRTUAL TABLE lecturas_suministro_fts USING fts5(
+        numero_medidor, numero,
+        content='lecturas_suministro', content_rowid='id',
+        tokenize='trigram'
+    )""",
+    """CREATE TRIGGER lecturas_suministro_fts_ai AFTER INSERT ON lecturas_suministro BEGIN
+        INSERT INTO lecturas_suministro_fts(rowid, numero_medidor, numero)
+        VALUES (new.id, new.numero_medidor, new.numero);
+    END""",
+    """CREATE TRIGGER lecturas_suministro_fts_ad AFTER DELETE ON lecturas_suministro BEGIN
+        INSERT INTO lecturas_suministro_fts(lecturas_suministro_fts, rowid, numero_medidor, numero)
+        VALUES ('delete', old.id, old.numero_medidor, old.numero);
+    END""",
+    """CREATE TRIGGER lecturas_suministro_fts_au AFTER UPDATE OF numero_medidor, numero ON lecturas_suministro
+    WHEN old.numero_medidor IS NOT new.numero_medidor OR old.numero IS NOT new.numero BEGIN
+        INSERT INTO lecturas_suministro_fts(lecturas_suministro_fts, rowid, numero_medidor, numero)
+        VALUES ('delete', old.id, old.numero_medidor, old.numero);
+        INSERT INTO lecturas_suministro_fts(rowid, numero_medidor, numero)
+        VALUES (new.id, new.numero_medidor, new.numero);
+    END""",
+    "INSERT INTO lecturas_suministro_fts(lecturas_suministro_fts) VALUES ('rebuild')",
+]
+
+BORRAR_FTS = [
+    'DROP TRIGGER IF EXISTS lecturas_suministro_fts_au',
+    'DROP TRIGGER IF EXISTS lecturas_suministro_fts_ad',
+    'DROP TRIGGER IF EXISTS lecturas_suministro_fts_ai',
+    'DROP TABLE IF EXISTS lecturas_suministro_fts',
+]
+
+# Las sentencias de 0006 que son del índice de las lecturas (las de clientes no se tocan)
+CREAR_FTS_LOTES = [sql for sql in busqueda.CREAR if 'lecturas_lote_fts' in sql]
+BORRAR_FTS_LOTES = [sql for sql in busqueda.BORRAR if 'lecturas_lote_fts' in sql]
+
+
+def borrar_fts_lotes(apps, schema_editor):
+    # Los triggers usan las columnas que se van a borrar, así que tienen que irse antes
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in BORRAR_FTS_LOTES:
+            schema_editor.execute(sql)
+
+
+def crear_fts_lotes(apps, schema_editor):
+    if busqueda.tiene_fts5(schema_editor.connection):
+        for sql in CREAR_FTS_LOTES:
+            schema_editor.execute(sql)
+
+
+def crear_fts_suministros(apps, schema_editor):
+    if busqueda.tiene_fts5(schema_editor.connection):
+        for sql in CREAR_FTS:
+            schema_editor.execute(sql)
+
+
+def borrar_fts_suministros(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in BORRAR_FTS:
+            schema_editor.execute(sql)
+
+
+def _nombres(apps, schema_editor):
+    quote = schema_editor.connection.ops.quote_name
+    return (quote(apps.get_model('lecturas', 'Suministro')._meta.db_table),
+            [quote(apps.get_model('lecturas', modelo)._meta.db_table) for modelo in ('Lote', 'LoteHistorico')])
+
+
+def poblar_suministros(apps, schema_editor):
+    """Un suministro por cada par distinto (suministro, medidor); todo con SQL dentro de la base"""
+    suministros, tablas = _nombres(apps, schema_editor)
+    pares = ' UNION ALL '.join(
+        f'SELECT suministro_numero, numero_medidor, tipo_medidor FROM {tabla}' for tabla in tablas
+    )
+    schema_editor.execute(
+        f'INSERT INTO {suministros} (numero, numero_medidor, tipo_medidor) '
+        f'SELECT suministro_numero, numero_medidor, MAX(tipo_medidor) FROM ({pares}) pares '
+        f'GROUP BY suministro_numero, numero_medidor'
+    )
+    for tabla in tablas:
+        schema_editor.execute(
+            f'UPDATE {tabla} SET suministro_id = (SELECT s.id FROM {suministros} s '
+            f'WHERE s.numero = {tabla}.suministro_numero AND s.numero_medidor = {tabla}.numero_medidor)'
+        )
+
+
+def copiar_a_lecturas(apps, schema_editor):
+    """Vuelta atrás: copia los datos del suministro a cada lectura"""
+    suministros, tablas = _nombres(apps, schema_editor)
+    for tabla in tablas:
+        columnas = ', '.join(
+            f'{destino} = (SELECT s.{origen} FROM {suministros} s WHERE s.id = {tabla}.suministro_id)'
+            for destino, origen in [('suministro_numero', 'numero'), ('numero_medidor', 'numero_medidor'),
+                                    ('tipo_medidor', 'tipo_medidor')]
+        )
+        schema_editor.execute(f'UPDATE {tabla} SET {columnas}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lecturas', '0009_archivo_historico'),
+    ]
+
+    operations = [
+        migrations.RunPython(borrar_fts_lotes, crear_fts_lotes),
+        migrations.CreateModel(
+            name='Suministro',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('numero', models.CharField(max_length=50, verbose_name='Nº Suministro')),
+                ('numero_medidor', models.CharField(max_length=50, verbose_name='Nº Medidor')),
+                ('tipo_medidor', models.CharField(max_length=50, verbose_name='Tipo de Medidor')),
+            ],
+            options={
+                'verbose_name': 'Suministro',
+                'verbose_name_plural': 'Suministros',
+                'indexes': [models.Index(fields=['numero_medidor'], name='suministro_medidor_idx')],
+                'constraints': [models.UniqueConstraint(fields=('numero', 'numero_medidor'),
+                                                        name='suministro_medidor_unico')],
+            },
+        ),
+        migrations.AddField(
+            model_name='lote',
+            name='suministro',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT,
+                                    related_name='lecturas', to='lecturas.suministro'),
+        ),
+        migrations.AddField(
+            model_name='lotehistorico',
+            name='suministro',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT,
+                                    related_name='lecturas_archivadas', to='lecturas.suministro'),
+        ),
+        migrations.RunPython(poblar_suministros, copiar_a_lecturas),
+        migrations.RemoveIndex(
+            model_name='lotehistorico',
+            name='historico_medidor_idx',
+        ),
+        # Solo en el estado: con un default, al volver atrás se pueden crear de nuevo las columnas (después las
+        # llena copiar_a_lecturas). En la base no cambia nada
+        migrations.SeparateDatabaseAndState(state_operations=[
+            migrations.AlterField(
+                model_name=modelo,
+                name=nombre,
+                field=models.CharField(default='', max_length=50, verbose_name=descripcion),
+            )
+            for modelo in ('lote', 'lotehistorico')
+            for nombre, descripcion in [('suministro_numero', 'Nº Suministro'), ('tipo_medidor', 'Tipo de Medidor'),
+                                        ('numero_medidor', 'Nº Medidor')]
+        ]),
+        migrations.RemoveField(model_name='lote', name='suministro_numero'),
+        migrations.RemoveField(model_name='lote', name='tipo_medidor'),
+        migrations.RemoveField(model_name='lote', name='numero_medidor'),
+        migrations.RemoveField(model_name='lotehistorico', name='suministro_numero'),
+        migrations.RemoveField(model_name='lotehistorico', name='tipo_medidor'),
+        migrations.RemoveField(model_name='lotehistorico', name='numero_medidor'),
+        migrations.AlterField(
+            model_name='lote',
+            name='suministro',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='lecturas',
+                                    to='lecturas.suministro'),
+        ),
+        migrations.AlterField(
+            model_name='lotehistorico',
+            name='suministro',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='lecturas_archivadas',
+                                    to='lecturas.suministro'),
+        ),
+        migrations.AddIndex(
+            model_name='lotehistorico',
+            index=models.Index(fields=['suministro', 'ano_consumo', 'mes_consumo'], name='historico_medidor_idx'),
+        ),
+        migrations.RunPython(crear_fts_suministros, borrar_fts_suministros),
+    ]
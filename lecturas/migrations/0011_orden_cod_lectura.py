@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:15
+
+from django.db import migrations, models
+
+
+# El orden de recorrido se puede repetir dentro de una ruta: la paginación de la toma de lecturas va por
+# (orden, cod_lectura) y los índices lo incluyen para que la consulta siga sin ordenar en memoria.
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lecturas', '0010_suministros'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='lote',
+            name='lote_periodo_ruta_orden_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='lote',
+            name='lote_pendientes_idx',
+        ),
+        migrations.AddIndex(
+            model_name='lote',
+            index=models.Index(fields=['ano_consumo', 'mes_consumo', 'ruta', 'orden', 'cod_lectura'], name='lote_periodo_ruta_orden_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lote',
+            index=models.Index(condition=models.Q(('lectura_actual__isnull', True)), fields=['ano_consumo', 'mes_consumo', 'ruta', 'orden', 'cod_lectura'], name='lote_pendientes_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lecturas', '0011_orden_cod_lectura'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnomaliaConsumoHistorica',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('ano_consumo', models.IntegerField(verbose_name='Año de Consumo')),
+                ('mes_consumo', models.IntegerField(verbose_name='Mes de Consumo')),
+                ('tipo', models.CharField(choices=[('cero', 'Consumo cero'), ('pico', 'Pico de consumo'), ('vuelta', 'Vuelta del medidor'), ('digitos', 'Dígitos invertidos'), ('negativo', 'Consumo negativo')], max_length=10, verbose_name='Tipo')),
+                ('consumo', models.IntegerField(verbose_name='Consumo (kWh)')),
+                ('mediana', models.FloatField(blank=True, null=True, verbose_name='Mediana Periodos Anteriores')),
+                ('consumo_estimado', models.IntegerField(blank=True, null=True, verbose_name='Consumo Estimado')),
+                ('lectura_sugerida', models.IntegerField(blank=True, null=True, verbose_name='Lectura Sugerida')),
+                ('revisada', models.BooleanField(default=False, verbose_name='Revisada')),
+                ('fecha_deteccion', models.DateTimeField(verbose_name='Fecha de Detección')),
+                ('lectura', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='anomalias', to='lecturas.lotehistorico')),
+            ],
+            options={
+                'verbose_name': 'Anomalía de Consumo Archivada',
+                'verbose_name_plural': 'Anomalías de Consumo Archivadas',
+            },
+        ),
+    ]
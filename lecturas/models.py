@@ -1,7 +1,12 @@
 from django.db import models                    #Esta libreria me permite heredar los metodos para trabajr con el ORM.
+from django.db import transaction               #Esta libreria la uso para que la reconstrucción de los resúmenes sea atómica.
+from django.db import connection                #Esta libreria la uso para ajustar la secuencia de clientes en PostgreSQL.
+from django.core.management.color import no_style   #Estilo vacío que pide sequence_reset_sql.
 from django.contrib.auth.models import User     #Esta libreria la uso para manejar la autenticacion de usuarios integrada.
 from django.utils import timezone               #Esta libreria la uso para insertar un timestamp en el campo fecha_hora_registro.
 
+from .avisos import publicar_avance, publicar_recarga   #Avisos en vivo del avance de las rutas a los supervisores.
+
 
 class Operador(models.Model):
     """Esta clase modela los operadores del sistema"""
@@ -30,6 +35,16 @@ class Cliente(models.Model):
     
     def __str__(self):
         return self.denominacion
+    
+    @classmethod
+    def ajustar_secuencia(cls):
+        """Después de insertar clientes con el código de comercial, hace que la secuencia del código siga
+        desde el máximo (en PostgreSQL no avanza sola; en SQLite no hace nada)"""
+        sentencias = connection.ops.sequence_reset_sql(no_style(), [cls])
+        if sentencias:
+            with connection.cursor() as cursor:
+                for sql in sentencias:
+                    cursor.execute(sql)
 
 
 class Novedad(models.Model):
@@ -46,7 +61,97 @@ class Novedad(models.Model):
         return self.descripcion
 
 
-class Lote(models.Model):
+class SuministroManager(models.Manager):
+    def resolver(self, datos):
+        """Recibe (numero, numero_medidor, tipo_medidor) de muchas lecturas y devuelve un diccionario
+        {(numero, numero_medidor): id}. Los que no existen se crean en una sola inserción."""
+        tipos = {(numero, medidor): tipo for numero, medidor, tipo in datos}
+        ids = self._buscar(tipos)
+        faltantes = [Suministro(numero=numero, numero_medidor=medidor, tipo_medidor=tipo)
+                     for (numero, medidor), tipo in tipos.items() if (numero, medidor) not in ids]
+        if faltantes:
+            # ignore_conflicts por si otra carga los creó al mismo tiempo; los ids se vuelven a leer
+            self.bulk_create(faltantes, ignore_conflicts=True)
+            ids.update(self._buscar({(s.numero, s.numero_medidor) for s in faltantes}))
+        return ids
+    
+    def _buscar(self, pares):
+        return {
+            (numero, medidor): pk
+            for pk, numero, medidor in self.filter(numero__in={numero for numero, medidor in pares}).values_list(
+                'pk', 'numero', 'numero_medidor'
+            )
+            if (numero, medidor) in pares
+        }
+
+
+class Suministro(models.Model):
+    """Un suministro con el medidor instalado. Son los datos que no cambian de un mes a otro, así cada lectura
+    mensual solo guarda la referencia. Si se cambia el medidor se crea otro registro (el par suministro y
+    medidor es único), de modo que las lecturas de los periodos anteriores conservan el medidor que tenían."""
+    numero = models.CharField(max_length=50, verbose_name='Nº Suministro')
+    numero_medidor = models.CharField(max_length=50, verbose_name='Nº Medidor')
+    tipo_medidor = models.CharField(max_length=50, verbose_name='Tipo de Medidor')
+    
+    objects = SuministroManager()
+    
+    # Redefino algunas propiedades de la clase Meta heredadas de models para que sean ms representativas
+    class Meta:
+        verbose_name = 'Suministro'
+        verbose_name_plural = 'Suministros'
+        constraints = [
+            models.UniqueConstraint(fields=['numero', 'numero_medidor'], name='suministro_medidor_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['numero_medidor'], name='suministro_medidor_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.numero} - Medidor {self.numero_medidor}"
+
+
+class DatosSuministro:
+    """Los campos que antes estaban repetidos en cada lectura, leídos del suministro (las consultas que los
+    muestran tienen que usar select_related('suministro'))"""
+    @property
+    def suministro_numero(self):
+        return self.suministro.numero
+    
+    @property
+    def numero_medidor(self):
+        return self.suministro.numero_medidor
+    
+    @property
+    def tipo_medidor(self):
+        return self.suministro.tipo_medidor
+
+
+class LoteManager(models.Manager):
+    """Lote.objects es la tabla de trabajo: solo tiene los periodos que no se archivaron (archivar_periodo),
+    así las vistas operativas no cargan con los años de historia. Para historial e informes, con_archivadas
+    junta la tabla de trabajo con LoteHistorico."""
+    def con_archivadas(self, *campos, **filtros):
+        """values_list(*campos) de las lecturas que cumplen filtros, estén en la tabla de trabajo o archivadas
+        (UNION ALL). El resultado se puede ordenar y recortar, pero no volver a filtrar."""
+        return self.filter(**filtros).order_by().values_list(*campos).union(
+            LoteHistorico.objects.filter(**filtros).order_by().values_list(*campos), all=True
+        )
+    
+    def cambio_leidos(self, leidas=(), sin_leer=()):
+        """Cuánto cambia la cantidad de medidores leídos de la ruta al guardar las lecturas leidas (con lectura) y
+        sin_leer (sin lectura), según el estado que tienen en la base en este momento.
+        Se llama dentro de la transacción que las guarda y antes de guardarlas: el UPDATE no modifica nada pero
+        bloquea las filas, así dos envíos a la vez de la misma lectura (doble clic, un colector que reenvía después
+        de un timeout) no la cuentan dos veces."""
+        cambio = 0
+        if leidas:
+            cambio += self.filter(pk__in=leidas, lectura_actual__isnull=True).update(version=models.F('version'))
+        if sin_leer:
+            cambio -= self.filter(pk__in=sin_leer, lectura_actual__isnull=False).update(version=models.F('version'))
+        return cambio
+
+
+class Lote(DatosSuministro, models.Model):
     """Esta clase modela las lecturas de medidores y sus posibles novedades"""
     cod_lectura = models.AutoField(primary_key=True)
     
@@ -56,17 +161,13 @@ class Lote(models.Model):
     
     # Datos del cliente y suministro
     cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='lecturas')
-    suministro_numero = models.CharField(max_length=50, verbose_name='Nº Suministro')
+    suministro = models.ForeignKey(Suministro, on_delete=models.PROTECT, related_name='lecturas')
     
-    # Datos de la ruta
+    # Datos de la ruta (son del periodo: la ruta y el orden de recorrido pueden cambiar de un mes a otro)
     area = models.CharField(max_length=50, verbose_name='Área')
     ruta = models.CharField(max_length=50, verbose_name='Ruta')
     orden = models.IntegerField(verbose_name='Orden')
     
-    # Datos del medidor
-    tipo_medidor = models.CharField(max_length=50, verbose_name='Tipo de Medidor')
-    numero_medidor = models.CharField(max_length=50, verbose_name='Nº Medidor')
-    
     # Lecturas y consumo
     lectura_anterior = models.IntegerField(verbose_name='Lectura Anterior')
     lectura_actual = models.IntegerField(null=True, blank=True, verbose_name='Lectura Actual')
@@ -78,6 +179,7 @@ class Lote(models.Model):
     
     # Estados
     enviado_comercial = models.BooleanField(default=False, verbose_name='Enviado a Comercial')
+    # Ya no se usa: el estado de la ruta está en RutaPeriodo.abierta. Queda por compatibilidad con los datos viejos
     abierta = models.BooleanField(default=True, verbose_name='Ruta Abierta')
     
     # Auditoría
@@ -85,18 +187,38 @@ class Lote(models.Model):
     ubi_gps = models.CharField(max_length=100, null=True, blank=True, verbose_name='Ubicación GPS')
     operador = models.ForeignKey(Operador, on_delete=models.SET_NULL, null=True, blank=True, related_name='lecturas')
     
-    # Redefino algunas propiedades de la clase Meta heredadas de models para que sean ms representativas
+    # Sincronización: versión de la ruta (RutaPeriodo.version) en la que se modificó la fila por última vez
+    version = models.PositiveIntegerField(default=0, verbose_name='Versión')
+    
+    objects = LoteManager()
+    
+    # Redefino algunas propiedades de la clase Meta heredadas de models para que sean ms representativas.
+    # Sin ordering por defecto: cada consulta pide el orden que necesita (y count/exists no ordenan nada)
     class Meta:
         verbose_name = 'Lectura'
         verbose_name_plural = 'Lecturas'
-        ordering = ['ano_consumo', 'mes_consumo', 'ruta', 'orden']
+        # Los índices siguen los caminos de acceso de las vistas: casi todo filtra por periodo y ruta y
+        # ordena por orden (y cod_lectura, porque el orden se puede repetir dentro de la ruta). Los parciales solo
+        # guardan las filas pendientes, así que son chicos.
         indexes = [
-            models.Index(fields=['ano_consumo', 'mes_consumo']),
-            models.Index(fields=['ruta']),
+            models.Index(fields=['ano_consumo', 'mes_consumo', 'ruta', 'orden', 'cod_lectura'],
+                         name='lote_periodo_ruta_orden_idx'),
+            models.Index(
+                fields=['ano_consumo', 'mes_consumo', 'ruta', 'orden', 'cod_lectura'],
+                name='lote_pendientes_idx',
+                condition=models.Q(lectura_actual__isnull=True),
+            ),
+            models.Index(
+                fields=['ano_consumo', 'mes_consumo', 'ruta', 'cod_lectura'],
+                name='lote_a_exportar_idx',
+                condition=models.Q(enviado_comercial=False),
+            ),
+            models.Index(fields=['ano_consumo', 'mes_consumo', 'ruta', 'version'], name='lote_cambios_idx'),
         ]
     
     def __str__(self):
-        return f"Lectura {self.cod_lectura} - {self.cliente.denominacion} ({self.ano_consumo}/{self.mes_consumo})"
+        # Solo con columnas propias: se muestra en listados y selects sin consultar el cliente de cada lectura
+        return f"Lectura {self.cod_lectura} - Ruta {self.ruta} orden {self.orden} ({self.ano_consumo}/{self.mes_consumo})"
     
     def save(self, *args, **kwargs):
         # Calculo el consumo si hay lectura actual
@@ -122,6 +244,7 @@ class NovedadLectura(models.Model):
     lectura = models.ForeignKey(Lote, on_delete=models.CASCADE)
     novedad = models.ForeignKey(Novedad, on_delete=models.CASCADE)
     fecha_registro = models.DateTimeField(auto_now_add=True)
+    version = models.PositiveIntegerField(default=0, verbose_name='Versión')
     
     # Redefino algunas propiedades de la clase Meta heredadas de models para que sean ms representativas
     class Meta:
@@ -130,4 +253,241 @@ class NovedadLectura(models.Model):
         unique_together = ['lectura', 'novedad']
     
     def __str__(self):
-        return f"{self.lectura.cod_lectura} - {self.novedad.descripcion}"
+        return f"{self.lectura_id} - {self.novedad_id}"
+    
+    @classmethod
+    def reemplazar(cls, novedades_por_lectura, version=0):
+        """Deja a cada lectura solo con las novedades indicadas ({cod_lectura: {cod_novedad, ...}}).
+        Compara con lo que ya hay y solo borra y agrega las diferencias, así las que no cambian conservan
+        su fecha de registro. Son tres consultas sin importar cuántas lecturas o novedades haya."""
+        existentes = cls.objects.filter(lectura_id__in=novedades_por_lectura).values_list('id', 'lectura_id', 'novedad_id')
+        
+        a_borrar = []
+        actuales = set()
+        for id, cod_lectura, cod_novedad in existentes:
+            if cod_novedad in novedades_por_lectura[cod_lectura]:
+                actuales.add((cod_lectura, cod_novedad))
+            else:
+                a_borrar.append(id)
+        
+        if a_borrar:
+            cls.objects.filter(id__in=a_borrar).delete()
+        cls.objects.bulk_create(
+            cls(lectura_id=cod_lectura, novedad_id=cod_novedad, version=version)
+            for cod_lectura, cod_novedades in novedades_por_lectura.items()
+            for cod_novedad in cod_novedades
+            if (cod_lectura, cod_novedad) not in actuales
+        )
+
+
+class RutaPeriodo(models.Model):
+    """Resumen del avance de cada ruta en un periodo.
+    Se actualiza de a poco desde las vistas que modifican lecturas, así el listado de rutas no tiene que
+    agrupar todo el lote del periodo cada vez que se abre."""
+    ano_consumo = models.IntegerField(verbose_name='Año de Consumo')
+    mes_consumo = models.IntegerField(verbose_name='Mes de Consumo')
+    ruta = models.CharField(max_length=50, verbose_name='Ruta')
+    area = models.CharField(max_length=50, verbose_name='Área')
+    
+    # Avance
+    total_medidores = models.IntegerField(default=0, verbose_name='Total Medidores')
+    leidos = models.IntegerField(default=0, verbose_name='Leídos')
+    # Estado de la ruta: cerrar o abrir una ruta es solo cambiar este campo (no se tocan las lecturas)
+    abierta = models.BooleanField(default=True, verbose_name='Ruta Abierta')
+    operador_nombre = models.CharField(max_length=150, blank=True, default='', verbose_name='Último Operador')
+    
+    # Se incrementa con cada cambio en la ruta; los colectores lo usan para saber si tienen que volver a bajarla
+    version = models.PositiveIntegerField(default=1, verbose_name='Versión')
+    
+    # Redefino algunas propiedades de la clase Meta heredadas de models para que sean ms representativas
+    class Meta:
+        verbose_name = 'Ruta del Periodo'
+        verbose_name_plural = 'Rutas del Periodo'
+        unique_together = ['ano_consumo', 'mes_consumo', 'ruta']
+    
+    def __str__(self):
+        return f"Ruta {self.ruta} ({self.ano_consumo}/{self.mes_consumo})"
+    
+    @property
+    def faltantes(self):
+        """Devuelve la cantidad de medidores que todavía no se leyeron"""
+        return self.total_medidores - self.leidos
+    
+    @classmethod
+    def reconstruir(cls, ano, mes):
+        """Vuelve a calcular desde cero el resumen de todas las rutas de un periodo"""
+        rutas = Lote.objects.filter(ano_consumo=ano, mes_consumo=mes).order_by().values('ruta').annotate(
+            area_ruta=models.Max('area'),
+            total=models.Count('cod_lectura'),
+            cantidad_leidos=models.Count('cod_lectura', filter=models.Q(lectura_actual__isnull=False)),
+            cantidad_abiertas=models.Count('cod_lectura', filter=models.Q(abierta=True)),
+            ultimo_operador=models.Max('operador__user__first_name'),
+            version_maxima=models.Max('version'),
+        )
+        with transaction.atomic():
+            # La versión nunca puede volver atrás, si no los colectores se perderían cambios.
+            # El estado se conserva; solo las rutas que no tenían resumen lo toman de las lecturas
+            anteriores = {
+                ruta: (version, abierta)
+                for ruta, version, abierta in cls.objects.filter(ano_consumo=ano, mes_consumo=mes).values_list(
+                    'ruta', 'version', 'abierta'
+                )
+            }
+            cls.objects.filter(ano_consumo=ano, mes_consumo=mes).delete()
+            cls.objects.bulk_create(
+                cls(
+                    ano_consumo=ano,
+                    mes_consumo=mes,
+                    ruta=ruta['ruta'],
+                    area=ruta['area_ruta'],
+                    total_medidores=ruta['total'],
+                    leidos=ruta['cantidad_leidos'],
+                    abierta=anteriores[ruta['ruta']][1] if ruta['ruta'] in anteriores else ruta['cantidad_abiertas'] > 0,
+                    operador_nombre=ruta['ultimo_operador'] or '',
+                    version=max(anteriores.get(ruta['ruta'], (0,))[0], ruta['version_maxima'] or 0) + 1,
+                )
+                for ruta in rutas
+            )
+            transaction.on_commit(lambda: publicar_recarga(ano, mes))
+    
+    @classmethod
+    def registrar_cambio(cls, ano, mes, ruta, leidos=0, operador=None, solo_abierta=False, **campos):
+        """Registra un cambio en la ruta: suma (o resta) leidos, guarda el operador y los campos indicados
+        e incrementa la versión.
+        Devuelve la nueva versión para marcar con ella las filas modificadas; se tiene que llamar dentro de
+        la misma transacción que las guarda. Devuelve 0 si la ruta no existe o, con solo_abierta, si está
+        cerrada (la verificación va en el mismo UPDATE, así no se cuela una lectura mientras se cierra).
+        Cuando se confirma la transacción, publica el estado nuevo de la ruta (lecturas/avisos.py)."""
+        cambios = {'version': models.F('version') + 1, **campos}
+        if leidos:
+            cambios['leidos'] = models.F('leidos') + leidos
+        if operador is not None:
+            cambios['operador_nombre'] = operador.user.first_name
+        rutas = cls.objects.filter(ano_consumo=ano, mes_consumo=mes, ruta=ruta)
+        if not (rutas.filter(abierta=True) if solo_abierta else rutas).update(**cambios):
+            return 0
+        estado = rutas.values('ruta', 'version', 'abierta', 'total_medidores', 'leidos').first()
+        if estado is None:
+            return 0
+        transaction.on_commit(lambda: publicar_avance(ano, mes, estado))
+        return estado['version']
+
+
+class AnomaliaConsumo(models.Model):
+    """Consumo sospechoso de una lectura, detectado por el comando detectar_anomalias para que se revise"""
+    TIPOS = [
+        ('cero', 'Consumo cero'),
+        ('pico', 'Pico de consumo'),
+        ('vuelta', 'Vuelta del medidor'),
+        ('digitos', 'Dígitos invertidos'),
+        ('negativo', 'Consumo negativo'),
+    ]
+    
+    lectura = models.ForeignKey(Lote, on_delete=models.CASCADE, related_name='anomalias')
+    ano_consumo = models.IntegerField(verbose_name='Año de Consumo')
+    mes_consumo = models.IntegerField(verbose_name='Mes de Consumo')
+    tipo = models.CharField(max_length=10, choices=TIPOS, verbose_name='Tipo')
+    
+    # Datos con los que se decidió, para no tener que volver a calcularlos al revisar
+    consumo = models.IntegerField(verbose_name='Consumo (kWh)')
+    mediana = models.FloatField(null=True, blank=True, verbose_name='Mediana Periodos Anteriores')
+    consumo_estimado = models.IntegerField(null=True, blank=True, verbose_name='Consumo Estimado')
+    lectura_sugerida = models.IntegerField(null=True, blank=True, verbose_name='Lectura Sugerida')
+    
+    revisada = models.BooleanField(default=False, verbose_name='Revisada')
+    fecha_deteccion = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Detección')
+    
+    # Redefino algunas propiedades de la clase Meta heredadas de models para que sean ms representativas
+    class Meta:
+        verbose_name = 'Anomalía de Consumo'
+        verbose_name_plural = 'Anomalías de Consumo'
+        unique_together = ['lectura', 'tipo']
+        indexes = [
+            models.Index(fields=['ano_consumo', 'mes_consumo', 'tipo'], name='anomalia_periodo_tipo_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_tipo_display()} - Lectura {self.lectura_id} ({self.ano_consumo}/{self.mes_consumo})"
+
+
+class LoteHistorico(DatosSuministro, models.Model):
+    """Lecturas de los periodos archivados: la misma forma que Lote (se copian con INSERT ... SELECT y
+    conservan su cod_lectura), pero de solo lectura y con índices para consultas de historia e informes.
+    Se llena y se vacía únicamente con el comando archivar_periodo."""
+    cod_lectura = models.IntegerField(primary_key=True)
+    ano_consumo = models.IntegerField(verbose_name='Año de Consumo')
+    mes_consumo = models.IntegerField(verbose_name='Mes de Consumo')
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='lecturas_archivadas')
+    suministro = models.ForeignKey(Suministro, on_delete=models.PROTECT, related_name='lecturas_archivadas')
+    area = models.CharField(max_length=50, verbose_name='Área')
+    ruta = models.CharField(max_length=50, verbose_name='Ruta')
+    orden = models.IntegerField(verbose_name='Orden')
+    lectura_anterior = models.IntegerField(verbose_name='Lectura Anterior')
+    lectura_actual = models.IntegerField(null=True, blank=True, verbose_name='Lectura Actual')
+    consumo_kwh = models.IntegerField(null=True, blank=True, verbose_name='Consumo (kWh)')
+    novedad_libre = models.TextField(null=True, blank=True, verbose_name='Novedad Libre')
+    enviado_comercial = models.BooleanField(default=False, verbose_name='Enviado a Comercial')
+    abierta = models.BooleanField(default=True, verbose_name='Ruta Abierta')
+    fecha_hora_registro = models.DateTimeField(null=True, blank=True, verbose_name='Fecha/Hora Registro')
+    ubi_gps = models.CharField(max_length=100, null=True, blank=True, verbose_name='Ubicación GPS')
+    operador = models.ForeignKey(Operador, on_delete=models.SET_NULL, null=True, blank=True,
+                                 related_name='lecturas_archivadas')
+    version = models.PositiveIntegerField(default=0, verbose_name='Versión')
+    
+    # Redefino algunas propiedades de la clase Meta heredadas de models para que sean ms representativas
+    class Meta:
+        verbose_name = 'Lectura Archivada'
+        verbose_name_plural = 'Lecturas Archivadas'
+        # La historia se consulta por medidor o por periodo y ruta (no hay índices de pendientes ni de cambios)
+        indexes = [
+            models.Index(fields=['suministro', 'ano_consumo', 'mes_consumo'], name='historico_medidor_idx'),
+            models.Index(fields=['ano_consumo', 'mes_consumo', 'ruta', 'orden'], name='historico_periodo_ruta_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Lectura archivada {self.cod_lectura} ({self.ano_consumo}/{self.mes_consumo})"
+    
+    def save(self, *args, **kwargs):
+        raise ValueError('Las lecturas archivadas no se modifican: primero hay que restaurar el periodo')
+
+
+class NovedadLecturaHistorica(models.Model):
+    """Novedades de las lecturas archivadas (la misma forma que NovedadLectura)"""
+    id = models.IntegerField(primary_key=True)
+    lectura = models.ForeignKey(LoteHistorico, on_delete=models.CASCADE, related_name='novedades')
+    # PROTECT: un tipo de novedad usado en la historia no se puede borrar
+    novedad = models.ForeignKey(Novedad, on_delete=models.PROTECT, related_name='novedades_archivadas')
+    fecha_registro = models.DateTimeField()
+    version = models.PositiveIntegerField(default=0, verbose_name='Versión')
+    
+    # Redefino algunas propiedades de la clase Meta heredadas de models para que sean ms representativas
+    class Meta:
+        verbose_name = 'Novedad de Lectura Archivada'
+        verbose_name_plural = 'Novedades de Lecturas Archivadas'
+    
+    def __str__(self):
+        return f"{self.lectura_id} - {self.novedad_id}"
+
+
+class AnomaliaConsumoHistorica(models.Model):
+    """Anomalías de las lecturas archivadas, con su revisión (la misma forma que AnomaliaConsumo, para volver a
+    la tabla de trabajo si se restaura el periodo)"""
+    id = models.BigIntegerField(primary_key=True)
+    lectura = models.ForeignKey(LoteHistorico, on_delete=models.CASCADE, related_name='anomalias')
+    ano_consumo = models.IntegerField(verbose_name='Año de Consumo')
+    mes_consumo = models.IntegerField(verbose_name='Mes de Consumo')
+    tipo = models.CharField(max_length=10, choices=AnomaliaConsumo.TIPOS, verbose_name='Tipo')
+    consumo = models.IntegerField(verbose_name='Consumo (kWh)')
+    mediana = models.FloatField(null=True, blank=True, verbose_name='Mediana Periodos Anteriores')
+    consumo_estimado = models.IntegerField(null=True, blank=True, verbose_name='Consumo Estimado')
+    lectura_sugerida = models.IntegerField(null=True, blank=True, verbose_name='Lectura Sugerida')
+    revisada = models.BooleanField(default=False, verbose_name='Revisada')
+    fecha_deteccion = models.DateTimeField(verbose_name='Fecha de Detección')
+    
+    # Redefino algunas propiedades de la clase Meta heredadas de models para que sean ms representativas
+    class Meta:
+        verbose_name = 'Anomalía de Consumo Archivada'
+        verbose_name_plural = 'Anomalías de Consumo Archivadas'
+    
+    def __str__(self):
+        return f"{self.get_tipo_display()} - Lectura {self.lectura_id} ({self.ano_consumo}/{self.mes_consumo})"
@@ -0,0 +1,28 @@
+from django.conf import settings
+
+
+# Perfil de rendimiento para SQLite, para las sucursales que no usan PostgreSQL. Se activa con
+# SQLITE_OPTIMIZADO = True y se aplica a cada conexión nueva desde la señal connection_created.
+#   journal_mode=WAL     los lectores no bloquean al que escribe ni al revés
+#   synchronous=NORMAL   con WAL no se pierde consistencia, solo (ante un corte de luz) la última transacción
+#   busy_timeout         cuánto espera una escritura a que se libere la base antes de fallar con "database is locked"
+#   mmap_size/cache_size lecturas desde memoria en lugar de llamadas al sistema
+
+PRAGMAS_POR_DEFECTO = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 20000,           # milisegundos
+    'mmap_size': 256 * 1024 * 1024,  # bytes
+    'cache_size': -64000,            # negativo = KiB (unos 64 MB por conexión)
+    'temp_store': 'MEMORY',
+}
+
+
+def aplicar_pragmas(sender, connection, **kwargs):
+    """Receptor de connection_created: configura la conexión SQLite si el perfil está activado"""
+    if connection.vendor != 'sqlite' or not getattr(settings, 'SQLITE_OPTIMIZADO', False):
+        return
+    pragmas = {**PRAGMAS_POR_DEFECTO, **getattr(settings, 'SQLITE_PRAGMAS', {})}
+    with connection.cursor() as cursor:
+        for nombre, valor in pragmas.items():
+            cursor.execute(f'PRAGMA {nombre} = {valor}')
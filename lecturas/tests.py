@@ -0,0 +1,818 @@
+import importlib.util
+import json
+import os
+import runpy
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .avisos import RECARGAR, MemoriaBackend, backend_avisos, canal_periodo
+from .benchmark import consultas_con_indice, generar_periodo, nombre_ruta, preparar_usuario, problema_en_plan
+from .exportacion import generar_exportacion
+from .models import (AnomaliaConsumo, AnomaliaConsumoHistorica, Cliente, Lote, LoteHistorico, Novedad, NovedadLectura,
+                     RutaPeriodo, Suministro)
+
+
+ANO, MES = 2026, 1
+
+
+class IndicesTests(TestCase):
+    """Las consultas de las vistas se resuelven con índices (lo mismo que revisa el comando verificar_indices)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        generar_periodo(ANO, MES, 2000, 10)
+
+    def test_consultas_usan_indice(self):
+        for nombre, consulta, ordenada in consultas_con_indice(ANO, MES):
+            with self.subTest(nombre):
+                plan = consulta.explain()
+                self.assertIsNone(problema_en_plan(plan, ordenada), plan)
+
+
+
+class ConsultasAdminTests(TestCase):
+    """Los listados del admin hacen una cantidad fija de consultas por página, sin importar cuántas filas muestran.
+
+    Cuentan la sesión y el usuario; un N+1 o un COUNT de más en los listados los hace fallar. benchmark_admin mide
+    lo mismo con 100.000 lecturas; acá se baja MINIMO_ESTIMADO para pasar por la estimación con menos filas.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        generar_periodo(ANO, MES, 3000, 30)
+        cls.usuario = User.objects.create_superuser('admin_tests', password='tests123')
+        # Las estadísticas de las que sale la cantidad estimada de filas
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def assertConsultas(self, cantidad, url, datos=None):
+        with self.assertNumQueries(cantidad) as consultas:
+            respuesta = self.client.get(url, datos)
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta, [consulta['sql'] for consulta in consultas.captured_queries]
+
+    @mock.patch('lecturas.admin.MINIMO_ESTIMADO', 1000)
+    def test_listado_lotes_estimado(self):
+        # Sesión, usuario, periodos del filtro, estadísticas de la tabla (en SQLite primero se fija que existan)
+        # y la página: la cantidad sale de sqlite_stat1 o pg_class y no hay COUNT(*) de la tabla entera
+        respuesta, consultas = self.assertConsultas(
+            6 if connection.vendor == 'sqlite' else 5, reverse('admin:lecturas_lote_changelist')
+        )
+        self.assertFalse([sql for sql in consultas if 'COUNT(' in sql.upper() and 'lecturas_lote' in sql])
+        self.assertEqual(respuesta.context['cl'].result_count, 3000)
+
+    def test_listado_lotes(self):
+        url = reverse('admin:lecturas_lote_changelist')
+        # Lo mismo, pero la estimación da menos de MINIMO_ESTIMADO y se cuenta con COUNT(*)
+        self.assertConsultas(7 if connection.vendor == 'sqlite' else 6, url)
+        # Con periodo no se estima: sesión, usuario, periodos y rutas del filtro, COUNT y la página
+        self.assertConsultas(6, url, {'periodo': f'{ANO}-{MES:02d}'})
+        self.assertConsultas(6, url, {'periodo': f'{ANO}-{MES:02d}', 'ruta': nombre_ruta(1)})
+
+    def test_listado_rutas_periodo(self):
+        url = reverse('admin:lecturas_rutaperiodo_changelist')
+        # Sesión, usuario, COUNT filtrado y total, la página y las opciones de los filtros de año y mes
+        self.assertConsultas(7, url)
+        self.assertConsultas(7, url, {'ano_consumo': ANO, 'mes_consumo': MES})
+
+
+class DescargarRutaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        generar_periodo(ANO, MES, 200, 2)
+        cls.usuario = preparar_usuario()
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+        self.url = reverse('api_descargar_ruta', args=[ANO, MES, nombre_ruta(0)])
+
+    def test_etag_distinto_por_codificacion(self):
+        comprimida = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        sin_comprimir = self.client.get(self.url)
+        self.assertEqual(comprimida['Content-Encoding'], 'gzip')
+        self.assertNotIn('Content-Encoding', sin_comprimir)
+        self.assertNotEqual(comprimida['ETag'], sin_comprimir['ETag'])
+        self.assertIn('Accept-Encoding', comprimida['Vary'])
+
+        # Cada ETag solo vale para su propia variante
+        self.assertEqual(self.client.get(
+            self.url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=comprimida['ETag']
+        ).status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=comprimida['ETag']).status_code, 200)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=sin_comprimir['ETag']).status_code, 304)
+
+    def test_cambio_de_cliente_en_el_admin(self):
+        anterior = self.client.get(self.url)
+        lote = Lote.objects.filter(ruta=nombre_ruta(0)).select_related('cliente').first()
+        administrador = User.objects.create_superuser('admin_tests', password='tests123')
+        self.client.force_login(administrador)
+        self.client.post(reverse('admin:lecturas_cliente_change', args=[lote.cliente_id]), {
+            'cod_cli': lote.cliente_id, 'denominacion': 'Nombre nuevo', 'domicilio': lote.cliente.domicilio,
+        })
+
+        respuesta = self.client.get(self.url, HTTP_IF_NONE_MATCH=anterior['ETag'])
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn('Nombre nuevo', respuesta.content.decode())
+
+    def test_etag_valido_con_cualquier_nombre_de_ruta(self):
+        RutaPeriodo.objects.filter(ruta=nombre_ruta(0)).update(ruta='R "1"')
+        respuesta = self.client.get(reverse('api_descargar_ruta', args=[ANO, MES, 'R "1"']))
+        self.assertRegex(respuesta['ETag'], r'^"[\x21\x23-\x7e]+"$')
+        self.assertEqual(self.client.get(
+            reverse('api_descargar_ruta', args=[ANO, MES, 'R "1"']), HTTP_IF_NONE_MATCH=respuesta['ETag']
+        ).status_code, 304)
+
+
+class ExportacionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        generar_periodo(ANO, MES, 300, 3)
+        RutaPeriodo.objects.filter(ano_consumo=ANO, mes_consumo=MES).update(abierta=False)
+
+    def test_marca_enviados_al_terminar(self):
+        partes = generar_exportacion(ANO, MES, tamaño_bloque=50)
+        # Todos los bloques escritos, pero el consumidor todavía no terminó (una descarga cortada)
+        self.assertEqual(len([next(partes) for _ in range(7)]), 7)
+        self.assertFalse(Lote.objects.filter(enviado_comercial=True).exists())
+
+        self.assertEqual(list(partes), [])
+        self.assertFalse(Lote.objects.filter(ano_consumo=ANO, mes_consumo=MES, enviado_comercial=False).exists())
+
+    def test_descarga_cortada_no_marca(self):
+        partes = generar_exportacion(ANO, MES, formato='json', tamaño_bloque=50)
+        next(partes)
+        next(partes)
+        partes.close()
+        self.assertFalse(Lote.objects.filter(enviado_comercial=True).exists())
+
+
+class GuardarLecturaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        generar_periodo(ANO, MES, 20, 1)
+        cls.usuario = preparar_usuario()
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+        self.lecturas = Lote.objects.filter(ano_consumo=ANO, mes_consumo=MES).order_by('orden')
+
+    def leidos(self):
+        resumen = RutaPeriodo.objects.get(ano_consumo=ANO, mes_consumo=MES, ruta=nombre_ruta(0))
+        self.assertEqual(resumen.leidos, self.lecturas.filter(lectura_actual__isnull=False).count())
+        return resumen.leidos
+
+    def guardar(self, lectura, valor):
+        self.client.post(reverse('guardar_lectura', args=[lectura.pk]), {'lectura_actual': valor})
+        lectura.refresh_from_db()
+
+    def test_lectura_nueva_suma_un_leido(self):
+        lectura = self.lecturas.filter(lectura_actual__isnull=True).first()
+        self.guardar(lectura, lectura.lectura_anterior + 25)
+        self.assertEqual(self.leidos(), 11)
+        self.assertEqual(lectura.consumo_kwh, 25)
+
+    def test_en_blanco_deja_sin_leer(self):
+        leida = self.lecturas.filter(lectura_actual__isnull=False).first()
+        self.guardar(leida, '')
+        self.assertIsNone(leida.lectura_actual)
+        self.assertIsNone(leida.consumo_kwh)
+        self.assertEqual(self.leidos(), 9)
+
+        # En blanco sobre una que ya estaba sin leer no cambia nada
+        self.guardar(self.lecturas.filter(lectura_actual__isnull=True).last(), '')
+        self.assertEqual(self.leidos(), 9)
+
+
+class SubirLecturasTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        generar_periodo(ANO, MES, 20, 1)
+        cls.usuario = preparar_usuario()
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+        self.url = reverse('api_subir_lecturas', args=[ANO, MES, nombre_ruta(0)])
+        self.sin_leer = list(Lote.objects.filter(lectura_actual__isnull=True).order_by('orden'))
+
+    def subir(self, *lecturas):
+        return self.client.post(self.url, json.dumps({'lecturas': lecturas}), content_type='application/json')
+
+    def leidos(self):
+        return RutaPeriodo.objects.get(ano_consumo=ANO, mes_consumo=MES, ruta=nombre_ruta(0)).leidos
+
+    def test_guarda_lecturas_y_novedades(self):
+        lote = self.sin_leer[0]
+        novedad = Novedad.objects.first()
+        respuesta = self.subir({'pk': lote.pk, 'lectura_actual': lote.lectura_anterior + 40,
+                                'novedades': [novedad.pk], 'ubi_gps': '-34.6,-58.4'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['guardadas'], 1)
+        lote.refresh_from_db()
+        self.assertEqual(lote.consumo_kwh, 40)
+        self.assertEqual(lote.version, respuesta.json()['version'])
+        self.assertEqual(list(lote.novedades.values_list('pk', flat=True)), [novedad.pk])
+        self.assertEqual(self.leidos(), 11)
+
+        # Reenviar el mismo lote (por ejemplo después de un timeout) no vuelve a sumar
+        self.subir({'pk': lote.pk, 'lectura_actual': lote.lectura_anterior + 40})
+        self.assertEqual(self.leidos(), 11)
+
+    def test_rechaza_datos_invalidos_sin_error_500(self):
+        lote = self.sin_leer[0]
+        respuesta = self.subir(
+            {'pk': [lote.pk], 'lectura_actual': 1},
+            {'pk': True, 'lectura_actual': 1},
+            {'pk': lote.pk, 'lectura_actual': 10 ** 20},
+        )
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['rechazadas'], 3)
+        self.assertFalse(any(resultado['ok'] for resultado in respuesta.json()['resultados']))
+        self.assertEqual(self.leidos(), 10)
+
+    def test_rechaza_lecturas_repetidas(self):
+        lote, otro = self.sin_leer[:2]
+        respuesta = self.subir(
+            {'pk': lote.pk, 'lectura_actual': lote.lectura_anterior + 10},
+            {'pk': lote.pk, 'lectura_actual': None},
+            {'pk': otro.pk, 'lectura_actual': otro.lectura_anterior + 10},
+        ).json()
+        self.assertEqual([resultado['ok'] for resultado in respuesta['resultados']], [False, False, True])
+        self.assertEqual((respuesta['guardadas'], respuesta['rechazadas']), (1, 2))
+        self.assertEqual(self.leidos(), 11)
+
+
+class ArchivarPeriodoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        generar_periodo(ANO, MES, 40, 2)
+        Lote.objects.update(enviado_comercial=True)
+        lote = Lote.objects.filter(lectura_actual__isnull=False).first()
+        NovedadLectura.objects.create(lectura=lote, novedad=Novedad.objects.create(descripcion='Perro suelto'))
+        AnomaliaConsumo.objects.create(lectura=lote, ano_consumo=ANO, mes_consumo=MES, tipo='pico', consumo=900,
+                                       revisada=True)
+
+    def archivar(self, *opciones):
+        call_command('archivar_periodo', ANO, MES, *opciones, stdout=StringIO())
+
+    def test_archivar_y_restaurar(self):
+        versiones = dict(RutaPeriodo.objects.values_list('ruta', 'version'))
+        self.archivar()
+        self.assertFalse(Lote.objects.exists())
+        self.assertEqual(LoteHistorico.objects.count(), 40)
+        self.assertFalse(AnomaliaConsumo.objects.exists())
+        self.assertTrue(AnomaliaConsumoHistorica.objects.filter(revisada=True).exists())
+        # Sin lecturas en la tabla de trabajo el periodo no tiene rutas
+        self.assertFalse(RutaPeriodo.objects.exists())
+
+        self.archivar('--restaurar')
+        self.assertEqual(Lote.objects.count(), 40)
+        self.assertFalse(LoteHistorico.objects.exists())
+        self.assertEqual(NovedadLectura.objects.count(), 1)
+        self.assertTrue(AnomaliaConsumo.objects.get().revisada)
+        for ruta in RutaPeriodo.objects.all():
+            self.assertEqual(ruta.total_medidores, 20)
+            self.assertGreater(ruta.version, versiones[ruta.ruta])
+
+
+@skipUnless(importlib.util.find_spec('numpy'), 'detectar_anomalias necesita numpy')
+class DetectarAnomaliasTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        from .anomalias import periodos_anteriores
+
+        # Dos suministros distintos con el mismo número de medidor y consumos muy diferentes
+        cliente = Cliente.objects.create(denominacion='Cliente', domicilio='Calle 1')
+        cls.chico = Suministro.objects.create(numero='S1', numero_medidor='M1', tipo_medidor='MONOFASICO')
+        cls.grande = Suministro.objects.create(numero='S2', numero_medidor='M1', tipo_medidor='TRIFASICO')
+        lotes = []
+        for atras, (ano, mes) in enumerate([(ANO, MES)] + periodos_anteriores(ANO, MES, 6)):
+            for orden, (suministro, consumo) in enumerate([(cls.chico, 100), (cls.grande, 2000)], start=1):
+                # El último periodo el suministro chico tiene un pico
+                if not atras and suministro == cls.chico:
+                    consumo = 900
+                lotes.append(Lote(ano_consumo=ano, mes_consumo=mes, cliente=cliente, suministro=suministro, area='A',
+                                  ruta='R1', orden=orden, lectura_anterior=12345, lectura_actual=12345 + consumo,
+                                  consumo_kwh=consumo))
+        Lote.objects.bulk_create(lotes)
+
+    def test_historia_por_suministro(self):
+        from .anomalias import leer_historia, leer_periodo, periodos_anteriores
+
+        cod_lecturas, suministros, medidores, anteriores, actuales = leer_periodo(ANO, MES)
+        historia = leer_historia(suministros, periodos_anteriores(ANO, MES, 6))
+        esperado = {self.chico.pk: 100, self.grande.pk: 2000}
+        for suministro, fila in zip(suministros, historia):
+            self.assertEqual(fila.tolist(), [esperado[suministro]] * 6)
+
+    def test_detecta_pico(self):
+        call_command('detectar_anomalias', ANO, MES, stdout=StringIO())
+        anomalia = AnomaliaConsumo.objects.get()
+        self.assertEqual((anomalia.lectura.suministro_id, anomalia.tipo), (self.chico.pk, 'pico'))
+        self.assertEqual(anomalia.mediana, 100)
+
+
+class CargarPeriodoTests(TestCase):
+    ENCABEZADO = ('cod_cli;denominacion;domicilio;suministro_numero;area;ruta;orden;tipo_medidor;numero_medidor;'
+                  'lectura_anterior')
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.directorio = Path(directorio.name)
+
+    def cargar(self, *filas):
+        archivo = self.directorio / 'periodo.csv'
+        archivo.write_text('\n'.join([self.ENCABEZADO, *filas]) + '\n', encoding='utf-8')
+        call_command('cargar_periodo', ANO, MES, str(archivo), '--tamano-lote', '2', stdout=StringIO())
+
+    def test_carga_el_periodo(self):
+        # Un suministro que ya existe se reutiliza; un cliente con dos suministros se crea una sola vez
+        Suministro.objects.create(numero='S1', numero_medidor='M1', tipo_medidor='MONOFASICO')
+        self.cargar(
+            '10;Ana;Calle 1;S1;A1;R1;1;MONOFASICO;M1;100',
+            '10;Ana;Calle 1;S2;A1;R1;2;MONOFASICO;M2;200',
+            '11;Luis;Calle 2;S3;A1;R1;3;TRIFASICO;M3;300',
+            '12;Eva;Calle 3;S4;A2;R2;1;MONOFASICO;M4;400',
+            '13;Juan;Calle 4;S5;A2;R2;2;MONOFASICO;M5;500',
+        )
+        self.assertEqual(Lote.objects.filter(ano_consumo=ANO, mes_consumo=MES).count(), 5)
+        self.assertEqual(Cliente.objects.count(), 4)
+        self.assertEqual(Suministro.objects.count(), 5)
+        self.assertEqual(Lote.objects.get(orden=3, ruta='R1').numero_medidor, 'M3')
+        self.assertEqual(dict(RutaPeriodo.objects.values_list('ruta', 'total_medidores')), {'R1': 3, 'R2': 2})
+        # Los clientes nuevos conservan el código del sistema comercial y la secuencia sigue desde el mayor
+        self.assertGreater(Cliente.objects.create(denominacion='Otro', domicilio='Calle 5').pk, 13)
+
+        with self.assertRaisesMessage(CommandError, 'ya tiene lecturas cargadas'):
+            self.cargar('14;Otro;Calle 6;S6;A1;R1;4;MONOFASICO;M6;600')
+
+    def test_fila_invalida_no_carga_nada(self):
+        with self.assertRaisesMessage(CommandError, 'Línea 4'):
+            self.cargar(
+                '10;Ana;Calle 1;S1;A1;R1;1;MONOFASICO;M1;100',
+                '11;Luis;Calle 2;S2;A1;R1;2;MONOFASICO;M2;200',
+                '12;Eva;Calle 3;S3;A1;R1;x;MONOFASICO;M3;300',
+            )
+        self.assertFalse(Lote.objects.exists())
+        self.assertFalse(Cliente.objects.exists())
+
+
+class DashboardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        generar_periodo(ANO, MES, 20, 2)
+        cls.usuario = preparar_usuario()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.usuario)
+
+    def estadisticas(self):
+        respuesta = self.client.get(reverse('dashboard'))
+        claves = ['total_rutas', 'rutas_abiertas', 'total_lecturas', 'lecturas_tomadas', 'lecturas_pendientes',
+                  'mis_lecturas']
+        return {clave: respuesta.context[clave] for clave in claves}
+
+    def test_estadisticas_cacheadas_e_invalidadas(self):
+        self.assertEqual(self.estadisticas(), {
+            'total_rutas': 2, 'rutas_abiertas': 2, 'total_lecturas': 20, 'lecturas_tomadas': 10,
+            'lecturas_pendientes': 10, 'mis_lecturas': 0,
+        })
+
+        # La segunda vez salen de la caché (igual que el último periodo): solo sesión, usuario y operador
+        with self.assertNumQueries(3):
+            self.client.get(reverse('dashboard'))
+
+        lectura = Lote.objects.filter(lectura_actual__isnull=True).first()
+        self.client.post(reverse('guardar_lectura', args=[lectura.pk]),
+                         {'lectura_actual': lectura.lectura_anterior + 1})
+        estadisticas = self.estadisticas()
+        self.assertEqual((estadisticas['lecturas_tomadas'], estadisticas['mis_lecturas']), (11, 1))
+
+
+class CambiosRutaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        generar_periodo(ANO, MES, 20, 2)
+        cls.usuario = preparar_usuario()
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+        self.url = reverse('api_cambios_ruta', args=[ANO, MES, nombre_ruta(0)])
+
+    def cambios(self, desde):
+        respuesta = self.client.get(self.url, {'desde': desde}).json()
+        pk = respuesta['campos'].index('pk')
+        return respuesta['version'], [fila[pk] for fila in respuesta['lecturas']]
+
+    def test_devuelve_solo_lo_modificado(self):
+        # El colector parte del paquete completo de la ruta y de su versión
+        version = self.client.get(reverse('api_descargar_ruta', args=[ANO, MES, nombre_ruta(0)])).json()['version']
+        self.assertEqual(self.cambios(version), (version, []))
+
+        # Una lectura tomada en la página y otra corregida desde el admin
+        sin_leer = list(Lote.objects.filter(ruta=nombre_ruta(0), lectura_actual__isnull=True)[:2])
+        self.client.post(reverse('guardar_lectura', args=[sin_leer[0].pk]),
+                         {'lectura_actual': sin_leer[0].lectura_anterior + 5})
+        self.usuario.is_superuser = True
+        self.usuario.save()
+        self.client.post(reverse('admin:lecturas_lote_change', args=[sin_leer[1].pk]), {
+            'cliente': sin_leer[1].cliente_id, 'suministro': sin_leer[1].suministro_id, 'area': sin_leer[1].area,
+            'orden': sin_leer[1].orden, 'lectura_anterior': sin_leer[1].lectura_anterior,
+            'lectura_actual': sin_leer[1].lectura_anterior + 7,
+            'novedadlectura_set-TOTAL_FORMS': 0, 'novedadlectura_set-INITIAL_FORMS': 0,
+        })
+
+        nueva, lecturas = self.cambios(version)
+        self.assertEqual(nueva, version + 2)
+        self.assertEqual(sorted(lecturas), sorted(lote.pk for lote in sin_leer))
+
+    def test_falta_desde(self):
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+
+
+class AgregarNovedadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        generar_periodo(ANO, MES, 10, 1)
+        cls.usuario = preparar_usuario()
+        cls.novedades = list(Novedad.objects.values_list('pk', flat=True))
+        cls.lectura = Lote.objects.first()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.usuario)
+        self.url = reverse('agregar_novedad', args=[self.lectura.pk])
+
+    def guardar(self, novedades, novedad_libre=''):
+        return self.client.post(self.url, {'novedades_predefinidas': novedades, 'novedad_libre': novedad_libre})
+
+    def test_reemplaza_solo_las_que_cambian(self):
+        primera, segunda, tercera = self.novedades[:3]
+        self.guardar([primera, segunda], 'Portón cerrado')
+        conservada = NovedadLectura.objects.get(lectura=self.lectura, novedad_id=segunda)
+
+        self.guardar([segunda, tercera])
+        self.assertEqual(set(self.lectura.novedades.values_list('pk', flat=True)), {segunda, tercera})
+        self.assertEqual(NovedadLectura.objects.get(lectura=self.lectura, novedad_id=segunda), conservada)
+        self.lectura.refresh_from_db()
+        self.assertEqual(self.lectura.novedad_libre, '')
+        self.assertEqual(NovedadLectura.objects.get(lectura=self.lectura, novedad_id=tercera).version,
+                         self.lectura.version)
+
+    def test_consultas_no_dependen_de_la_cantidad(self):
+        self.guardar([])
+        with CaptureQueriesContext(connection) as una:
+            self.guardar(self.novedades[:1])
+        self.guardar([])
+        with CaptureQueriesContext(connection) as todas:
+            self.guardar(self.novedades)
+        self.assertEqual(len(todas), len(una))
+
+
+class TomarLecturasPaginacionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        generar_periodo(ANO, MES, 45, 1, proporcion_leidos=0.3)
+        # Varios medidores con el mismo orden justo en el corte entre la primera y la segunda página
+        Lote.objects.filter(orden__range=(18, 24)).update(orden=20)
+        cls.usuario = preparar_usuario()
+        cls.recorrido = list(Lote.objects.order_by('orden', 'cod_lectura').values_list('pk', flat=True))
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.usuario)
+        self.url = reverse('tomar_lecturas_periodo', args=[ANO, MES, nombre_ruta(0)])
+
+    def pagina(self, **parametros):
+        contexto = self.client.get(self.url, parametros).context
+        return contexto, [lectura.pk for lectura in contexto['lecturas']]
+
+    def test_recorre_todas_hacia_adelante_y_hacia_atras(self):
+        contexto, vistas = self.pagina()
+        while contexto['hay_siguiente']:
+            contexto, pagina = self.pagina(desde=contexto['ultimo_orden'], cod=contexto['ultimo_cod'] + 1)
+            vistas += pagina
+        self.assertEqual(vistas, self.recorrido)
+
+        vistas = pagina
+        while contexto['hay_anterior']:
+            contexto, pagina = self.pagina(antes=contexto['primer_orden'], cod=contexto['primer_cod'])
+            vistas = pagina + vistas
+        self.assertEqual(vistas, self.recorrido)
+
+    def test_siguiente_sin_leer(self):
+        contexto, pagina = self.pagina(pendiente=0)
+        primera = Lote.objects.filter(lectura_actual__isnull=True).order_by('orden', 'cod_lectura').first()
+        self.assertEqual(pagina[0], primera.pk)
+
+        # Dentro de un orden repetido sigue con el próximo código, sin saltearse los del mismo orden
+        repetidos = list(Lote.objects.filter(orden=20, lectura_actual__isnull=True).order_by('cod_lectura'))
+        contexto, pagina = self.pagina(pendiente=20, cod=repetidos[0].pk)
+        self.assertEqual(pagina[0], repetidos[1].pk)
+
+
+class BuscarTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        generar_periodo(ANO, MES, 30, 1)
+        generar_periodo(ANO, MES + 1, 30, 1)
+        cls.usuario = preparar_usuario()
+        # Los dos periodos usan los mismos suministros (M00000000 a M00000029)
+        cls.lectura = Lote.objects.select_related('suministro').get(ano_consumo=ANO, mes_consumo=MES, orden=28)
+        cliente = Cliente.objects.get(pk=cls.lectura.cliente_id)
+        cliente.denominacion, cliente.domicilio = 'Rodríguez Ana', 'San Martín 1'
+        cliente.save()
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def buscar(self, texto, **periodo):
+        respuesta = self.client.get(reverse('api_buscar'), {'q': texto, 'ano': ANO, 'mes': MES, **periodo}).json()
+        return [c['cod_cli'] for c in respuesta['clientes']], [l['pk'] for l in respuesta['lecturas']]
+
+    def test_clientes_por_prefijo_sin_acentos_y_con_errores(self):
+        for texto in ('rodr', 'RODRIGUEZ', 'rodrigues', 'ana san martin'):
+            with self.subTest(texto):
+                clientes, lecturas = self.buscar(texto)
+                self.assertEqual(clientes, [self.lectura.cliente_id])
+                self.assertEqual(lecturas, [self.lectura.pk])
+        self.assertEqual(self.buscar('gonzalez'), ([], []))
+
+    def test_lecturas_por_parte_del_medidor_y_del_periodo(self):
+        self.assertEqual(self.lectura.suministro.numero_medidor, 'M00000027')
+        _, lecturas = self.buscar('0027')
+        self.assertEqual(lecturas, [self.lectura.pk])
+        # El mismo número en otro periodo es otra lectura
+        _, lecturas = self.buscar(self.lectura.suministro.numero, mes=MES + 1)
+        self.assertEqual(len(lecturas), 1)
+        self.assertNotEqual(lecturas, [self.lectura.pk])
+
+    def test_falta_el_texto(self):
+        self.assertEqual(self.client.get(reverse('api_buscar')).status_code, 400)
+
+
+class AbrirPeriodoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # El mes anterior a enero es diciembre del año anterior
+        generar_periodo(ANO - 1, 12, 20, 2)
+
+    def abrir(self):
+        call_command('abrir_periodo', ANO, MES, stdout=StringIO())
+
+    def test_abre_desde_el_mes_anterior(self):
+        self.abrir()
+        anteriores = {
+            lote.suministro_id: lote for lote in Lote.objects.filter(ano_consumo=ANO - 1, mes_consumo=12)
+        }
+        nuevas = list(Lote.objects.filter(ano_consumo=ANO, mes_consumo=MES))
+        self.assertEqual(len(nuevas), 20)
+        for lote in nuevas:
+            anterior = anteriores[lote.suministro_id]
+            self.assertEqual((lote.cliente_id, lote.ruta, lote.orden),
+                             (anterior.cliente_id, anterior.ruta, anterior.orden))
+            self.assertEqual(lote.lectura_anterior, anterior.lectura_actual or anterior.lectura_anterior)
+            self.assertIsNone(lote.lectura_actual)
+        self.assertEqual(
+            list(RutaPeriodo.objects.filter(ano_consumo=ANO, mes_consumo=MES).values_list(
+                'total_medidores', 'leidos', 'abierta'
+            )),
+            [(10, 0, True), (10, 0, True)],
+        )
+
+    def test_volver_a_correr_solo_abre_las_rutas_que_faltan(self):
+        self.abrir()
+        Lote.objects.filter(ano_consumo=ANO, mes_consumo=MES, ruta=nombre_ruta(1)).delete()
+        self.abrir()
+        self.assertEqual(Lote.objects.filter(ano_consumo=ANO, mes_consumo=MES).count(), 20)
+
+
+class EstadoRutaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        generar_periodo(ANO, MES, 20, 1)
+        cls.usuario = preparar_usuario()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.usuario)
+        self.lote = Lote.objects.filter(lectura_actual__isnull=True).order_by('orden').first()
+
+    def cambiar(self, accion):
+        self.client.post(reverse(accion), {'ruta': nombre_ruta(0), 'ano': ANO, 'mes': MES})
+        return RutaPeriodo.objects.get(ano_consumo=ANO, mes_consumo=MES, ruta=nombre_ruta(0)).abierta
+
+    def test_ruta_cerrada_no_acepta_lecturas(self):
+        self.assertFalse(self.cambiar('cerrar_ruta'))
+
+        self.client.post(reverse('guardar_lectura', args=[self.lote.pk]),
+                         {'lectura_actual': self.lote.lectura_anterior + 10})
+        respuesta = self.client.post(
+            reverse('api_subir_lecturas', args=[ANO, MES, nombre_ruta(0)]),
+            json.dumps({'lecturas': [{'pk': self.lote.pk, 'lectura_actual': self.lote.lectura_anterior + 10}]}),
+            content_type='application/json',
+        )
+        self.assertEqual(respuesta.status_code, 409)
+        self.lote.refresh_from_db()
+        self.assertIsNone(self.lote.lectura_actual)
+
+        # Al volver a abrirla se puede guardar otra vez
+        self.assertTrue(self.cambiar('abrir_ruta'))
+        self.client.post(reverse('guardar_lectura', args=[self.lote.pk]),
+                         {'lectura_actual': self.lote.lectura_anterior + 10})
+        self.lote.refresh_from_db()
+        self.assertEqual(self.lote.consumo_kwh, 10)
+
+
+class ConfiguracionBaseTests(SimpleTestCase):
+    def cargar(self, **entorno):
+        with mock.patch.dict(os.environ, entorno, clear=True):
+            return runpy.run_path(str(settings.BASE_DIR / 'colector_datos' / 'settings.py'))['DATABASES']['default']
+
+    def test_sqlite_por_defecto(self):
+        self.assertEqual(self.cargar()['ENGINE'], 'django.db.backends.sqlite3')
+
+    def test_postgres_desde_el_entorno(self):
+        base = self.cargar(COLECTOR_DB='postgres', COLECTOR_DB_HOST='db', COLECTOR_DB_CONN_MAX_AGE='120')
+        self.assertEqual(base['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual((base['HOST'], base['PORT'], base['CONN_MAX_AGE']), ('db', '5432', 120))
+        self.assertNotIn('pool', base['OPTIONS'])
+
+        # Con el pool de psycopg Django exige que CONN_MAX_AGE sea 0
+        base = self.cargar(COLECTOR_DB='postgres', COLECTOR_DB_POOL='1', COLECTOR_DB_POOL_MAX='4')
+        self.assertEqual(base['CONN_MAX_AGE'], 0)
+        self.assertEqual((base['OPTIONS']['pool']['min_size'], base['OPTIONS']['pool']['max_size']), (2, 4))
+
+
+class PragmasSqliteTests(TestCase):
+    def pragmas(self):
+        # Conexión nueva para que pase por la señal connection_created
+        conexion = connections.create_connection('default')
+        try:
+            with conexion.cursor() as cursor:
+                return {nombre: cursor.execute(f'PRAGMA {nombre}').fetchone()[0]
+                        for nombre in ('busy_timeout', 'synchronous', 'temp_store')}
+        finally:
+            conexion.close()
+
+    @override_settings(SQLITE_OPTIMIZADO=True, SQLITE_PRAGMAS={'busy_timeout': 7000})
+    def test_aplica_el_perfil_a_las_conexiones_nuevas(self):
+        # synchronous=NORMAL es 1 y temp_store=MEMORY es 2; SQLITE_PRAGMAS pisa el valor por defecto
+        self.assertEqual(self.pragmas(), {'busy_timeout': 7000, 'synchronous': 1, 'temp_store': 2})
+
+    @override_settings(SQLITE_OPTIMIZADO=False)
+    def test_sin_perfil_no_cambia_la_conexion(self):
+        # Los valores de SQLite sin tocar (FULL y DEFAULT); busy_timeout queda en el timeout de Django
+        self.assertEqual(self.pragmas(), {'busy_timeout': 5000, 'synchronous': 2, 'temp_store': 0})
+
+
+class EstadoRutaApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        generar_periodo(ANO, MES, 20, 1)
+        cls.usuario = preparar_usuario()
+
+    def setUp(self):
+        self.url = reverse('api_estado_ruta', args=[ANO, MES, nombre_ruta(0)])
+
+    async def test_estado_y_etag(self):
+        self.assertEqual((await self.async_client.get(self.url)).status_code, 403)
+
+        await self.async_client.aforce_login(self.usuario)
+        respuesta = await self.async_client.get(self.url)
+        self.assertEqual(respuesta.status_code, 200)
+        resumen = await RutaPeriodo.objects.aget(ano_consumo=ANO, mes_consumo=MES, ruta=nombre_ruta(0))
+        self.assertEqual(respuesta.json(), {'version': resumen.version, 'abierta': True, 'total_medidores': 20,
+                                            'leidos': 10, 'faltantes': 10})
+
+        # Con la misma versión el colector recibe un 304 sin cuerpo
+        respuesta = await self.async_client.get(self.url, headers={'if-none-match': respuesta['ETag']})
+        self.assertEqual(respuesta.status_code, 304)
+
+        url = reverse('api_estado_ruta', args=[ANO, MES, 'NO-EXISTE'])
+        self.assertEqual((await self.async_client.get(url)).status_code, 404)
+
+
+class AvanceEnVivoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        generar_periodo(ANO, MES, 20, 1)
+        cls.usuario = preparar_usuario()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_sin_asgi_manda_el_estado_y_el_reintento(self):
+        self.client.force_login(self.usuario)
+        respuesta = self.client.get(reverse('api_avance_rutas', args=[ANO, MES]))
+        self.assertEqual(respuesta['Content-Type'], 'text/event-stream')
+        contenido = respuesta.content.decode()
+        self.assertTrue(contenido.startswith('retry: '))
+        datos = json.loads(contenido.split('event: estado\ndata: ')[1])
+        self.assertEqual([(ruta['ruta'], ruta['faltantes']) for ruta in datos], [(nombre_ruta(0), 10)])
+
+    async def test_registrar_cambio_publica_el_estado_de_la_ruta(self):
+        def cerrar():
+            with self.captureOnCommitCallbacks(execute=True):
+                RutaPeriodo.registrar_cambio(ANO, MES, nombre_ruta(0), abierta=False)
+
+        with backend_avisos().suscribir(canal_periodo(ANO, MES)) as suscripcion:
+            await sync_to_async(cerrar)()
+            mensaje = await suscripcion.recibir(1)
+        self.assertEqual((mensaje['tipo'], mensaje['ruta'], mensaje['abierta'], mensaje['faltantes']),
+                         ('ruta', nombre_ruta(0), False, 10))
+
+    async def test_suscripcion_saturada_pide_recargar(self):
+        backend = MemoriaBackend(limite_cola=2)
+        with backend.suscribir('canal') as suscripcion:
+            for numero in range(3):
+                backend.publicar('canal', {'numero': numero})
+            self.assertEqual(await suscripcion.recibir(1), RECARGAR)
+            self.assertIsNone(await suscripcion.recibir(0.01))
+        # Al salir del with se da de baja
+        self.assertEqual(backend._suscripciones, {})
+
+
+@skipUnless(importlib.util.find_spec('numpy'), 'el almacén frío necesita numpy')
+class AlmacenFrioTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        generar_periodo(ANO, MES, 40, 2)
+        Lote.objects.update(enviado_comercial=True)
+        cls.lote = Lote.objects.filter(lectura_actual__isnull=False).select_related('suministro').first()
+        cls.novedad = Novedad.objects.create(descripcion='Medidor tapado')
+        NovedadLectura.objects.create(lectura=cls.lote, novedad=cls.novedad)
+        call_command('archivar_periodo', ANO, MES, stdout=StringIO())
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.directorio = directorio.name
+
+    def exportar(self, *opciones):
+        call_command('exportar_frio', ANO, MES, '--directorio', self.directorio, *opciones, stdout=StringIO())
+
+    def test_exportar_y_consultar(self):
+        from . import almacen_frio
+
+        for opciones in [('--comprimir',), ('--borrar',)]:
+            with self.subTest(opciones=opciones):
+                self.exportar(*opciones)
+                [lectura] = almacen_frio.historia_medidor(self.lote.numero_medidor, self.directorio)
+                self.assertEqual((lectura['cod_lectura'], lectura['lectura_actual'], lectura['consumo_kwh']),
+                                 (self.lote.pk, self.lote.lectura_actual, self.lote.consumo_kwh))
+                self.assertEqual([codigo for codigo, fecha in lectura['novedades']], [self.novedad.pk])
+
+                periodo = almacen_frio.PeriodoFrio(almacen_frio.archivo_periodo(ANO, MES, self.directorio))
+                self.assertEqual([(ruta['ruta'], ruta['medidores'], ruta['leidos'])
+                                  for ruta in periodo.totales_por_ruta()],
+                                 [(nombre_ruta(0), 20, 10), (nombre_ruta(1), 20, 10)])
+
+        # Con --borrar el periodo queda solo en el archivo
+        self.assertFalse(LoteHistorico.objects.exists())
+        with self.assertRaisesMessage(CommandError, 'no tiene lecturas archivadas'):
+            self.exportar()
+
+
+class SuministroTests(TestCase):
+    def test_resolver_reusa_y_crea_suministros(self):
+        existente = Suministro.objects.create(numero='S1', numero_medidor='M1', tipo_medidor='Monofásico')
+        with self.assertNumQueries(3):
+            ids = Suministro.objects.resolver([
+                ('S1', 'M1', 'Monofásico'),
+                ('S1', 'M2', 'Trifásico'),    # Cambio de medidor: es otro suministro
+                ('S2', 'M3', 'Monofásico'),
+                ('S2', 'M3', 'Monofásico'),
+            ])
+        self.assertEqual(ids[('S1', 'M1')], existente.pk)
+        self.assertEqual(Suministro.objects.count(), 3)
+        self.assertEqual(Suministro.objects.get(pk=ids[('S1', 'M2')]).tipo_medidor, 'Trifásico')
+
+        # Si ya existen todos alcanza con una consulta
+        with self.assertNumQueries(1):
+            ids_existentes = Suministro.objects.resolver([('S2', 'M3', 'Monofásico')])
+        self.assertEqual(ids_existentes, {('S2', 'M3'): ids[('S2', 'M3')]})
+
+    def test_los_periodos_comparten_el_suministro(self):
+        generar_periodo(ANO, MES, 10, 1)
+        generar_periodo(ANO, MES + 1, 10, 1)
+        self.assertEqual(Suministro.objects.count(), 10)
+        lote = Lote.objects.select_related('suministro').get(ano_consumo=ANO, mes_consumo=MES + 1, orden=1)
+        self.assertEqual((lote.suministro_numero, lote.numero_medidor), ('S00000000', 'M00000000'))
+        self.assertEqual(lote.suministro_id, Lote.objects.get(ano_consumo=ANO, mes_consumo=MES, orden=1).suministro_id)
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     # Ruteo de vistas generales
@@ -11,11 +11,17 @@ urlpatterns = [
     path('seleccionar-periodo/', views.SeleccionarPeriodoView.as_view(), name='seleccionar_periodo'),
     path('listar-rutas/', views.ListarRutasView.as_view(), name='listar_rutas'),
     path('tomar-lecturas/<str:ruta>/', views.TomarLecturasView.as_view(), name='tomar_lecturas'),
+    # Las mismas páginas con el periodo en la URL (las de arriba redirigen acá con el periodo de la sesión)
+    path('periodos/<int:ano>/<int:mes>/rutas/', views.ListarRutasView.as_view(), name='listar_rutas_periodo'),
+    path('periodos/<int:ano>/<int:mes>/rutas/<str:ruta>/', views.TomarLecturasView.as_view(),
+         name='tomar_lecturas_periodo'),
     path('guardar-lectura/<int:pk>/', views.GuardarLecturaView.as_view(), name='guardar_lectura'),
     path('eliminar-lectura/<int:pk>/', views.EliminarLecturaView.as_view(), name='eliminar_lectura'),
     path('agregar-novedad/<int:pk>/', views.AgregarNovedadView.as_view(), name='agregar_novedad'),
     path('cerrar-ruta/', views.CerrarRutaView.as_view(), name='cerrar_ruta'),
     path('abrir-ruta/', views.AbrirRutaView.as_view(), name='abrir_ruta'),
+    path('exportar-periodo/', views.ExportarPeriodoView.as_view(), name='exportar_periodo'),
+    path('estadisticas-vistas/', views.EstadisticasVistasView.as_view(), name='estadisticas_vistas'),
 
     # Ruteo de vistas para la gestion de tipos de novedades - CRUD
     path('crear-tipo-novedad/', views.CrearNovedadView.as_view(), name='crear_tipo_novedad'),
@@ -23,6 +29,14 @@ urlpatterns = [
     path('eliminar-tipo-novedad/<int:pk>/', views.EliminarNovedadView.as_view(), name='eliminar_tipo_novedad'),
     path('listar-novedades/', views.ListarTiposNovedadesView.as_view(), name='listar_tipos_novedades'),    
     
+    # Ruteo de la API para los colectores de mano (versionada para no romper equipos ya instalados)
+    path('api/v1/periodos/<int:ano>/<int:mes>/rutas/<str:ruta>/', api.DescargarRutaView.as_view(), name='api_descargar_ruta'),
+    path('api/v1/periodos/<int:ano>/<int:mes>/rutas/<str:ruta>/lecturas/', api.SubirLecturasView.as_view(), name='api_subir_lecturas'),
+    path('api/v1/periodos/<int:ano>/<int:mes>/rutas/<str:ruta>/cambios/', api.CambiosRutaView.as_view(), name='api_cambios_ruta'),
+    path('api/v1/periodos/<int:ano>/<int:mes>/rutas/<str:ruta>/estado/', api.EstadoRutaView.as_view(), name='api_estado_ruta'),
+    path('api/v1/periodos/<int:ano>/<int:mes>/avance/', api.AvanceRutasView.as_view(), name='api_avance_rutas'),
+    path('api/v1/buscar/', api.BuscarView.as_view(), name='api_buscar'),
+
     # Ruteo de vistas para la gestion de operadores/usuarios - CRUD        
     # -- Pendiente: Es un poco más complejo que el resto, porque debo manejar 2 modelos, el User y el Operador.
     
@@ -1,15 +1,73 @@
+import hashlib
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import ListView, FormView, UpdateView
 from django.contrib import messages
+from django.http import JsonResponse, StreamingHttpResponse
+from django.db import transaction
 from django.db.models import *
 from django.utils import timezone
-
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
 from django.views import View
 from django.urls import reverse_lazy, reverse
-from .models import Operador, Cliente, Lote, Novedad
+from .models import Operador, Cliente, Lote, Novedad, NovedadLectura, RutaPeriodo
 from .forms import LoginForm, PeriodoForm, LecturaForm, NovedadForm, NovedadModelForm
+from .exportacion import FORMATOS, generar_exportacion
+from .cache import estadisticas_periodo, invalidar, invalidar_periodo, obtener_version, ruta_abierta, ultimo_periodo
+from .middleware import estadisticas_por_vista
+
+
+class PeriodoEnUrlMixin:
+    """El periodo va en la URL (periodos/AAAA/MM/...), así cada periodo tiene su propia dirección y la página
+    no depende de la sesión. Las URLs sin periodo redirigen a la del periodo guardado en la sesión."""
+    url_periodo = None
+    
+    def dispatch(self, request, *args, **kwargs):
+        if 'ano' not in kwargs:
+            ano = request.session.get('periodo_año')
+            mes = request.session.get('periodo_mes')
+            if ano and mes:
+                url = reverse(self.url_periodo, kwargs={'ano': int(ano), 'mes': int(mes), **kwargs})
+                consulta = request.META.get('QUERY_STRING')
+                return redirect(f'{url}?{consulta}' if consulta else url)
+        self.ano = kwargs.get('ano')
+        self.mes = kwargs.get('mes')
+        return super().dispatch(request, *args, **kwargs)
+
+
+class RespuestaCondicionalMixin:
+    """GET condicional: la página lleva un ETag armado con la versión de lo que muestra (version_contenido) y,
+    si el navegador manda If-None-Match con el mismo, se responde 304 sin consultar ni renderizar nada más.
+    
+    El ETag también depende del usuario y del token CSRF (los formularios de la página lo llevan), y no se usa
+    cuando hay mensajes para mostrar, porque la página guardada no los tendría, ni cuando el navegador todavía
+    no tiene la cookie CSRF (la crea esta misma respuesta)."""
+    def version_contenido(self):
+        """Devuelve un texto que cambia cada vez que cambia lo que muestra la página, o None para no usar ETag.
+        Por defecto no se usa: la vista responde siempre completa."""
+        return None
+    
+    def get(self, request, *args, **kwargs):
+        version = self.version_contenido()
+        if version is None or 'CSRF_COOKIE' not in request.META or len(messages.get_messages(request)):
+            return super().get(request, *args, **kwargs)
+        
+        sesion = hashlib.blake2b(f'{request.user.pk}:{request.META["CSRF_COOKIE"]}'.encode(), digest_size=6).hexdigest()
+        etag = quote_etag(f'{version}-{sesion}')
+        no_modificada = get_conditional_response(request, etag=etag)
+        if no_modificada is not None:
+            return no_modificada
+        
+        response = super().get(request, *args, **kwargs)
+        # La vista puede haber agregado un mensaje (por ejemplo "no quedan medidores sin leer")
+        if not len(messages.get_messages(request)):
+            response['ETag'] = etag
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
 
 class LoginView(View):
     """Vista de login"""
@@ -51,29 +109,34 @@ class DashboardView(LoginRequiredMixin, View):
     template_name = 'lecturas/dashboard.html'
     
     def get(self, request):
-        # Obtener estadísticas generales
-        total_rutas = Lote.objects.values('ruta', 'ano_consumo', 'mes_consumo').distinct().count()
-        rutas_abiertas = Lote.objects.filter(abierta=True).values('ruta', 'ano_consumo', 'mes_consumo').distinct().count()
-        total_lecturas = Lote.objects.count()
-        lecturas_tomadas = Lote.objects.filter(lectura_actual__isnull=False).count()
+        # Las estadísticas son del periodo seleccionado (o del último cargado si no se eligió ninguno)
+        ano = request.session.get('periodo_año')
+        mes = request.session.get('periodo_mes')
+        if not ano or not mes:
+            ano, mes = ultimo_periodo() or (None, None)
         
         # Obtener operador actual
         try:
             operador = request.user.operador
-            mis_lecturas = Lote.objects.filter(operador=operador).count()
-        except:
+        except Operador.DoesNotExist:
             operador = None
-            mis_lecturas = 0
         
         context = {
-            'total_rutas': total_rutas,
-            'rutas_abiertas': rutas_abiertas,
-            'total_lecturas': total_lecturas,
-            'lecturas_tomadas': lecturas_tomadas,
-            'lecturas_pendientes': total_lecturas - lecturas_tomadas,
-            'mis_lecturas': mis_lecturas,
+            'total_rutas': 0,
+            'rutas_abiertas': 0,
+            'total_lecturas': 0,
+            'lecturas_tomadas': 0,
+            'lecturas_pendientes': 0,
+            'mis_lecturas': 0,
+            'periodo': 'Sin lecturas cargadas',
         }
         
+        if ano and mes:
+            meses = ['', 'Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio',
+                    'Julio', 'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+            context.update(estadisticas_periodo(ano, mes, operador))
+            context['periodo'] = f"{meses[int(mes)]} {ano}"
+        
         return render(request, self.template_name, context)
 
 
@@ -89,43 +152,39 @@ class SeleccionarPeriodoView(LoginRequiredMixin, FormView):
         self.request.session['periodo_año'] = año
         self.request.session['periodo_mes'] = mes
         messages.success(self.request, f'Periodo seleccionado: {dict(form.fields["mes"].choices)[int(mes)]} {año}')
-        return redirect('listar_rutas')
+        return redirect('listar_rutas_periodo', ano=int(año), mes=int(mes))
 
 
-class ListarRutasView(LoginRequiredMixin, ListView):
+class ListarRutasView(LoginRequiredMixin, PeriodoEnUrlMixin, RespuestaCondicionalMixin, ListView):
     """Vista para listar rutas del periodo seleccionado"""
     template_name = 'lecturas/listar_rutas.html'
     context_object_name = 'rutas'
+    url_periodo = 'listar_rutas_periodo'
+    
+    def version_contenido(self):
+        # Cada cambio en una ruta incrementa su versión (y reconstruir nunca la baja), así que la suma de las
+        # versiones y la cantidad de rutas cambian con cualquier cosa que muestre el listado
+        if not self.ano or not self.mes:
+            return None
+        rutas = RutaPeriodo.objects.filter(ano_consumo=self.ano, mes_consumo=self.mes).aggregate(
+            cantidad=Count('pk'), versiones=Sum('version', default=0)
+        )
+        return f'rutas-{self.ano}-{self.mes}-{rutas["cantidad"]}-{rutas["versiones"]}'
     
     def get_queryset(self):
-        ano = self.request.session.get('periodo_año')
-        mes = self.request.session.get('periodo_mes')
+        ano, mes = self.ano, self.mes
         
         if not ano or not mes:
             return []
         
-        # Obtener rutas únicas con estadísticas
-        rutas = Lote.objects.filter(
-            ano_consumo=ano,
-            mes_consumo=mes
-        ).values('ruta', 'area', 'abierta').annotate(
-            total_medidores=Count('cod_lectura'),
-            leidos=Count('cod_lectura', filter=Q(lectura_actual__isnull=False)),
-            operador_nombre=Max('operador__user__first_name')
-        ).order_by('ruta')
-        
-        # Calcular faltantes
-        for ruta in rutas:
-            ruta['faltantes'] = ruta['total_medidores'] - ruta['leidos']
-        
-        return rutas
+        # El avance de cada ruta ya está resumido en RutaPeriodo (faltantes es una propiedad del modelo)
+        return RutaPeriodo.objects.filter(ano_consumo=ano, mes_consumo=mes).order_by('ruta')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        ano = self.request.session.get('periodo_año')
-        mes = self.request.session.get('periodo_mes')
+        ano, mes = self.ano, self.mes
         
-        if ano and mes:
+        if ano and mes and 1 <= mes <= 12:
             meses = ['', 'Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio',
                     'Julio', 'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
             context['periodo'] = f"{meses[int(mes)]} {ano}"
@@ -137,41 +196,128 @@ class ListarRutasView(LoginRequiredMixin, ListView):
         return context
 
 
-class TomarLecturasView(LoginRequiredMixin, ListView):
-    """Vista para tomar lecturas de una ruta"""
+def desde_posicion(lecturas, orden, cod=None):
+    """Lecturas desde la posición (orden, cod_lectura) inclusive; sin cod, desde el primer medidor con ese orden.
+    El filtro orden >= N va solo para que la consulta recorra el índice por rango"""
+    if cod is None:
+        return lecturas.filter(orden__gte=orden)
+    return lecturas.filter(Q(orden__gt=orden) | Q(cod_lectura__gte=cod), orden__gte=orden)
+
+
+def antes_de_posicion(lecturas, orden, cod=None):
+    """Lecturas anteriores a la posición (orden, cod_lectura); sin cod, las de orden menor"""
+    if cod is None:
+        return lecturas.filter(orden__lt=orden)
+    return lecturas.filter(Q(orden__lt=orden) | Q(cod_lectura__lt=cod), orden__lte=orden)
+
+
+class TomarLecturasView(LoginRequiredMixin, PeriodoEnUrlMixin, RespuestaCondicionalMixin, ListView):
+    """Vista para tomar lecturas de una ruta
+    
+    Pagina por orden de recorrido (keyset) en lugar de usar OFFSET, así cualquier página cuesta lo mismo
+    aunque la ruta tenga miles de medidores:
+        ?desde=N      página que empieza en el medidor de orden N (también sirve para saltar a un orden)
+        ?antes=N      página anterior al medidor de orden N
+        ?pendiente=N  página que empieza en el primer medidor sin leer después del orden N
+    Varios medidores de la ruta pueden tener el mismo orden, así que el recorrido es por (orden, cod_lectura) y
+    los enlaces de la página agregan &cod=C para indicar la posición exacta dentro de ese orden.
+    Los totales y el estado de la ruta salen de RutaPeriodo, sin contar las lecturas.
+    """
     template_name = 'lecturas/tomar_lecturas.html'
     context_object_name = 'lecturas'
-    paginate_by = 20
+    tamaño_pagina = 20
+    url_periodo = 'tomar_lecturas_periodo'
+    
+    def version_contenido(self):
+        # Todo lo que se modifica en las lecturas de la ruta pasa por RutaPeriodo.registrar_cambio; los datos de
+        # clientes y suministros y las descripciones de las novedades tienen sus propias versiones
+        ruta = self.kwargs.get('ruta')
+        self.resumen = None
+        if self.ano and self.mes and ruta:
+            self.resumen = RutaPeriodo.objects.filter(ano_consumo=self.ano, mes_consumo=self.mes, ruta=ruta).first()
+        if self.resumen is None:
+            return None
+        return (f'ruta-{self.ano}-{self.mes}-{ruta}-v{self.resumen.version}'
+                f'-c{obtener_version("clientes")}-n{obtener_version("novedades")}')
     
     def get_queryset(self):
         ruta = self.kwargs.get('ruta')
-        ano = self.request.session.get('periodo_año')
-        mes = self.request.session.get('periodo_mes')
+        ano, mes = self.ano, self.mes
+        self.hay_anterior = self.hay_siguiente = False
         
         if not ano or not mes or not ruta:
-            return Lote.objects.none()
+            return []
         
-        return Lote.objects.filter(
+        lecturas = Lote.objects.filter(
             ano_consumo=ano,
             mes_consumo=mes,
             ruta=ruta
-        ).select_related('cliente', 'operador').prefetch_related('novedades').order_by('orden')
+        ).select_related('cliente', 'suministro', 'operador').prefetch_related('novedades')
+        
+        desde = self.parametro('desde')
+        antes = self.parametro('antes')
+        pendiente = self.parametro('pendiente')
+        cod = self.parametro('cod')
+        
+        if pendiente is not None:
+            # Usa el índice parcial de lecturas pendientes. Sin cod, "después" es un orden mayor
+            posicion = (pendiente, cod + 1) if cod is not None else (pendiente + 1,)
+            siguiente = desde_posicion(lecturas.filter(lectura_actual__isnull=True), *posicion).order_by('orden', 'cod_lectura').values_list('orden', 'cod_lectura').first()
+            if siguiente is None:
+                messages.info(self.request, f'No quedan medidores sin leer después del orden {pendiente}')
+                desde, cod = pendiente, None
+            else:
+                desde, cod = siguiente
+        
+        if antes is not None:
+            pagina = list(
+                antes_de_posicion(lecturas, antes, cod).order_by('-orden', '-cod_lectura')[:self.tamaño_pagina + 1]
+            )
+            self.hay_anterior = len(pagina) > self.tamaño_pagina
+            self.hay_siguiente = True
+            pagina = pagina[:self.tamaño_pagina][::-1]
+            if not self.hay_anterior and len(pagina) < self.tamaño_pagina:
+                # Se llegó al principio: muestro la primera página completa
+                desde = None
+            else:
+                return pagina
+        
+        if desde is not None:
+            self.hay_anterior = antes_de_posicion(lecturas, desde, cod).exists()
+            lecturas = desde_posicion(lecturas, desde, cod)
+        pagina = list(lecturas.order_by('orden', 'cod_lectura')[:self.tamaño_pagina + 1])
+        self.hay_siguiente = len(pagina) > self.tamaño_pagina
+        return pagina[:self.tamaño_pagina]
+    
+    def parametro(self, nombre):
+        try:
+            return int(self.request.GET[nombre])
+        except (KeyError, ValueError):
+            return None
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         ruta = self.kwargs.get('ruta')
-        ano = self.request.session.get('periodo_año')
-        mes = self.request.session.get('periodo_mes')
+        ano, mes = self.ano, self.mes
         
-        if ano and mes and ruta:
+        if ano and mes and ruta and 1 <= mes <= 12:
             meses = ['', 'Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio',
                     'Julio', 'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
             context['periodo'] = f"{meses[int(mes)]} {ano}"
+            context['ano'] = ano
+            context['mes'] = mes
             context['ruta'] = ruta
+            context['resumen'] = self.resumen
+            context['ruta_abierta'] = self.resumen.abierta if self.resumen else False
             
-            # Verificar si la ruta está abierta
-            lectura_ejemplo = self.get_queryset().first()
-            context['ruta_abierta'] = lectura_ejemplo.abierta if lectura_ejemplo else False
+            lecturas = context['lecturas']
+            context['hay_anterior'] = self.hay_anterior and bool(lecturas)
+            context['hay_siguiente'] = self.hay_siguiente
+            if lecturas:
+                context['primer_orden'] = lecturas[0].orden
+                context['primer_cod'] = lecturas[0].cod_lectura
+                context['ultimo_orden'] = lecturas[-1].orden
+                context['ultimo_cod'] = lecturas[-1].cod_lectura
         
         return context
 
@@ -182,15 +328,20 @@ class GuardarLecturaView(LoginRequiredMixin, View):
         lectura = get_object_or_404(Lote, pk=pk)
         
         # Verificar que la ruta esté abierta
-        if not lectura.abierta:
+        if not ruta_abierta(lectura.ano_consumo, lectura.mes_consumo, lectura.ruta):
             messages.error(request, 'No se puede modificar una ruta cerrada')
-            return redirect('tomar_lecturas', ruta=lectura.ruta)
+            return redirect('tomar_lecturas_periodo', ano=lectura.ano_consumo, mes=lectura.mes_consumo,
+                            ruta=lectura.ruta)
         
         form = LecturaForm(request.POST, instance=lectura, lectura_anterior=lectura.lectura_anterior)
         
         if form.is_valid():
             lectura = form.save(commit=False)
             lectura.fecha_hora_registro = timezone.now()
+            # El formulario acepta la lectura en blanco: la deja sin leer, igual que EliminarLecturaView
+            if lectura.lectura_actual is None:
+                lectura.consumo_kwh = None
+            leidas, sin_leer = ([lectura.pk], []) if lectura.tiene_lectura else ([], [lectura.pk])
             
             # Asignar operador
             try:
@@ -198,13 +349,26 @@ class GuardarLecturaView(LoginRequiredMixin, View):
             except:
                 pass
             
-            lectura.save()
-            messages.success(request, f'Lectura guardada correctamente para {lectura.cliente.denominacion}')
+            with transaction.atomic():
+                lectura.version = RutaPeriodo.registrar_cambio(
+                    lectura.ano_consumo, lectura.mes_consumo, lectura.ruta,
+                    leidos=Lote.objects.cambio_leidos(leidas, sin_leer), operador=lectura.operador,
+                    solo_abierta=True,
+                )
+                if lectura.version:
+                    lectura.save()
+            invalidar_periodo(lectura.ano_consumo, lectura.mes_consumo)
+            if lectura.version:
+                messages.success(request, f'Lectura guardada correctamente para {lectura.cliente.denominacion}')
+            else:
+                # La ruta se cerró mientras tanto
+                messages.error(request, 'No se puede modificar una ruta cerrada')
         else:
             for error in form.errors.values():
                 messages.error(request, error)
         
-        return redirect('tomar_lecturas', ruta=lectura.ruta)
+        return redirect('tomar_lecturas_periodo', ano=lectura.ano_consumo, mes=lectura.mes_consumo,
+                        ruta=lectura.ruta)
 
 
 class EliminarLecturaView(LoginRequiredMixin, View):
@@ -213,17 +377,28 @@ class EliminarLecturaView(LoginRequiredMixin, View):
         lectura = get_object_or_404(Lote, pk=pk)
         
         # Verificar que la ruta esté abierta
-        if not lectura.abierta:
+        if not ruta_abierta(lectura.ano_consumo, lectura.mes_consumo, lectura.ruta):
             messages.error(request, 'No se puede modificar una ruta cerrada')
-            return redirect('tomar_lecturas', ruta=lectura.ruta)
+            return redirect('tomar_lecturas_periodo', ano=lectura.ano_consumo, mes=lectura.mes_consumo,
+                            ruta=lectura.ruta)
         
         ruta = lectura.ruta
         lectura.lectura_actual = None
         lectura.consumo_kwh = None
-        lectura.save()
+        with transaction.atomic():
+            lectura.version = RutaPeriodo.registrar_cambio(
+                lectura.ano_consumo, lectura.mes_consumo, ruta,
+                leidos=Lote.objects.cambio_leidos(sin_leer=[lectura.pk]), solo_abierta=True,
+            )
+            if lectura.version:
+                lectura.save()
+        invalidar_periodo(lectura.ano_consumo, lectura.mes_consumo)
         
-        messages.success(request, 'Lectura eliminada correctamente')
-        return redirect('tomar_lecturas', ruta=ruta)
+        if lectura.version:
+            messages.success(request, 'Lectura eliminada correctamente')
+        else:
+            messages.error(request, 'No se puede modificar una ruta cerrada')
+        return redirect('tomar_lecturas_periodo', ano=lectura.ano_consumo, mes=lectura.mes_consumo, ruta=ruta)
 
 
 class AgregarNovedadView(LoginRequiredMixin, View):
@@ -231,7 +406,7 @@ class AgregarNovedadView(LoginRequiredMixin, View):
     template_name = 'lecturas/agregar_novedad.html'
     
     def get(self, request, pk):
-        lectura = get_object_or_404(Lote, pk=pk)
+        lectura = get_object_or_404(Lote.objects.select_related('cliente', 'suministro'), pk=pk)
         # Obtener las novedades actuales de la lectura para pre-cargarlas en el formulario
         novedades_actuales = list(lectura.novedades.values_list('cod_novedad', flat=True))
         form = NovedadForm(initial={
@@ -244,74 +419,120 @@ class AgregarNovedadView(LoginRequiredMixin, View):
         lectura = get_object_or_404(Lote, pk=pk)
         
         # Verificar que la ruta esté abierta
-        if not lectura.abierta:
+        if not ruta_abierta(lectura.ano_consumo, lectura.mes_consumo, lectura.ruta):
             messages.error(request, 'No se puede modificar una ruta cerrada')
-            return redirect('tomar_lecturas', ruta=lectura.ruta)
+            return redirect('tomar_lecturas_periodo', ano=lectura.ano_consumo, mes=lectura.mes_consumo,
+                            ruta=lectura.ruta)
         
         form = NovedadForm(request.POST)
         
         if form.is_valid():
-            # Limpiar novedades anteriores
-            lectura.novedades.clear()
-            
-            # Agregar novedades seleccionadas
-            novedades_ids = form.cleaned_data.get('novedades_predefinidas', [])
-            for nov_id in novedades_ids:
-                novedad = Novedad.objects.get(cod_novedad=nov_id)
-                lectura.novedades.add(novedad)
+            with transaction.atomic():
+                lectura.version = RutaPeriodo.registrar_cambio(
+                    lectura.ano_consumo, lectura.mes_consumo, lectura.ruta, solo_abierta=True,
+                )
+                if lectura.version:
+                    # Reemplazar las novedades por las seleccionadas (solo se tocan las que cambiaron)
+                    novedades_ids = {int(nov_id) for nov_id in form.cleaned_data.get('novedades_predefinidas', [])}
+                    NovedadLectura.reemplazar({lectura.pk: novedades_ids}, lectura.version)
+                    
+                    # Guardar novedad libre
+                    lectura.novedad_libre = form.cleaned_data.get('novedad_libre', '')
+                    lectura.save()
             
-            # Guardar novedad libre
-            lectura.novedad_libre = form.cleaned_data.get('novedad_libre', '')
-            lectura.save()
-            
-            messages.success(request, 'Novedades guardadas correctamente')
-            return redirect('tomar_lecturas', ruta=lectura.ruta)
+            if lectura.version:
+                messages.success(request, 'Novedades guardadas correctamente')
+            else:
+                messages.error(request, 'No se puede modificar una ruta cerrada')
+            return redirect('tomar_lecturas_periodo', ano=lectura.ano_consumo, mes=lectura.mes_consumo,
+                            ruta=lectura.ruta)
         
         return render(request, self.template_name, {'form': form, 'lectura': lectura})
 
 
+def periodo_formulario(request):
+    """Periodo (año, mes) que manda el formulario, que es el de la página desde la que se envió.
+    Si no viene, se usa el de la sesión"""
+    try:
+        return int(request.POST['ano']), int(request.POST['mes'])
+    except (KeyError, ValueError):
+        return request.session.get('periodo_año'), request.session.get('periodo_mes')
+
+
+def redirect_listado(ano, mes):
+    if ano and mes:
+        return redirect('listar_rutas_periodo', ano=int(ano), mes=int(mes))
+    return redirect('listar_rutas')
+
+
 class CerrarRutaView(LoginRequiredMixin, View):
     """Vista para cerrar una ruta"""
     def post(self, request):
         ruta = request.POST.get('ruta')
-        ano = request.session.get('periodo_año')
-        mes = request.session.get('periodo_mes')
+        ano, mes = periodo_formulario(request)
         
-        if ruta and ano and mes:
-            Lote.objects.filter(
-                ruta=ruta,
-                ano_consumo=ano,
-                mes_consumo=mes
-            ).update(abierta=False)
+        # El estado de la ruta es una sola fila de RutaPeriodo, no se reescriben las lecturas
+        if ruta and ano and mes and RutaPeriodo.registrar_cambio(ano, mes, ruta, abierta=False):
+            invalidar_periodo(ano, mes)
             
             messages.success(request, f'Ruta {ruta} cerrada correctamente')
         else:
             messages.error(request, 'Error al cerrar la ruta')
         
-        return redirect('listar_rutas')
+        return redirect_listado(ano, mes)
 
 
 class AbrirRutaView(LoginRequiredMixin, View):
     """Vista para abrir una ruta cerrada"""
     def post(self, request):
         ruta = request.POST.get('ruta')
-        ano = request.session.get('periodo_año')
-        mes = request.session.get('periodo_mes')
+        ano, mes = periodo_formulario(request)
         
-        if ruta and ano and mes:
-            Lote.objects.filter(
-                ruta=ruta,
-                ano_consumo=ano,
-                mes_consumo=mes
-            ).update(abierta=True)
+        # El estado de la ruta es una sola fila de RutaPeriodo, no se reescriben las lecturas
+        if ruta and ano and mes and RutaPeriodo.registrar_cambio(ano, mes, ruta, abierta=True):
+            invalidar_periodo(ano, mes)
             
             messages.success(request, f'Ruta {ruta} abierta correctamente')
         else:
             messages.error(request, 'Error al abrir la ruta')
         
-        return redirect('listar_rutas')
+        return redirect_listado(ano, mes)
+
+
+class ExportarPeriodoView(LoginRequiredMixin, View):
+    """Vista para descargar las lecturas de las rutas cerradas y marcarlas como enviadas a comercial"""
+    def post(self, request):
+        ano, mes = periodo_formulario(request)
+        formato = request.POST.get('formato', 'csv')
+        
+        if not request.user.is_staff:
+            messages.error(request, 'Solo un supervisor puede exportar lecturas a comercial')
+            return redirect_listado(ano, mes)
+        
+        if not ano or not mes or formato not in FORMATOS:
+            messages.error(request, 'Error al exportar el periodo')
+            return redirect_listado(ano, mes)
+        
+        # La respuesta se arma a medida que se envía, sin cargar todo el periodo en memoria
+        contenido = generar_exportacion(int(ano), int(mes), formato=formato)
+        tipo = 'text/csv' if formato == 'csv' else 'application/json'
+        response = StreamingHttpResponse(contenido, content_type=f'{tipo}; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="lecturas_{ano}_{int(mes):02d}.{formato}"'
+        return response
 
 
+class EstadisticasVistasView(LoginRequiredMixin, View):
+    """Devuelve en JSON los contadores de la instrumentación por vista (solo supervisores)"""
+    def get(self, request):
+        if not request.user.is_staff:
+            return JsonResponse({'error': 'Solo un supervisor puede ver las estadísticas'}, status=403)
+        
+        vistas = estadisticas_por_vista()
+        for valores in vistas.values():
+            valores['promedio_ms'] = round(valores['total_ms'] / valores['peticiones'], 1)
+        return JsonResponse({'vistas': dict(sorted(vistas.items(), key=lambda v: -v[1]['total_ms']))},
+                            json_dumps_params={'ensure_ascii': False})
+
 
 class CrearNovedadView(LoginRequiredMixin, View):
     """Vista para crear una novedad"""
@@ -328,6 +549,7 @@ class CrearNovedadView(LoginRequiredMixin, View):
         form = self.form_class(request.POST)
         if form.is_valid():
             form.save()
+            invalidar('novedades')
             messages.success(self.request, 'Novedad creada correctamente')
             return redirect(self.success_url)
         return render(request, self.template_name, {'form': form})
@@ -341,8 +563,10 @@ class EditarNovedadView(LoginRequiredMixin, UpdateView):
     success_url = reverse_lazy('listar_tipos_novedades')
     
     def form_valid(self, form):
+        response = super().form_valid(form)
+        invalidar('novedades')
         messages.success(self.request, 'Novedad actualizada correctamente')
-        return super().form_valid(form)
+        return response
 
 
 class EliminarNovedadView(LoginRequiredMixin, View):
@@ -352,18 +576,23 @@ class EliminarNovedadView(LoginRequiredMixin, View):
         descripcion = novedad.descripcion
         
         # Verificar si está siendo usada en alguna lectura
-        if novedad.lote_set.exists():
+        if novedad.lote_set.exists() or novedad.novedades_archivadas.exists():
             messages.error(request, f'No se puede eliminar la novedad "{descripcion}" porque está siendo utilizada en lecturas.')
             return redirect('listar_tipos_novedades')
         
         novedad.delete()
+        invalidar('novedades')
         messages.success(request, f'Novedad "{descripcion}" eliminada correctamente')
         return redirect('listar_tipos_novedades')
 
 
-class ListarTiposNovedadesView(LoginRequiredMixin, ListView):
+class ListarTiposNovedadesView(LoginRequiredMixin, RespuestaCondicionalMixin, ListView):
     """Vista para listar tipos de novedades"""
     model = Novedad
     template_name = 'lecturas/listar_tipos_novedades.html'
     context_object_name = 'novedades'   
-    ordering = ['descripcion']
\ No newline at end of file
+    ordering = ['descripcion']
+    
+    def version_contenido(self):
+        # La misma versión que invalidan las vistas y el admin cuando cambia el catálogo
+        return f'novedades-{obtener_version("novedades")}'
\ No newline at end of file